@@ -0,0 +1,147 @@
+"""
+Нагрузочный бенчмарк диспетчера: N сотрудников одновременно проходят путь заказа
+/start → меню → блюдо → количество → корзина → подтверждение → оформление
+через диспетчер, собранный как в main.py (роутеры и middleware), поддельный Bot API и поддельную таблицу.
+
+    python -m benchmarks.dispatcher_load --users 200 --sheets-latency 0.15 --telegram-latency 0.05
+
+Отчет: пропускная способность, p50/p95/p99 по шагам, вызовы Sheets и Telegram на заказ.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram import Bot  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from config.settings import Config  # noqa: E402
+from benchmarks.fakes import FakeTelegramSession, UpdateFactory, install_fake_sheets  # noqa: E402
+
+FIRST_USER_ID = 10 ** 9
+
+STEPS = [
+    ("start", lambda user: ("message", "/start")),
+    ("menu", lambda user: ("callback", "menu")),
+    ("select", lambda user: ("callback", f"select_{user['dish_id']}_a")),
+    ("quantity", lambda user: ("callback", f"quantity_{user['quantity']}")),
+    ("cart", lambda user: ("callback", "cart")),
+    ("confirm", lambda user: ("callback", "confirm_order")),
+    ("finalize", lambda user: ("callback", "finalize_order")),
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * p / 100), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LoadBenchmark:
+    def __init__(self, users, dishes, sheets_latency, telegram_latency, think_time, storage=None, journal=None):
+        # Импорт после настройки окружения: хэндлеры создают сервис таблиц при импорте
+        from main import create_dispatcher
+        from services.google_sheets import sheets_service
+        from services.order_journal import OrderJournal, OrderPipeline
+
+        self.user_ids = [FIRST_USER_ID + i for i in range(users)]
+        self.dishes = dishes
+        self.think_time = think_time
+        self.spreadsheet = install_fake_sheets(sheets_service, self.user_ids, dishes, sheets_latency)
+        self.session = FakeTelegramSession(telegram_latency)
+        self.bot = Bot("42:benchmark", session=self.session)
+        # Как в main.py: при ORDER_JOURNAL заказы идут через журнал (во временном каталоге)
+        self.order_pipeline = None
+        if Config.ORDER_JOURNAL if journal is None else journal:
+            journal_path = os.path.join(tempfile.mkdtemp(prefix="bench_journal_"), "orders_journal.sqlite3")
+            self.order_pipeline = OrderPipeline(OrderJournal(journal_path), sheets_service)
+        self.dp = create_dispatcher(self.bot, storage or MemoryStorage(), self.order_pipeline)
+        self.updates = UpdateFactory()
+        self.latencies = {name: [] for name, _ in STEPS}
+        self.errors = 0
+
+    async def run_user(self, user_id):
+        user = {'dish_id': random.randint(1, self.dishes), 'quantity': random.randint(1, 3)}
+        for name, make in STEPS:
+            kind, payload = make(user)
+            if kind == "message":
+                update = self.updates.message(user_id, payload)
+            else:
+                update = self.updates.callback(user_id, payload, self.session.last_message_id.get(user_id, 1))
+            started = time.perf_counter()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.errors += 1
+                logging.getLogger(__name__).error(f"❌ Шаг {name} пользователя {user_id}: {e}")
+            self.latencies[name].append(time.perf_counter() - started)
+            if self.think_time:
+                await asyncio.sleep(random.uniform(0, self.think_time))
+
+    async def run(self):
+        if self.order_pipeline is not None:
+            self.order_pipeline.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_user(user_id) for user_id in self.user_ids))
+        elapsed = time.perf_counter() - started
+        if self.order_pipeline is not None:
+            # Остаток журнала переносится в таблицу до отчета (в замер времени не входит)
+            await self.order_pipeline.stop()
+        return elapsed
+
+    def report(self, elapsed):
+        orders = len(self.spreadsheet.worksheet("Заказы").rows) - 1
+        updates = sum(len(values) for values in self.latencies.values())
+        sheets_calls = self.spreadsheet.api_calls
+        telegram_calls = self.session.calls
+
+        mode = "журнал" if self.order_pipeline is not None else "прямая запись"
+        print(f"\nПользователей: {len(self.user_ids)}, апдейтов: {updates}, заказов: {orders} ({mode}), "
+              f"ошибок: {self.errors}")
+        print(f"Время: {elapsed:.2f} с, {updates / elapsed:.0f} апдейтов/с, {orders / elapsed:.1f} заказов/с\n")
+        print(f"{'шаг':<10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'макс, мс':>10}")
+        for name, values in self.latencies.items():
+            values = sorted(values)
+            print(f"{name:<10}" + "".join(
+                f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 95, 99, 100)
+            ))
+
+        per_order = max(orders, 1)
+        print(f"\nSheets API: {sum(sheets_calls.values())} вызовов, {sum(sheets_calls.values()) / per_order:.2f} на заказ")
+        for name, count in sheets_calls.most_common():
+            print(f"  {name:<32}{count:>8}{count / per_order:>10.2f}")
+        print(f"Telegram API: {sum(telegram_calls.values())} вызовов, "
+              f"{sum(telegram_calls.values()) / per_order:.2f} на заказ")
+        for name, count in telegram_calls.most_common():
+            print(f"  {name:<32}{count:>8}{count / per_order:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный бенчмарк диспетчера бота")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--dishes", type=int, default=40)
+    parser.add_argument("--sheets-latency", type=float, default=0.0, help="задержка вызова Sheets, с")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="задержка вызова Bot API, с")
+    parser.add_argument("--think-time", type=float, default=0.0, help="пауза пользователя между шагами, до N с")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-journal", action="store_true", help="заказы сразу в таблицу, без журнала")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    Config.TEST_MODE = True  # дедлайн не мешает оформлять заказы в любое время
+
+    benchmark = LoadBenchmark(args.users, args.dishes, args.sheets_latency, args.telegram_latency, args.think_time,
+                              journal=False if args.no_journal else None)
+    elapsed = asyncio.run(benchmark.run())
+    benchmark.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
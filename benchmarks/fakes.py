@@ -0,0 +1,226 @@
+"""
+Подделки внешних систем для бенчмарков: сессия Telegram Bot API и таблица Google Sheets.
+Хэндлеры и сервисы бота работают с ними без изменений.
+"""
+import asyncio
+import itertools
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage, EditMessageText
+from aiogram.types import Chat, Message, Update
+
+MENU_HEADER = ["ID", "Кафе", "Название", "Описание", "Активно", "Дата_начала", "Дата_окончания", "Цена"]
+EMPLOYEES_HEADER = ["Telegram ID", "ФИО", "Роль", "Статус", "Дата регистрации"]
+ORDERS_HEADER = ["ID", "Дата_заказа", "Дата_доставки", "Сотрудник", "Кафе", "Состав", "Сумма", "Статус"]
+SETTINGS_ROWS = [
+    ["Ключ", "Значение", "Описание"],
+    ["order_deadline_hour", "10", ""],
+    ["order_deadline_minute", "0", ""],
+    ["default_delivery_time", "13:00-14:00", ""],
+]
+CAFES = ["Coffee Time", "Пекарня", "Суши Бар"]
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Сессия Bot API без сети: запоминает вызовы по методам и отвечает
+    правдоподобными объектами с задержкой latency секунд.
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+        self.last_message_id = {}  # chat_id -> последнее отправленное ботом сообщение
+        self._message_ids = itertools.count(1000)
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(method, (SendMessage, EditMessageText)):
+            if isinstance(method, SendMessage):
+                message_id = self.last_message_id[method.chat_id] = next(self._message_ids)
+            else:
+                message_id = method.message_id
+            return Message(
+                message_id=message_id, date=datetime.now(), text=method.text,
+                chat=Chat(id=method.chat_id, type="private"), reply_markup=method.reply_markup
+            ).as_(bot)
+        return True
+
+
+class FakeWorksheet:
+    """Лист с методами gspread, которые использует бот; каждый вызов «стоит» latency секунд"""
+
+    def __init__(self, title, rows, latency=0.0):
+        self.title = title
+        self.id = abs(hash(title)) % 10 ** 6
+        self.rows = rows
+        self.latency = latency
+        self.calls = Counter()
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)  # gspread синхронный — как и в жизни, блокирует поток
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        return [[str(value) for value in row] for row in self.rows]
+
+    def get_all_records(self):
+        self._call("get_all_records")
+        header = self.rows[0]
+        return [dict(zip(header, row)) for row in self.rows[1:]]
+
+    def row_values(self, row):
+        self._call("row_values")
+        values = [str(value) for value in self.rows[row - 1]] if row <= len(self.rows) else []
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def update_cell(self, row, col, value):
+        self._call("update_cell")
+        self.rows[row - 1][col - 1] = value
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows")
+        self.rows.extend(list(row) for row in values)
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update")
+        for item in data:
+            match = re.match(r"([A-Z]+)(\d+)", item["range"].split("!")[-1])
+            col = ord(match.group(1)[0]) - ord("A")
+            start = int(match.group(2)) - 1
+            for offset, values in enumerate(item["values"]):
+                while len(self.rows) <= start + offset:
+                    self.rows.append([""] * len(self.rows[0]))
+                row = self.rows[start + offset]
+                row.extend([""] * (col + len(values) - len(row)))
+                row[col:col + len(values)] = values
+
+    def find(self, query):
+        self._call("find")
+        for row_idx, row in enumerate(self.rows):
+            for col_idx, value in enumerate(row):
+                if str(value) == query:
+                    return type("Cell", (), {"row": row_idx + 1, "col": col_idx + 1})()
+        return None
+
+    def delete_rows(self, index):
+        self._call("delete_rows")
+        del self.rows[index - 1]
+
+
+class FakeSpreadsheet:
+    title = "benchmark"
+
+    def __init__(self, worksheets):
+        self._worksheets = {ws.title: ws for ws in worksheets}
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+    def worksheet(self, name):
+        return self._worksheets[name]
+
+    @property
+    def api_calls(self):
+        total = Counter()
+        for ws in self._worksheets.values():
+            for name, count in ws.calls.items():
+                total[f"{name}:{ws.title}"] += count
+        return total
+
+
+def generate_menu(dishes=40):
+    today = datetime.now().strftime("%Y-%m-%d")
+    next_year = (datetime.now() + timedelta(days=365)).strftime("%Y-%m-%d")
+    rows = [list(MENU_HEADER)]
+    for dish_id in range(1, dishes + 1):
+        rows.append([dish_id, CAFES[dish_id % len(CAFES)], f"Блюдо {dish_id}", "Описание блюда",
+                     "Да", today, next_year, 100 + dish_id * 5])
+    return rows
+
+
+def generate_employees(user_ids):
+    rows = [list(EMPLOYEES_HEADER)]
+    rows.extend([user_id, f"Сотрудник {user_id}", "employee", "active", "2024-01-01"] for user_id in user_ids)
+    return rows
+
+
+def generate_orders(count, user_ids, dishes=40, days=90, seed=1):
+    """История заказов в формате листа «Заказы» за последние days дней"""
+    rng = random.Random(seed)
+    today = datetime.now()
+    rows = [list(ORDERS_HEADER)]
+    for order_id in range(1, count + 1):
+        order_date = today - timedelta(days=rng.randrange(days))
+        items, total = [], 0
+        for _ in range(rng.randint(1, 4)):
+            dish_id, quantity = rng.randint(1, dishes), rng.randint(1, 3)
+            items.append(f"Блюдо {dish_id} x{quantity}")
+            total += (100 + dish_id * 5) * quantity
+        rows.append([
+            order_id, order_date.strftime("%Y-%m-%d"), (order_date + timedelta(days=1)).strftime("%Y-%m-%d"),
+            rng.choice(user_ids), CAFES[order_id % len(CAFES)], "; ".join(items), total,
+            "delivered" if order_date.date() < today.date() else "active"
+        ])
+    return rows
+
+
+def install_fake_sheets(sheets, user_ids, dishes=40, latency=0.0, orders=None):
+    """Подключить сервис таблиц к поддельной таблице (вместо Google) и вернуть ее"""
+    spreadsheet = FakeSpreadsheet([
+        FakeWorksheet("Меню", generate_menu(dishes), latency),
+        FakeWorksheet("Сотрудники", generate_employees(user_ids), latency),
+        FakeWorksheet("Заказы", orders or [list(ORDERS_HEADER)], latency),
+        FakeWorksheet("Настройки", [list(row) for row in SETTINGS_ROWS], latency),
+    ])
+    sheets.is_local_mode = False
+    sheets.spreadsheet = spreadsheet
+    sheets._load_worksheets()
+    return spreadsheet
+
+
+class UpdateFactory:
+    """Синтетические апдейты от имени пользователей"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+
+    def _user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def message(self, user_id, text):
+        update_id = next(self._update_ids)
+        return Update.model_validate({"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": user_id, "type": "private"}, "from": self._user(user_id),
+        }})
+
+    def callback(self, user_id, data, message_id, message_text=""):
+        return Update.model_validate({"update_id": next(self._update_ids), "callback_query": {
+            "id": str(next(self._callback_ids)), "chat_instance": "benchmark", "data": data,
+            "from": self._user(user_id),
+            "message": {"message_id": message_id, "date": int(time.time()), "text": message_text or "…",
+                        "chat": {"id": user_id, "type": "private"}},
+        }})
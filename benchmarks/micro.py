@@ -0,0 +1,143 @@
+"""
+Микробенчмарки обработки данных таблиц на реалистичных объемах:
+нормализация меню, отчеты по заказам, статистика сотрудника, проверка регистрации.
+
+    python -m benchmarks.micro                                  # замер и сравнение с baseline
+    python -m benchmarks.micro --save                           # обновить benchmarks/baseline.json
+    python -m benchmarks.micro --scale 0.1 --filter orders      # быстрый прогон части сценариев
+
+Время — медиана и минимум по повторам, память — пик tracemalloc за один прогон.
+Сценарии cold перечитывают лист (кэш сброшен), warm работают по загруженному кэшу.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import generate_orders, install_fake_sheets  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REGRESSION_THRESHOLD = 0.15  # замедление больше 15% считается регрессией
+
+FIRST_USER_ID = 10 ** 9
+
+
+def build_scenarios(sheets, scale):
+    """Сценарии: имя -> (подготовка перед каждым повтором, замеряемая функция)"""
+    employees = max(int(10_000 * scale), 10)
+    orders = max(int(100_000 * scale), 10)
+    dishes = max(int(2_000 * scale), 10)
+
+    user_ids = [FIRST_USER_ID + i for i in range(employees)]
+    install_fake_sheets(sheets, user_ids, dishes=dishes, orders=generate_orders(orders, user_ids, dishes))
+    last_user = user_ids[-1]
+    unknown_user = FIRST_USER_ID - 1
+
+    def cold(*keys):
+        return lambda: sheets.invalidate(*keys, publish=False)
+
+    def warm(loader):
+        return loader
+
+    return {
+        f"menu.get_active_dishes.cold[{dishes}]": (cold('menu'), sheets.get_active_dishes),
+        f"menu.get_menu_index.cold[{dishes}]": (cold('menu'), sheets.get_menu_index),
+        f"employees.is_user_registered.cold[{employees}]": (
+            cold('employees'), lambda: sheets.is_user_registered(last_user)),
+        f"employees.is_user_registered.warm[{employees}]": (
+            warm(sheets.get_employees), lambda: sheets.is_user_registered(unknown_user)),
+        f"orders.get_all_orders.cold[{orders}]": (cold('orders'), sheets.get_all_orders),
+        f"orders.get_orders_report.week.warm[{orders}]": (
+            warm(sheets.get_all_orders), lambda: sheets.get_orders_report("неделя")),
+        f"orders.get_orders_report.all.warm[{orders}]": (
+            warm(sheets.get_all_orders), lambda: sheets.get_orders_report("все")),
+        f"orders.get_user_stats.warm[{orders}]": (
+            warm(sheets.get_all_orders), lambda: sheets.get_user_stats(user_ids[0])),
+    }
+
+
+def measure(setup, func, repeat):
+    """Время (медиана и минимум, с) и пик памяти (байт) вызова func"""
+    timings = []
+    for _ in range(repeat):
+        setup()
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'median': statistics.median(timings), 'min': min(timings), 'peak_memory': peak}
+
+
+def compare(results, baseline):
+    """Сравнение с сохраненными результатами; возвращает число регрессий"""
+    regressions = 0
+    print(f"\n{'сценарий':<52}{'медиана, мс':>13}{'baseline':>11}{'Δ':>8}{'память, КБ':>12}{'Δ':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        line = f"{name:<52}{result['median'] * 1000:>13.2f}"
+        if base is None:
+            print(line + f"{'—':>11}{'':>8}{result['peak_memory'] / 1024:>12.0f}")
+            continue
+        time_delta = result['median'] / base['median'] - 1 if base['median'] else 0.0
+        memory_delta = result['peak_memory'] / base['peak_memory'] - 1 if base['peak_memory'] else 0.0
+        flag = ""
+        if time_delta > REGRESSION_THRESHOLD or memory_delta > REGRESSION_THRESHOLD:
+            flag = "  ⚠️ регрессия"
+            regressions += 1
+        print(line + f"{base['median'] * 1000:>11.2f}{time_delta:>+8.0%}"
+                     f"{result['peak_memory'] / 1024:>12.0f}{memory_delta:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микробенчмарки обработки данных таблиц")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель объемов (1.0 — 10k сотрудников, 100k заказов)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="только сценарии, содержащие подстроку")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты как baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    from services.google_sheets import GoogleSheetsService
+    sheets = GoogleSheetsService()
+
+    results = {}
+    for name, (setup, func) in build_scenarios(sheets, args.scale).items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(setup, func, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    regressions = compare(results, baseline)
+
+    if args.save:
+        merged = dict(baseline, **results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'saved_at': time.strftime("%Y-%m-%d %H:%M"),
+                       'results': merged}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n💾 Baseline сохранен: {args.baseline}")
+    elif regressions:
+        print(f"\n⚠️ Регрессий: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,12 +14,54 @@ class Config:
     ORDER_DEADLINE_MINUTE = int(os.getenv("ORDER_DEADLINE_MINUTE", 0))
     TEST_MODE = os.getenv("TEST_MODE", "False").lower() == "true"
     LOCAL_MODE = os.getenv("LOCAL_MODE", "False").lower() == "true"
+    PREWARM_MINUTES = int(os.getenv("PREWARM_MINUTES", 35))
+    NOTIFY_BEFORE_DELIVERY_MINUTES = int(os.getenv("NOTIFY_BEFORE_DELIVERY_MINUTES", 60))
+    BROADCAST_RATE = int(os.getenv("BROADCAST_RATE", 25))  # лимит Telegram ~30 сообщений/с
+    BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 8))
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")  # sqlite | redis | memory
+    FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+    FSM_TTL = int(os.getenv("FSM_TTL", 86400))  # сутки без активности — состояние и корзина удаляются
+    FSM_SWEEP_INTERVAL = int(os.getenv("FSM_SWEEP_INTERVAL", 600))
+    BOT_MODE = os.getenv("BOT_MODE", "polling")  # polling | webhook
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+    WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", 40))
+    WEBHOOK_DRAIN_TIMEOUT = int(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 25))
+    WORKER_URLS = os.getenv("WORKER_URLS", "")  # адреса воркеров для front.py через запятую
+    FRONT_LANES = int(os.getenv("FRONT_LANES", 8))  # параллельных очередей пересылки на воркер
+    CACHE_BUS = os.getenv("CACHE_BUS", "none")  # none | sqlite | redis — сброс кэша между процессами
+    LEADER_BACKEND = os.getenv("LEADER_BACKEND", "sqlite")  # sqlite | redis (DATA_DIR общий для машин) | none
+    LEADER_TTL = int(os.getenv("LEADER_TTL", 30))  # через сколько секунд без продления лидерство переходит
+    ORDER_JOURNAL = os.getenv("ORDER_JOURNAL", "True").lower() == "true"  # заказы через локальный журнал
+    ORDER_DEDUPE_TTL = int(os.getenv("ORDER_DEDUPE_TTL", 600))  # сколько помнить подтверждения заказов, с
+    SHEETS_TIMEOUT = int(os.getenv("SHEETS_TIMEOUT", 60))  # ожидание ответа Google Sheets API, с
+    CALLBACK_PROGRESS_DELAY = float(os.getenv("CALLBACK_PROGRESS_DELAY", 1))  # через сколько секунд показать «⏳», с
+    STARTUP_BUDGET = float(os.getenv("STARTUP_BUDGET", 5))  # допустимое время от запуска до первого апдейта, с
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9090))  # 0 — сервер метрик отключен
+    HEALTH_MAX_DATA_AGE = int(os.getenv("HEALTH_MAX_DATA_AGE", 900))  # старше — /healthz сообщает stale
+    HEALTH_PROBE_INTERVAL = int(os.getenv("HEALTH_PROBE_INTERVAL", 30))  # /healthz опрашивает Sheets не чаще, с
+    API_STATS_PATH = os.getenv("API_STATS_PATH", os.path.join(DATA_DIR, "sheets_api_calls.json"))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # уровни по модулям: "aiogram=WARNING,services.google_sheets=DEBUG"
+    LOG_SAMPLING = os.getenv("LOG_SAMPLING", "aiogram.event=20")  # каждая N-я частая запись модуля
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
 
     @classmethod
     def update_from_env(cls):
         """Обновление настроек из переменных окружения"""
         for key, value in os.environ.items():
-            if key in ["ORDER_DEADLINE_HOUR", "ORDER_DEADLINE_MINUTE"]:
+            if key in ["ORDER_DEADLINE_HOUR", "ORDER_DEADLINE_MINUTE", "PREWARM_MINUTES",
+                       "NOTIFY_BEFORE_DELIVERY_MINUTES", "BROADCAST_RATE", "BROADCAST_CONCURRENCY",
+                       "FSM_TTL", "FSM_SWEEP_INTERVAL", "LOG_QUEUE_SIZE",
+                       "WEBHOOK_PORT", "WEBHOOK_MAX_IN_FLIGHT", "WEBHOOK_DRAIN_TIMEOUT", "FRONT_LANES",
+                       "LEADER_TTL", "METRICS_PORT", "HEALTH_MAX_DATA_AGE", "HEALTH_PROBE_INTERVAL",
+                       "ORDER_DEDUPE_TTL", "SHEETS_TIMEOUT"]:
                 setattr(cls, key, int(value))
-            elif key in ["TEST_MODE", "LOCAL_MODE"]:
+            elif key in ["TEST_MODE", "LOCAL_MODE", "ORDER_JOURNAL"]:
                 setattr(cls, key, value.lower() == "true")
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Фронтовой процесс для запуска нескольких воркеров бота.
+
+    WEBHOOK_PORT=8081 BOT_MODE=webhook CACHE_BUS=sqlite python main.py
+    WEBHOOK_PORT=8082 BOT_MODE=webhook CACHE_BUS=sqlite python main.py
+    WORKER_URLS=http://127.0.0.1:8081/webhook,http://127.0.0.1:8082/webhook WEBHOOK_URL=https://... python front.py
+"""
+import asyncio
+import logging
+from aiogram import Bot
+from config.settings import Config
+from services.front import run_front
+from utils.logging_setup import setup_logging, stop_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    if not Config.BOT_TOKEN:
+        logger.critical("❌ ОШИБКА: Не указан TELEGRAM_BOT_TOKEN в .env")
+        return
+
+    bot = Bot(token=Config.BOT_TOKEN)
+    try:
+        await run_front(bot)
+    finally:
+        await bot.session.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("⏹️ Фронт завершил работу по Ctrl+C")
+    finally:
+        stop_logging()
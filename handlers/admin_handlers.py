@@ -1,13 +1,36 @@
+import asyncio
+import io
+import time
+import logging
+from datetime import datetime, timedelta
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton
+from aiogram.filters import Command, CommandObject
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from config.settings import Config
-from services.google_sheets import GoogleSheetsService
+from services.google_sheets import sheets_service
+from services import menu_import
+from utils.pagination import paginate, build_nav_row, fit_message, ADMIN_PAGE_SIZE
+from utils.api_trace import api_call_stats
+from utils.date_utils import deadline_clock
+from utils.safe_message_edit import safe_edit_message, safe_answer_callback
 
 router = Router()
-sheets = GoogleSheetsService()
+sheets = sheets_service
+logger = logging.getLogger(__name__)
+
+# Активные рассылки: run_id -> событие отмены
+active_broadcasts = {}
+_background_tasks = set()
+
+
+def run_in_background(coro):
+    """Запуск фоновой задачи с удержанием ссылки до ее завершения"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
 
 def is_admin(user_id: int) -> bool:
@@ -23,12 +46,44 @@ async def cmd_admin(message: Message):
     admin_text = (
         "👑 Панель администратора:\n\n"
         "• /toggle_dish — Активировать/деактивировать блюдо\n"
-        "• /add_dish — Добавить новое блюдо (в разработке)\n\n"
+        "• /add_dish — Добавить новое блюдо (в разработке)\n"
+        "• /import_menu — Загрузить меню из CSV/XLSX\n"
+        "• /broadcast текст — Рассылка всем сотрудникам\n"
+        "• /kitchen [дата] — Итоги заказов по кафе для кухни\n"
+        "• /stats — Вызовы Google Sheets API по обработчикам\n\n"
         "💡 Совет: убедитесь, что таблица открыта и имеет лист «Меню» с колонками ID, Название, Активно"
     )
     await message.answer(admin_text)
 
 
+def render_toggle_page(all_dishes, page, title="🔄 Выберите блюдо для переключения статуса:"):
+    """Страница списка блюд для переключения статуса"""
+    page_dishes, page, pages = paginate(all_dishes, page, ADMIN_PAGE_SIZE)
+
+    text = f"{title}\n\n"
+    for dish in page_dishes:
+        status = "✅ Активно" if dish["Активно"].lower() in ("да", "yes", "1", "true") else "❌ Неактивно"
+        text += f"• ID {dish['ID']}: {dish['Название']} — {status}\n"
+    if pages > 1:
+        text += f"\n📄 Страница {page + 1} из {pages}"
+
+    keyboard = InlineKeyboardBuilder()
+    for dish in page_dishes:
+        dish_id = dish["ID"]
+        if len(dish_id) > 50:  # защита от переполнения callback_data (64 байта)
+            continue
+        btn_text = f"ID {dish_id}: {dish['Название']}"
+        keyboard.button(text=btn_text[:30], callback_data=f"tgl_{dish_id}_{page}")  # обрезаем длинные названия
+
+    keyboard.adjust(1)
+    nav_row = build_nav_row("tglp_", page, pages)
+    if nav_row:
+        keyboard.row(*nav_row)
+    keyboard.row(InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_admin"))
+
+    return fit_message(text + "\n👇 Нажмите на блюдо:"), keyboard.as_markup()
+
+
 @router.message(Command("toggle_dish"))
 async def cmd_toggle_dish(message: Message):
     if not is_admin(message.from_user.id):
@@ -39,19 +94,7 @@ async def cmd_toggle_dish(message: Message):
         return
 
     try:
-        dishes = sheets.get_active_dishes()
-        # Получаем ВСЕ блюда (не только активные), чтобы можно было активировать неактивные
-        all_dishes_raw = sheets.get_worksheet("Меню").get_all_records()
-        all_dishes = []
-        for d in all_dishes_raw:
-            try:
-                all_dishes.append({
-                    "ID": str(d.get("ID", "")).strip(),
-                    "Название": str(d.get("Название", "Без названия")).strip(),
-                    "Активно": str(d.get("Активно", "Нет")).strip()
-                })
-            except:
-                continue
+        all_dishes = await asyncio.to_thread(sheets.get_all_dishes)
     except Exception as e:
         await message.answer(f"⚠️ Ошибка загрузки блюд: {e}")
         return
@@ -60,40 +103,42 @@ async def cmd_toggle_dish(message: Message):
         await message.answer("📋 В таблице нет блюд.")
         return
 
-    text = "🔄 Выберите блюдо для переключения статуса:\n\n"
-    for dish in all_dishes:
-        status = "✅ Активно" if dish["Активно"].lower() in ("да", "yes", "1", "true") else "❌ Неактивно"
-        text += f"• ID {dish['ID']}: {dish['Название']} — {status}\n"
+    text, keyboard = render_toggle_page(all_dishes, 0)
+    try:
+        await message.answer(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        await message.answer(f"❌ Ошибка отправки клавиатуры: {e}")
 
-    keyboard = InlineKeyboardBuilder()
-    for dish in all_dishes:
-        dish_id = dish["ID"]
-        if len(dish_id) > 50:  # защита от переполнения callback_data (64 байта)
-            continue
-        btn_text = f"ID {dish_id}: {dish['Название']}"
-        keyboard.button(text=btn_text[:30], callback_data=f"tgl_{dish_id}")  # обрезаем длинные названия
 
-    keyboard.adjust(1)
-    keyboard.row(
-        InlineKeyboardBuilder()
-        .button(text="⬅️ Назад", callback_data="back_to_admin")
-        .as_markup()
-        .inline_keyboard[0][0]
-    )
+@router.callback_query(F.data.startswith("tglp_"))
+async def handle_toggle_page(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        return
 
     try:
-        await message.answer(text + "\n👇 Нажмите на блюдо:", reply_markup=keyboard.as_markup())
-    except TelegramBadRequest as e:
-        await message.answer(f"❌ Ошибка отправки клавиатуры: {e}")
+        page = int(callback.data.split("_", 1)[1])
+        all_dishes = await asyncio.to_thread(sheets.get_all_dishes)
+    except Exception as e:
+        await callback.message.answer(f"⚠️ Ошибка загрузки блюд: {e}")
+        return
+
+    text, keyboard = render_toggle_page(all_dishes, page)
+    try:
+        await safe_edit_message(callback, text, reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass
 
 
 @router.callback_query(F.data == "back_to_admin")
 async def back_to_admin(callback: CallbackQuery):
-    await callback.answer()
     admin_text = (
         "👑 Панель администратора:\n\n"
         "• /toggle_dish — Активировать/деактивировать блюдо\n"
-        "• /add_dish — Добавить новое блюдо (в разработке)"
+        "• /add_dish — Добавить новое блюдо (в разработке)\n"
+        "• /import_menu — Загрузить меню из CSV/XLSX\n"
+        "• /broadcast текст — Рассылка всем сотрудникам\n"
+        "• /kitchen [дата] — Итоги заказов по кафе для кухни\n"
+        "• /stats — Вызовы Google Sheets API по обработчикам"
     )
     try:
         await callback.message.edit_text(admin_text)
@@ -101,68 +146,357 @@ async def back_to_admin(callback: CallbackQuery):
         await callback.message.answer(admin_text)
 
 
-@router.callback_query(F.data.startswith("tgl_"))
+# Отвечает сам: результат переключения показывается во всплывающем уведомлении
+@router.callback_query(F.data.startswith("tgl_"), flags={"ack": False})
 async def handle_toggle_dish(callback: CallbackQuery):
-    await callback.answer()
     if not is_admin(callback.from_user.id):
-        await callback.message.answer("🚫 Доступ запрещён")
+        await safe_answer_callback(callback, "🚫 Доступ запрещён", show_alert=True)
         return
 
     try:
-        dish_id_str = callback.data.split("_", 1)[1]
-        dish_id = int(dish_id_str)
+        parts = callback.data.split("_")
+        dish_id = int(parts[1])
+        page = int(parts[2]) if len(parts) > 2 else 0
     except (ValueError, IndexError, TypeError):
-        await callback.message.answer("⚠️ Некорректный ID блюда")
+        await safe_answer_callback(callback, "⚠️ Некорректный ID блюда", show_alert=True)
         return
 
     try:
-        success = sheets.toggle_dish_status(dish_id)
+        success = await asyncio.to_thread(sheets.toggle_dish_status, dish_id)
     except Exception as e:
-        await callback.message.answer(f"❌ Ошибка сервера: {e}")
+        await safe_answer_callback(callback, f"❌ Ошибка сервера: {e}", show_alert=True)
         return
 
-    if success:
-        status_msg = f"✅ Статус блюда ID {dish_id} изменён"
+    if not success:
+        await safe_answer_callback(callback, f"⚠️ Блюдо ID {dish_id} не найдено или ошибка обновления", show_alert=True)
+        return
+
+    # Список перерисовывается из кэша, уже учитывающего новый статус, — в том же сообщении
+    all_dishes = await asyncio.to_thread(sheets.get_all_dishes)
+    dish = next((d for d in all_dishes if d["ID"] == str(dish_id)), None)
+    status = dish["Активно"] if dish else "изменён"
+    await safe_answer_callback(callback, f"✅ Блюдо ID {dish_id}: Активно — {status}")
+
+    text, keyboard = render_toggle_page(all_dishes, page)
+    try:
+        await safe_edit_message(callback, text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        await callback.message.answer(f"⚠️ Ошибка обновления: {e}")
+
+
+def get_broadcast_keyboard(run_id, running, has_failures=False):
+    keyboard = InlineKeyboardBuilder()
+    if running:
+        keyboard.button(text="⛔ Остановить", callback_data=f"bc_cancel_{run_id}")
+    elif has_failures:
+        keyboard.button(text="🔁 Повторить неудачные", callback_data=f"bc_retry_{run_id}")
+    keyboard.adjust(1)
+    return keyboard.as_markup()
+
+
+def format_broadcast_progress(stats, finished=False):
+    processed = stats['sent'] + stats['failed']
+    if not finished:
+        header = "📣 Рассылка выполняется..."
+    elif stats['cancelled']:
+        header = "⛔ Рассылка остановлена"
     else:
-        status_msg = f"⚠️ Блюдо ID {dish_id} не найдено или ошибка обновления"
+        header = "✅ Рассылка завершена"
+    text = (
+        f"{header}\n\n"
+        f"📨 Обработано: {processed} из {stats['queued']}\n"
+        f"✅ Доставлено: {stats['sent']}\n"
+        f"❌ Ошибок: {stats['failed']}\n"
+        f"⏱ {stats['elapsed']:.0f} с ({stats['rate']:.1f} сообщ./с)"
+    )
+    if finished and stats.get('failed_total'):
+        text += f"\n\n⚠️ Не доставлено всего: {stats['failed_total']}"
+    return text
 
-    await callback.message.answer(status_msg)
 
-    # Обновляем список блюд
+async def run_broadcast(status_message: Message, broadcaster, run_id, recipients=None, text=None,
+                        only_failed=False):
+    """Фоновая рассылка с обновлением сообщения о прогрессе"""
+    cancel_event = asyncio.Event()
+    active_broadcasts[run_id] = cancel_event
+    last_edit = 0.0
+
+    async def progress(stats):
+        nonlocal last_edit
+        # Не редактируем сообщение о прогрессе чаще раза в 3 секунды
+        if time.monotonic() - last_edit < 3:
+            return
+        last_edit = time.monotonic()
+        try:
+            await status_message.edit_text(
+                format_broadcast_progress(stats),
+                reply_markup=get_broadcast_keyboard(run_id, running=True)
+            )
+        except TelegramBadRequest:
+            pass
+
     try:
-        all_dishes_raw = sheets.get_worksheet("Меню").get_all_records()
-        all_dishes = []
-        for d in all_dishes_raw:
-            all_dishes.append({
-                "ID": str(d.get("ID", "")).strip(),
-                "Название": str(d.get("Название", "Без названия")).strip(),
-                "Активно": str(d.get("Активно", "Нет")).strip()
-            })
+        stats = await broadcaster.run(run_id, recipients, text, only_failed=only_failed,
+                                      progress=progress, cancel_event=cancel_event)
     except Exception as e:
-        await callback.message.answer(f"⚠️ Не удалось обновить список: {e}")
+        logger.error(f"❌ Ошибка рассылки {run_id}: {e}", exc_info=True)
+        await status_message.answer(f"❌ Ошибка рассылки: {e}")
         return
+    finally:
+        active_broadcasts.pop(run_id, None)
 
-    text = "🔄 Текущие блюда:\n\n"
-    for dish in all_dishes:
-        status = "✅ Активно" if dish["Активно"].lower() in ("да", "yes", "1", "true") else "❌ Неактивно"
-        text += f"• ID {dish['ID']}: {dish['Название']} — {status}\n"
+    try:
+        await status_message.edit_text(
+            format_broadcast_progress(stats, finished=True),
+            reply_markup=get_broadcast_keyboard(run_id, running=False, has_failures=bool(stats['failed_total']))
+        )
+    except TelegramBadRequest:
+        await status_message.answer(format_broadcast_progress(stats, finished=True))
 
-    keyboard = InlineKeyboardBuilder()
-    for dish in all_dishes:
-        dish_id = dish["ID"]
-        if len(dish_id) > 50:
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, command: CommandObject, broadcaster):
+    if not is_admin(message.from_user.id):
+        return
+
+    text = (command.args or "").strip()
+    if not text:
+        await message.answer("📣 Использование: /broadcast текст сообщения\n\nПример: /broadcast Кафе закрыто завтра")
+        return
+
+    employees = await asyncio.to_thread(sheets.get_employees)
+    recipients = []
+    for employee in employees:
+        if str(employee.get("Статус", "")).strip().lower() != "active":
             continue
-        btn_text = f"ID {dish_id}: {dish['Название']}"
-        keyboard.button(text=btn_text[:30], callback_data=f"tgl_{dish_id}")
-    keyboard.adjust(1)
-    keyboard.row(
-        InlineKeyboardBuilder()
-        .button(text="⬅️ Назад", callback_data="back_to_admin")
-        .as_markup()
-        .inline_keyboard[0][0]
+        try:
+            recipients.append(int(str(employee.get("Telegram ID", "")).strip()))
+        except ValueError:
+            continue
+
+    if not recipients:
+        await message.answer("👥 Нет активных сотрудников для рассылки.")
+        return
+
+    run_id = f"announce_{message.chat.id}_{message.message_id}"
+    status_message = await message.answer(
+        f"📣 Рассылка запущена: {len(recipients)} получателей",
+        reply_markup=get_broadcast_keyboard(run_id, running=True)
+    )
+    run_in_background(run_broadcast(status_message, broadcaster, run_id, recipients, text))
+
+
+@router.callback_query(F.data.startswith("bc_cancel_"), flags={"ack": False})
+async def handle_broadcast_cancel(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён")
+        return
+
+    run_id = callback.data[len("bc_cancel_"):]
+    cancel_event = active_broadcasts.get(run_id)
+    if cancel_event is None:
+        await callback.answer("Рассылка уже завершена")
+        return
+    cancel_event.set()
+    await callback.answer("⛔ Останавливаю рассылку...")
+
+
+@router.callback_query(F.data.startswith("bc_retry_"), flags={"ack": False})
+async def handle_broadcast_retry(callback: CallbackQuery, broadcaster):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён")
+        return
+
+    run_id = callback.data[len("bc_retry_"):]
+    if run_id in active_broadcasts:
+        await callback.answer("Рассылка уже выполняется")
+        return
+
+    checkpoint = broadcaster.load_checkpoint(run_id)
+    if not checkpoint.data['failed']:
+        await callback.answer("✅ Все сообщения доставлены")
+        return
+
+    await callback.answer(f"🔁 Повторная отправка: {len(checkpoint.data['failed'])}")
+    run_in_background(run_broadcast(callback.message, broadcaster, run_id, only_failed=True))
+
+
+def format_kitchen_totals(delivery_date, totals, frozen):
+    """Итоги по кафе: число заказов, сумма и сколько готовить каждого блюда"""
+    status = "🧊 список зафиксирован" if frozen else "⏳ заказы еще принимаются"
+    lines = [f"👨‍🍳 Заказы на {delivery_date} ({status})"]
+    if not totals:
+        lines.append("\n📭 Заказов нет")
+    for cafe, cafe_totals in sorted(totals.items()):
+        lines.append(f"\n🏪 {cafe} — заказов: {cafe_totals['orders']}, сумма: {cafe_totals['total']}₽")
+        for name, quantity in sorted(cafe_totals['dishes'].items(), key=lambda item: (-item[1], item[0])):
+            lines.append(f"• {name} — {quantity}")
+    return "\n".join(lines)
+
+
+@router.message(Command("kitchen"))
+async def cmd_kitchen(message: Message, command: CommandObject):
+    """Итоги для кухни на дату доставки: /kitchen (завтра), /kitchen сегодня, /kitchen 2024-01-31"""
+    if not is_admin(message.from_user.id):
+        return
+
+    arg = (command.args or "").strip().lower()
+    today = datetime.strptime(deadline_clock.today(), "%Y-%m-%d")
+    if not arg:
+        delivery_date = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+    elif arg == "сегодня":
+        delivery_date = today.strftime("%Y-%m-%d")
+    else:
+        try:
+            delivery_date = datetime.strptime(arg, "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            await message.answer("📅 Использование: /kitchen [сегодня | ГГГГ-ММ-ДД]")
+            return
+
+    try:
+        totals = await asyncio.to_thread(sheets.get_kitchen_totals, delivery_date)
+    except Exception as e:
+        await message.answer(f"⚠️ Ошибка загрузки заказов: {e}")
+        return
+    frozen = delivery_date in sheets.frozen_totals
+    await message.answer(fit_message(format_kitchen_totals(delivery_date, totals, frozen)))
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject):
+    """Вызовы Sheets API на апдейт по обработчикам; /stats reset — начать замер заново"""
+    if not is_admin(message.from_user.id):
+        return
+
+    path = await asyncio.to_thread(api_call_stats.dump, Config.API_STATS_PATH)
+    text = api_call_stats.format_table()
+    if (command.args or "").strip().lower() == "reset":
+        api_call_stats.reset()
+        text += "\n\n🔄 Статистика сброшена"
+    await message.answer(fit_message(f"{text}\n\n💾 {path}"))
+
+
+IMPORT_HELP = (
+    "📥 Импорт меню: отправьте файл .csv или .xlsx с подписью /import_menu\n\n"
+    "Колонки (первая строка): Название и Цена — обязательно; "
+    "ID, Кафе, Описание, Активно, Дата_начала, Дата_окончания — по желанию.\n"
+    "Строки с ID обновляют блюдо с этим ID, без ID — ищутся по кафе и названию или добавляются. "
+    "Пустая ячейка оставляет значение в таблице как есть.\n"
+    "Активные блюда, которых нет в файле, будут выключены.\n\n"
+    "Сначала бот покажет изменения, применяются они только после подтверждения."
+)
+IMPORT_TTL = 30 * 60
+
+# Предпросмотры импорта: отпечаток плана -> (проверенные блюда, время создания)
+pending_imports = {}
+
+
+def get_import_keyboard(signature):
+    keyboard = InlineKeyboardBuilder()
+    keyboard.button(text="✅ Применить", callback_data=f"imp_apply_{signature}")
+    keyboard.button(text="✖️ Отмена", callback_data=f"imp_cancel_{signature}")
+    keyboard.adjust(2)
+    return keyboard.as_markup()
+
+
+@router.message(Command("import_menu"), F.document)
+async def cmd_import_menu_file(message: Message):
+    if not is_admin(message.from_user.id):
+        return
+
+    document = message.document
+    if document.file_size and document.file_size > menu_import.MAX_FILE_SIZE:
+        await message.answer(f"⚠️ Файл больше {menu_import.MAX_FILE_SIZE // (1024 * 1024)} МБ")
+        return
+
+    try:
+        data = (await message.bot.download(document, destination=io.BytesIO())).getvalue()
+        records = menu_import.read_menu_file(document.file_name, data)
+        dishes, errors = await asyncio.to_thread(menu_import.validate_menu_rows, records)
+    except (ValueError, RuntimeError) as e:
+        await message.answer(f"⚠️ {e}")
+        return
+    except Exception as e:
+        logger.error(f"❌ Ошибка чтения файла меню: {e}", exc_info=True)
+        await message.answer(f"❌ Не удалось прочитать файл: {e}")
+        return
+
+    if errors:
+        await message.answer(fit_message("⚠️ Файл не импортирован, исправьте ошибки:\n\n" + "\n".join(errors)))
+        return
+    if not dishes:
+        await message.answer("📋 В файле нет блюд.")
+        return
+
+    try:
+        sheet_values = await asyncio.to_thread(sheets.get_menu_sheet_values)
+        plan = menu_import.build_import_plan(sheet_values, dishes)
+    except Exception as e:
+        await message.answer(f"❌ Не удалось сверить с таблицей: {e}")
+        return
+
+    if plan.is_empty:
+        await message.answer("✅ Меню в таблице уже совпадает с файлом.")
+        return
+
+    now = time.monotonic()
+    for signature in [s for s, (_, created) in pending_imports.items() if now - created > IMPORT_TTL]:
+        del pending_imports[signature]
+    signature = plan.signature()
+    pending_imports[signature] = (dishes, now)
+    await message.answer(
+        fit_message(f"📥 Предпросмотр импорта «{document.file_name}»:\n\n{plan.format_diff()}"),
+        reply_markup=get_import_keyboard(signature)
     )
 
+
+@router.message(Command("import_menu"))
+async def cmd_import_menu(message: Message):
+    if not is_admin(message.from_user.id):
+        return
+    await message.answer(IMPORT_HELP)
+
+
+# Отвечает сам: админ должен увидеть, почему импорт не применен
+@router.callback_query(F.data.startswith("imp_"), flags={"ack": False})
+async def handle_import_decision(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("🚫 Доступ запрещён")
+        return
+
+    action, _, signature = callback.data[len("imp_"):].partition("_")
+    pending = pending_imports.pop(signature, None)
+    if action == "cancel" or pending is None:
+        await callback.answer("Импорт отменен" if action == "cancel" else "Предпросмотр устарел, отправьте файл заново")
+        await safe_edit_message(callback, "✖️ Импорт меню отменен" if action == "cancel" else "⌛ Предпросмотр устарел")
+        return
+
+    dishes, _ = pending
+    answered = False
     try:
-        await callback.message.answer(text + "\n👇 Нажмите на блюдо:", reply_markup=keyboard.as_markup())
-    except TelegramBadRequest as e:
-        await callback.message.answer(f"⚠️ Ошибка обновления: {e}")
\ No newline at end of file
+        # Лист могли изменить после предпросмотра — применяем, только если план тот же
+        sheet_values = await asyncio.to_thread(sheets.get_menu_sheet_values)
+        plan = menu_import.build_import_plan(sheet_values, dishes)
+        if plan.signature() != signature:
+            pending_imports[plan.signature()] = (dishes, time.monotonic())
+            await callback.answer("⚠️ Таблица изменилась после предпросмотра — проверьте новые изменения",
+                                  show_alert=True)
+            await safe_edit_message(
+                callback,
+                fit_message(f"⚠️ Таблица изменилась после предпросмотра. Новые изменения:\n\n{plan.format_diff()}"),
+                reply_markup=get_import_keyboard(plan.signature())
+            )
+            return
+        await callback.answer("⏳ Применяю изменения меню...")
+        answered = True
+        await asyncio.to_thread(sheets.apply_menu_import, plan)
+    except Exception as e:
+        logger.error(f"❌ Ошибка импорта меню: {e}", exc_info=True)
+        if not answered:
+            await safe_answer_callback(callback, "❌ Импорт не выполнен")
+        await callback.message.answer(f"❌ Импорт не выполнен: {e}")
+        return
+
+    # Один раз перечитываем активное меню, чтобы сотрудники сразу видели новое
+    await asyncio.to_thread(sheets.get_active_dishes)
+    await safe_edit_message(callback, fit_message(f"✅ Меню импортировано\n\n{plan.format_diff()}"))
@@ -1,30 +1,31 @@
+import asyncio
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, Message, InlineKeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from services.google_sheets import GoogleSheetsService
+from services.google_sheets import sheets_service
+from services.cart_service import cart_service
 from keyboards.inline_keyboards import (
     get_main_menu_keyboard,
     get_cart_keyboard,
     get_empty_cart_keyboard,
     get_back_keyboard,
     get_quantity_keyboard,
-    get_confirmation_keyboard
+    get_confirmation_keyboard,
+    keyboard_registry
 )
-from utils.date_utils import is_order_deadline_passed
+from utils.date_utils import deadline_clock, is_order_deadline_passed
 from utils.safe_message_edit import safe_edit_message, safe_answer_callback
+from utils.render_cache import menu_render_cache
+from utils.pagination import paginate, page_of, build_nav_row, fit_message, MENU_PAGE_SIZE
 import logging
-from datetime import datetime
 
 router = Router()
-sheets = GoogleSheetsService()
+sheets = sheets_service
 logger = logging.getLogger(__name__)
 
-# Глобальное хранилище корзин (резервный механизм)
-global_carts = {}
-
 
 class OrderStates(StatesGroup):
     viewing_menu = State()
@@ -60,59 +61,113 @@ def format_cart_text(cart):
     return text, total_price
 
 
-def get_user_key(user_id, chat_id):
-    """Генерация уникального ключа для пользователя"""
-    return f"{user_id}_{chat_id}"
+ALL_CAFES = "a"
 
 
-async def save_cart(state: FSMContext, cart, user_id=None, chat_id=None):
-    """Сохранение корзины в состояние и глобальное хранилище"""
-    try:
-        # Сохраняем в состояние FSM
-        await state.update_data(cart=cart)
-        logger.info(f"💾 Корзина сохранена в состояние FSM: {len(cart)} товаров")
-
-        # Резервное сохранение в глобальное хранилище
-        if user_id and chat_id:
-            user_key = get_user_key(user_id, chat_id)
-            global_carts[user_key] = {
-                'cart': cart.copy(),
-                'timestamp': datetime.now().timestamp()
-            }
-            logger.info(f"💾 Корзина сохранена в глобальное хранилище для {user_key}: {len(cart)} товаров")
-    except Exception as e:
-        logger.error(f"❌ Ошибка сохранения корзины: {str(e)}")
-
-
-async def get_cart(state: FSMContext, user_id=None, chat_id=None):
-    """Получение корзины из состояния с резервным механизмом"""
-    try:
-        # Получаем данные из состояния FSM
-        data = await state.get_data()
-        cart = data.get("cart", [])
+def get_menu_slice(menu_index, cafe_filter):
+    """Блюда для фильтра: все ('a') или предвычисленный срез кафе по его номеру"""
+    if cafe_filter != ALL_CAFES:
+        try:
+            return menu_index['by_cafe'][menu_index['cafes'][int(cafe_filter)]]
+        except (ValueError, IndexError, KeyError):
+            pass
+    return menu_index['dishes']
 
-        if cart:
-            logger.info(f"✅ Корзина получена из состояния FSM: {len(cart)} товаров")
-            return cart
 
-        # Попытка получить из глобального хранилища
-        if user_id and chat_id:
-            user_key = get_user_key(user_id, chat_id)
-            cached = global_carts.get(user_key)
+def render_menu_page(menu_index, cafe_filter, page):
+    """Текст и клавиатура страницы меню (зависят только от содержимого меню)"""
+    dishes = get_menu_slice(menu_index, cafe_filter)
+    page_dishes, page, pages = paginate(dishes, page, MENU_PAGE_SIZE)
+
+    menu_text = "✅ Выберите блюдо:\n\n"
+    for dish in page_dishes:
+        price = dish.get('Цена', 0)
+        description = str(dish['Описание'])[:300]
+        menu_text += f"🆔 {dish['ID']} | {dish['Название']} - {price}₽\n📝 {description}\n\n"
+    if pages > 1:
+        menu_text += f"📄 Страница {page + 1} из {pages}"
+
+    keyboard = InlineKeyboardBuilder()
+    for dish in page_dishes:
+        keyboard.button(
+            text=f"{dish['Название']} ({dish.get('Цена', 0)}₽)",
+            callback_data=f"select_{dish['ID']}_{cafe_filter}"
+        )
+    keyboard.adjust(1)
+
+    nav_row = build_nav_row(f"menu_p_{cafe_filter}_", page, pages)
+    if nav_row:
+        keyboard.row(*nav_row)
+
+    # Фильтр по кафе, если их несколько
+    cafes = menu_index['cafes']
+    if len(cafes) > 1:
+        filter_row = [InlineKeyboardButton(
+            text=("• " if cafe_filter == ALL_CAFES else "") + "Все",
+            callback_data=f"menu_p_{ALL_CAFES}_0"
+        )]
+        for i, cafe in enumerate(cafes):
+            filter_row.append(InlineKeyboardButton(
+                text=("• " if cafe_filter == str(i) else "") + cafe[:20],
+                callback_data=f"menu_p_{i}_0"
+            ))
+        for i in range(0, len(filter_row), 3):
+            keyboard.row(*filter_row[i:i + 3])
+
+    keyboard.row(InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_main"))
+    return fit_message(menu_text), keyboard_registry.track(keyboard.as_markup())
+
+
+def get_menu_view(cafe_filter=ALL_CAFES, page=0):
+    """
+    Страница меню из кэша: рендерится при первом запросе и
+    пересобирается только при смене версии данных меню.
+    Страницы одного кафе зависят только от его блюд и списка кафе (кнопки фильтра).
+    """
+    menu_index = sheets.get_menu_index()
+    if not menu_index['dishes']:
+        return None
+    version = menu_index['version']
+    if cafe_filter != ALL_CAFES:
+        try:
+            cafe = menu_index['cafes'][int(cafe_filter)]
+            version = (menu_index['cafe_versions'][cafe], tuple(menu_index['cafes']))
+        except (ValueError, IndexError, KeyError):
+            pass
+    return menu_render_cache.get(
+        f"menu:{cafe_filter}:{page}",
+        version,
+        lambda: render_menu_page(menu_index, cafe_filter, page)
+    )
+
+
+async def prerender_menu():
+    """Шаг прогрева планировщика: рендер первых страниц меню до пика нагрузки"""
+    menu_index = sheets.get_menu_index()
+    get_menu_view()
+    for i in range(len(menu_index['cafes'])):
+        get_menu_view(str(i))
+
+
+async def send_menu_page(callback: CallbackQuery, state: FSMContext, cafe_filter=ALL_CAFES, page=0):
+    menu_view = get_menu_view(cafe_filter, page)
+    if menu_view is None:
+        await safe_answer_callback(callback, "🍽 Меню временно пусто.", show_alert=True)
+        return
 
-            if cached and (datetime.now().timestamp() - cached['timestamp']) < 3600:  # 1 час
-                cart = cached['cart'].copy()
-                # Восстанавливаем корзину в состояние FSM
-                await state.update_data(cart=cart)
-                logger.info(f"✅ Корзина восстановлена из глобального хранилища для {user_key}: {len(cart)} товаров")
-                return cart
+    menu_text, menu_keyboard = menu_view
+    await safe_edit_message(
+        callback,
+        menu_text,
+        menu_keyboard
+    )
+    await set_state_if_changed(state, OrderStates.viewing_menu)
 
-        logger.info("🛒 Корзина пуста (нет данных в FSM и глобальном хранилище)")
-        return []
 
-    except Exception as e:
-        logger.error(f"❌ Ошибка получения корзины: {str(e)}")
-        return []
+async def set_state_if_changed(state: FSMContext, new_state):
+    """Установка состояния FSM без записи в хранилище, если оно не изменилось"""
+    if await state.get_state() != new_state.state:
+        await state.set_state(new_state)
 
 
 async def check_user_registration(callback: CallbackQuery):
@@ -158,60 +213,49 @@ async def cmd_start(message: Message, state: FSMContext):
         await message.answer(WELCOME_TEXT, reply_markup=get_main_menu_keyboard())
 
 
-@router.callback_query(F.data == "menu")
+@router.callback_query(F.data == "menu", flags={"progress": "⏳ Загружаем меню..."})
 async def show_menu(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
-    # Сохраняем текущую корзину перед показом меню
-    current_cart = await get_cart(state, user_id, chat_id)
-    await save_cart(state, current_cart, user_id, chat_id)
+    await send_menu_page(callback, state)
 
-    dishes = sheets.get_active_dishes()
-    if not dishes:
-        await safe_answer_callback(callback, "🍽 Меню временно пусто.", show_alert=True)
+
+@router.callback_query(F.data.startswith("menu_p_"))
+async def show_menu_page(callback: CallbackQuery, state: FSMContext):
+    if not await check_user_registration(callback):
         return
 
-    menu_text = "✅ Выберите блюдо:\n\n"
-    for dish in dishes:
-        price = dish.get('Цена', 0)
-        menu_text += f"🆔 {dish['ID']} | {dish['Название']} - {price}₽\n📝 {dish['Описание']}\n\n"
+    try:
+        _, _, cafe_filter, page = callback.data.split("_")
+        page = int(page)
+    except ValueError:
+        cafe_filter, page = ALL_CAFES, 0
 
-    keyboard = InlineKeyboardBuilder()
-    for dish in dishes:
-        keyboard.button(text=f"{dish['Название']} ({dish.get('Цена', 0)}₽)", callback_data=f"select_{dish['ID']}")
-    keyboard.button(text="⬅️ Назад", callback_data="back_to_main")
-    keyboard.adjust(1)
+    await send_menu_page(callback, state, cafe_filter, page)
 
-    await safe_edit_message(
-        callback,
-        menu_text,
-        keyboard.as_markup()
-    )
-    await state.set_state(OrderStates.viewing_menu)
+
+@router.callback_query(F.data == "noop", flags={"ack": False})
+async def noop_callback(callback: CallbackQuery):
+    await safe_answer_callback(callback, "")
 
 
 @router.callback_query(F.data.startswith("select_"))
 async def select_dish_quantity(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
-    dish_id = callback.data.split("_")[1]
-    dishes = sheets.get_active_dishes()
-    dish = next((d for d in dishes if str(d["ID"]) == dish_id), None)
+    parts = callback.data.split("_")
+    dish_id = parts[1]
+    cafe_filter = parts[2] if len(parts) > 2 else ALL_CAFES
+    dish = sheets.get_menu_index()['by_id'].get(dish_id)
 
     if not dish:
         await safe_answer_callback(callback, "❌ Блюдо не найдено!", show_alert=True)
         return
 
-    # Сохраняем выбранное блюдо в состоянии
-    await state.update_data(selected_dish=dish)
+    # Сохраняем выбранное блюдо и фильтр меню, чтобы вернуться на ту же страницу
+    await state.update_data(selected_dish=dish, menu_filter=cafe_filter)
 
     # Показываем клавиатуру для выбора количества
     quantity_text = (
@@ -226,14 +270,11 @@ async def select_dish_quantity(callback: CallbackQuery, state: FSMContext):
         quantity_text,
         get_quantity_keyboard()
     )
-    await state.set_state(OrderStates.selecting_quantity)
+    await set_state_if_changed(state, OrderStates.selecting_quantity)
 
 
-@router.callback_query(F.data.startswith("quantity_"))
+@router.callback_query(F.data.startswith("quantity_"), flags={"ack": False})
 async def add_to_cart(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
@@ -251,47 +292,34 @@ async def add_to_cart(callback: CallbackQuery, state: FSMContext):
         return
 
     # Получаем текущую корзину (без очистки)
-    cart = await get_cart(state, user_id, chat_id)
+    cart = await cart_service.load(state)
 
-    # Проверяем, есть ли уже это блюдо в корзине
-    existing_item = next((item for item in cart if str(item["ID"]) == str(dish["ID"])), None)
-
-    if existing_item:
-        # Обновляем количество
-        existing_item["quantity"] += quantity
-        message = f"🔄 Количество {dish['Название']} обновлено до {existing_item['quantity']} шт!"
+    item = cart.add(dish, quantity)
+    if item["quantity"] != quantity:
+        message = f"🔄 Количество {dish['Название']} обновлено до {item['quantity']} шт!"
     else:
-        # Добавляем новое блюдо
-        cart.append({
-            "ID": dish["ID"],
-            "Название": dish["Название"],
-            "quantity": quantity,
-            "Цена": dish.get("Цена", 0),
-            "Описание": dish.get("Описание", ""),
-            "Кафе": dish.get("Кафе", "Coffee Time")
-        })
         message = f"✅ {dish['Название']} x{quantity} добавлено в корзину!"
 
     # Сохраняем корзину
-    await save_cart(state, cart, user_id, chat_id)
+    await cart_service.save(state, cart)
 
     await safe_answer_callback(callback, message, show_alert=True)
 
-    # Возвращаемся в меню без очистки корзины
-    await show_menu(callback, state)
+    # Возвращаемся на страницу меню с выбранным блюдом
+    cafe_filter = data.get("menu_filter", ALL_CAFES)
+    dishes = get_menu_slice(sheets.get_menu_index(), cafe_filter)
+    position = next((i for i, d in enumerate(dishes) if str(d["ID"]) == str(dish["ID"])), 0)
+    await send_menu_page(callback, state, cafe_filter, page_of(position, MENU_PAGE_SIZE))
 
 
 @router.callback_query(F.data == "cart")
 async def show_cart(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
-    cart = await get_cart(state, user_id, chat_id)
+    cart = await cart_service.load(state)
 
-    cart_text, total_price = format_cart_text(cart)
+    cart_text, total_price = format_cart_text(cart.items())
 
     if not cart:
         # Если корзина пуста, показываем специальную клавиатуру
@@ -308,19 +336,18 @@ async def show_cart(callback: CallbackQuery, state: FSMContext):
         cart_text,
         get_cart_keyboard()
     )
-    await state.set_state(OrderStates.confirming_order)
+    await set_state_if_changed(state, OrderStates.confirming_order)
 
 
 @router.callback_query(F.data == "clear_cart")
 async def clear_cart(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
     # Очищаем корзину
-    await save_cart(state, [], user_id, chat_id)
+    cart = await cart_service.load(state)
+    cart.clear()
+    await cart_service.save(state, cart)
     logger.info("🧹 Корзина очищена пользователем")
 
     # Показываем сообщение об очистке
@@ -333,9 +360,6 @@ async def clear_cart(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "confirm_order")
 async def confirm_order_details(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
@@ -344,13 +368,13 @@ async def confirm_order_details(callback: CallbackQuery, state: FSMContext):
                                    show_alert=True)
         return
 
-    cart = await get_cart(state, user_id, chat_id)
+    cart = await cart_service.load(state)
 
     if not cart:
         await safe_answer_callback(callback, "🛒 Корзина пуста!", show_alert=True)
         return
 
-    cart_text, total_price = format_cart_text(cart)
+    cart_text, total_price = format_cart_text(cart.items())
 
     confirmation_text = (
         "📋 Подтверждение заказа:\n\n"
@@ -366,40 +390,61 @@ async def confirm_order_details(callback: CallbackQuery, state: FSMContext):
         confirmation_text,
         get_confirmation_keyboard()
     )
-    await state.set_state(OrderStates.waiting_for_confirmation)
+    # Каждый показ подтверждения — новый ключ: повторный заказ той же корзины не будет принят за дубль
+    await state.update_data(confirmation=callback.id)
+    await set_state_if_changed(state, OrderStates.waiting_for_confirmation)
 
 
-@router.callback_query(F.data == "finalize_order")
-async def finalize_order(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(F.data == "finalize_order", flags={"progress": "⏳ Оформляем заказ..."})
+async def finalize_order(callback: CallbackQuery, state: FSMContext, order_pipeline=None):
     user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
 
     if not await check_user_registration(callback):
         return
 
-    cart = await get_cart(state, user_id, chat_id)
+    cart = await cart_service.load(state)
 
     if not cart:
         await safe_answer_callback(callback, "🛒 Корзина пуста!", show_alert=True)
         return
 
-    success = sheets.add_order(user_id, cart)
+    # Двойное нажатие и повторная доставка апдейта дают тот же ключ — заказ запишется один раз
+    confirmation = (await state.get_data()).get("confirmation", "")
+    idempotency_key = f"{user_id}:{callback.message.message_id}:{confirmation}:{cart.fingerprint()}"
+    # Та же дата, что попадет в строку заказа: после дедлайна — послезавтра
+    delivery_date = deadline_clock.get_delivery_date()
+    if order_pipeline is not None:
+        # Заказ принят, как только записан в локальный журнал; в таблицу он уйдет в фоне
+        try:
+            success = await order_pipeline.submit(user_id, cart.items(), idempotency_key)
+        except Exception as e:
+            logger.error("❌ Ошибка записи заказа в журнал: %s", e, exc_info=True)
+            success = False
+    else:
+        success = await asyncio.to_thread(sheets.add_order, user_id, cart.items(), idempotency_key)
 
     if success:
         # Сохраняем заказ в истории перед очисткой корзины
-        logger.info(f"✅ Заказ успешно оформлен для пользователя {user_id}: {cart}")
-
-        # Очищаем корзину после успешного заказа
-        await save_cart(state, [], user_id, chat_id)
+        logger.info(
+            "✅ Заказ успешно оформлен для пользователя %s: %s позиций на %s₽",
+            user_id, len(cart), cart.total, extra={"event": "order_created", "user_id": user_id}
+        )
 
         # Рассчитываем итоговую стоимость для сообщения
-        total_price = sum(item.get('Цена', 0) * item['quantity'] for item in cart)
+        total_price = cart.total
+
+        # Очищаем корзину после успешного заказа
+        cart.clear()
+        await cart_service.save(state, cart)
 
+        # Корзина из нескольких кафе оформляется отдельным заказом в каждое кафе
+        cafes_note = f"🏪 Заказов по кафе: {len(success)}\n" if isinstance(success, list) and len(success) > 1 else ""
         order_details = (
             "🎉 Заказ успешно оформлен!\n\n"
             "📋 Детали заказа:\n"
             f"💰 Сумма: {total_price}₽\n"
-            "⏰ Доставка: завтра с 13:00 до 14:00\n"
+            f"{cafes_note}"
+            f"⏰ Доставка: {delivery_date} с 13:00 до 14:00\n"
             "📍 Адрес: Офис компании\n\n"
             "📱 Вы получите уведомление за час до доставки.\n"
             "Спасибо за использование системы заказа обедов!"
@@ -413,18 +458,13 @@ async def finalize_order(callback: CallbackQuery, state: FSMContext):
         await safe_answer_callback(callback, "❌ Ошибка оформления заказа! Попробуйте позже.", show_alert=True)
 
 
-@router.callback_query(F.data == "my_orders")
+@router.callback_query(F.data == "my_orders", flags={"progress": "⏳ Загружаем историю заказов..."})
 async def show_my_orders(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
     if not await check_user_registration(callback):
         return
 
-    # Сохраняем текущую корзину перед показом заказов
-    chat_id = callback.message.chat.id
-    current_cart = await get_cart(state, user_id, chat_id)
-    await save_cart(state, current_cart, user_id, chat_id)
-
     orders = sheets.get_user_orders(user_id)
 
     if not orders:
@@ -453,17 +493,9 @@ async def show_my_orders(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "back_to_main")
 async def back_to_main(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
     if not await check_user_registration(callback):
         return
 
-    # СОХРАНЯЕМ корзину при возврате в главное меню
-    current_cart = await get_cart(state, user_id, chat_id)
-    await save_cart(state, current_cart, user_id, chat_id)
-    logger.info(f"🔙 Возврат в главное меню. Корзина сохранена: {len(current_cart)} товаров")
-
     await safe_edit_message(
         callback,
         WELCOME_TEXT,
@@ -473,30 +505,14 @@ async def back_to_main(callback: CallbackQuery, state: FSMContext):
 
 @router.message()
 async def unknown_message(message: Message, state: FSMContext):
-    user_id = message.from_user.id
-    chat_id = message.chat.id
-
-    # Сохраняем текущую корзину перед отправкой сообщения
-    current_cart = await get_cart(state, user_id, chat_id)
-    if current_cart:
-        await save_cart(state, current_cart, user_id, chat_id)
-
     await message.answer(
         WELCOME_TEXT,
         reply_markup=get_main_menu_keyboard()
     )
 
 
-@router.callback_query()
+@router.callback_query(flags={"ack": False})
 async def unknown_callback(callback: CallbackQuery, state: FSMContext):
-    user_id = callback.from_user.id
-    chat_id = callback.message.chat.id
-
-    # Сохраняем текущую корзину перед обработкой callback
-    current_cart = await get_cart(state, user_id, chat_id)
-    if current_cart:
-        await save_cart(state, current_cart, user_id, chat_id)
-
     await safe_answer_callback(callback, "❗ Неизвестное действие")
     await safe_edit_message(
         callback,
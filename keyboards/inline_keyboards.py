@@ -1,8 +1,108 @@
+from collections import OrderedDict
+import hashlib
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 
-def get_main_menu_keyboard() -> InlineKeyboardMarkup:
+class _FrozenList(list):
+    """Список, который нельзя изменить; для pydantic и сессии aiogram это обычный list"""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Клавиатура из реестра неизменяема — соберите новую")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = clear = sort = reverse = _immutable
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    """Кнопка, которую нельзя изменить после создания"""
+
+    model_config = dict(InlineKeyboardButton.model_config, frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    """
+    Неизменяемая клавиатура: строки — неизменяемые списки, кнопки заморожены.
+    Поля те же, что у InlineKeyboardMarkup, поэтому в запросах к Bot API она
+    сериализуется так же; предвычисленный отпечаток всегда соответствует содержимому.
+    """
+
+    model_config = dict(InlineKeyboardMarkup.model_config, frozen=True)
+
+
+def freeze_keyboard(keyboard: InlineKeyboardMarkup) -> FrozenInlineKeyboardMarkup:
+    if keyboard is None or isinstance(keyboard, FrozenInlineKeyboardMarkup):
+        return keyboard
+    rows = _FrozenList(
+        _FrozenList(FrozenInlineKeyboardButton(**button.model_dump(exclude_none=True)) for button in row)
+        for row in keyboard.inline_keyboard
+    )
+    # model_construct: валидация заменила бы неизменяемые списки обычными
+    return FrozenInlineKeyboardMarkup.model_construct(inline_keyboard=rows)
+
+
+def compute_fingerprint(keyboard: InlineKeyboardMarkup) -> str:
+    """Отпечаток клавиатуры: хэш текстов и данных всех кнопок"""
+    if keyboard is None:
+        return ""
+    rows = tuple(
+        tuple(
+            (button.text, button.callback_data, button.url,
+             button.switch_inline_query, button.switch_inline_query_current_chat)
+            for button in row
+        )
+        for row in keyboard.inline_keyboard
+    )
+    return hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=12).hexdigest()
+
+
+class KeyboardRegistry:
+    """
+    Реестр неизменяемых готовых клавиатур с предвычисленными отпечатками.
+    Клавиатуры замораживаются при регистрации, поэтому отпечаток не расходится с содержимым.
+    Статические клавиатуры собираются один раз при импорте; клавиатуры из кэшей
+    рендера регистрируются через track(), чтобы сравнение не требовало сериализации.
+    """
+
+    def __init__(self, max_tracked=1024):
+        self._by_name = {}
+        self._fingerprints = {}  # id(markup) -> (markup, отпечаток), статические клавиатуры
+        self._tracked = OrderedDict()  # то же для динамических, с ограничением размера
+        self.max_tracked = max_tracked
+
+    def register(self, name, keyboard: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+        keyboard = freeze_keyboard(keyboard)
+        self._by_name[name] = keyboard
+        self._fingerprints[id(keyboard)] = (keyboard, compute_fingerprint(keyboard))
+        return keyboard
+
+    def track(self, keyboard: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+        keyboard = freeze_keyboard(keyboard)
+        self._tracked[id(keyboard)] = (keyboard, compute_fingerprint(keyboard))
+        while len(self._tracked) > self.max_tracked:
+            self._tracked.popitem(last=False)
+        return keyboard
+
+    def get(self, name) -> InlineKeyboardMarkup:
+        return self._by_name[name]
+
+    def fingerprint(self, keyboard: InlineKeyboardMarkup) -> str:
+        if keyboard is None:
+            return ""
+        entry = self._fingerprints.get(id(keyboard)) or self._tracked.get(id(keyboard))
+        if entry is not None and entry[0] is keyboard:
+            return entry[1]
+        return compute_fingerprint(keyboard)
+
+
+keyboard_registry = KeyboardRegistry()
+
+
+def keyboard_fingerprint(keyboard: InlineKeyboardMarkup) -> str:
+    return keyboard_registry.fingerprint(keyboard)
+
+
+def _build_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Главное меню"""
     builder = InlineKeyboardBuilder()
     builder.button(text="🍽 Меню", callback_data="menu")
@@ -12,7 +112,7 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_cart_keyboard() -> InlineKeyboardMarkup:
+def _build_cart_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для корзины (когда корзина не пуста)"""
     builder = InlineKeyboardBuilder()
     builder.button(text="✅ Оформить заказ", callback_data="confirm_order")
@@ -22,7 +122,7 @@ def get_cart_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_empty_cart_keyboard() -> InlineKeyboardMarkup:
+def _build_empty_cart_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для пустой корзины"""
     builder = InlineKeyboardBuilder()
     builder.button(text="🍽 Перейти в меню", callback_data="menu")
@@ -31,7 +131,7 @@ def get_empty_cart_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_back_keyboard() -> InlineKeyboardMarkup:
+def _build_back_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой 'Назад'"""
     builder = InlineKeyboardBuilder()
     builder.button(text="⬅️ Назад", callback_data="back_to_admin")
@@ -39,7 +139,7 @@ def get_back_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_quantity_keyboard() -> InlineKeyboardMarkup:
+def _build_quantity_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для выбора количества"""
     builder = InlineKeyboardBuilder()
 
@@ -57,7 +157,7 @@ def get_quantity_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_confirmation_keyboard() -> InlineKeyboardMarkup:
+def _build_confirmation_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура для подтверждения заказа"""
     builder = InlineKeyboardBuilder()
     builder.button(text="✅ Подтвердить заказ", callback_data="finalize_order")
@@ -67,7 +167,7 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_admin_menu_keyboard() -> InlineKeyboardMarkup:
+def _build_admin_menu_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура главного меню админ панели"""
     builder = InlineKeyboardBuilder()
     builder.button(text="🍽️ Меню", callback_data="admin_dishes")
@@ -79,7 +179,7 @@ def get_admin_menu_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_admin_dishes_keyboard() -> InlineKeyboardMarkup:
+def _build_admin_dishes_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура управления блюдами"""
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Добавить блюдо", callback_data="admin_add_dish")
@@ -90,7 +190,7 @@ def get_admin_dishes_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_admin_orders_keyboard() -> InlineKeyboardMarkup:
+def _build_admin_orders_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура управления заказами"""
     builder = InlineKeyboardBuilder()
     builder.button(text="📦 Активные заказы", callback_data="admin_active_orders")
@@ -100,7 +200,7 @@ def get_admin_orders_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_admin_employees_keyboard() -> InlineKeyboardMarkup:
+def _build_admin_employees_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура управления сотрудниками"""
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Добавить сотрудника", callback_data="admin_add_employee")
@@ -110,6 +210,69 @@ def get_admin_employees_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+# Статические клавиатуры собираются один раз при импорте
+keyboard_registry.register("main_menu", _build_main_menu_keyboard())
+keyboard_registry.register("cart", _build_cart_keyboard())
+keyboard_registry.register("empty_cart", _build_empty_cart_keyboard())
+keyboard_registry.register("back", _build_back_keyboard())
+keyboard_registry.register("quantity", _build_quantity_keyboard())
+keyboard_registry.register("confirmation", _build_confirmation_keyboard())
+keyboard_registry.register("admin_menu", _build_admin_menu_keyboard())
+keyboard_registry.register("admin_dishes", _build_admin_dishes_keyboard())
+keyboard_registry.register("admin_orders", _build_admin_orders_keyboard())
+keyboard_registry.register("admin_employees", _build_admin_employees_keyboard())
+
+
+def get_main_menu_keyboard() -> InlineKeyboardMarkup:
+    """Главное меню"""
+    return keyboard_registry.get("main_menu")
+
+
+def get_cart_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура для корзины (когда корзина не пуста)"""
+    return keyboard_registry.get("cart")
+
+
+def get_empty_cart_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура для пустой корзины"""
+    return keyboard_registry.get("empty_cart")
+
+
+def get_back_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура с кнопкой 'Назад'"""
+    return keyboard_registry.get("back")
+
+
+def get_quantity_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура для выбора количества"""
+    return keyboard_registry.get("quantity")
+
+
+def get_confirmation_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура для подтверждения заказа"""
+    return keyboard_registry.get("confirmation")
+
+
+def get_admin_menu_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура главного меню админ панели"""
+    return keyboard_registry.get("admin_menu")
+
+
+def get_admin_dishes_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура управления блюдами"""
+    return keyboard_registry.get("admin_dishes")
+
+
+def get_admin_orders_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура управления заказами"""
+    return keyboard_registry.get("admin_orders")
+
+
+def get_admin_employees_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура управления сотрудниками"""
+    return keyboard_registry.get("admin_employees")
+
+
 def get_admin_confirmation_keyboard(options, prefix="") -> InlineKeyboardMarkup:
     """Генерация клавиатуры для подтверждения с вариантами"""
     builder = InlineKeyboardBuilder()
@@ -117,4 +280,4 @@ def get_admin_confirmation_keyboard(options, prefix="") -> InlineKeyboardMarkup:
         builder.button(text=option, callback_data=f"{prefix}{option.lower()}")
     builder.button(text="❌ Отмена", callback_data="back_to_admin")
     builder.adjust(1)
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
@@ -1,7 +1,10 @@
+import time
+
+PROCESS_STARTED = time.monotonic()  # до тяжелых импортов: отсчет времени запуска
+
 import asyncio
 import logging
 import sys
-import time
 from aiogram import Bot, Dispatcher
 from aiogram.exceptions import (
     TelegramAPIError,
@@ -11,13 +14,22 @@ from aiogram.exceptions import (
 )
 from config.settings import Config
 from handlers import user_handlers, admin_handlers
+from services.google_sheets import sheets_service
+from services.scheduler import BotScheduler
+from services.order_journal import OrderJournal, OrderPipeline
+from services.notifications import DeliveryNotifier
+from services.broadcaster import Broadcaster
+from services.fsm_storage import create_fsm_storage
+from services.webhook import run_webhook
+from services.cache_bus import create_cache_bus
+from services.leader import create_leader_elector
+from services.metrics_server import MetricsServer
+from middlewares.metrics import setup_metrics_middlewares
+from middlewares.tracing import setup_tracing_middlewares
+from middlewares.callback_ack import setup_callback_ack
+from utils.api_trace import api_call_stats
+from utils.logging_setup import setup_logging, stop_logging
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    stream=sys.stdout
-)
 logger = logging.getLogger(__name__)
 
 
@@ -25,13 +37,32 @@ async def graceful_shutdown(bot: Bot):
     """Корректное завершение работы бота"""
     logger.info("Начинаю graceful shutdown...")
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
+        # Webhook не снимаем: его обслуживают и другие экземпляры, и следующий запуск
+        if Config.BOT_MODE != "webhook":
+            await bot.delete_webhook(drop_pending_updates=True)
         await bot.session.close()
         logger.info("✅ Бот успешно остановлен")
     except Exception as e:
         logger.error(f"❌ Ошибка при завершении работы: {e}")
 
 
+async def track_first_update(handler, event, data):
+    """Замер времени от запуска процесса до обработки первого апдейта"""
+    if track_first_update.done:
+        return await handler(event, data)
+    track_first_update.done = True
+    try:
+        return await handler(event, data)
+    finally:
+        elapsed = time.monotonic() - PROCESS_STARTED
+        if elapsed > Config.STARTUP_BUDGET:
+            logger.warning(f"🐢 Первый апдейт обработан через {elapsed:.2f} с (бюджет {Config.STARTUP_BUDGET:.0f} с)")
+        else:
+            logger.info(f"⚡ Первый апдейт обработан через {elapsed:.2f} с после запуска")
+
+track_first_update.done = False
+
+
 async def error_handler(update, exception):
     """Глобальный обработчик ошибок"""
     logger.error(f"Update {update} caused error: {exception}", exc_info=True)
@@ -39,7 +70,7 @@ async def error_handler(update, exception):
     # Обработка конфликта экземпляров
     if isinstance(exception, TelegramConflictError):
         logger.critical("❌ КОНФЛИКТ ЭКЗЕМПЛЯРОВ: Обнаружен другой запущенный экземпляр бота!")
-        logger.critical("💡 РЕШЕНИЕ: Завершите все другие процессы бота перед запуском")
+        logger.critical("💡 РЕШЕНИЕ: polling допускает один процесс; для нескольких используйте BOT_MODE=webhook и front.py")
         return True
 
     # Игнорируем известные не критические ошибки
@@ -64,57 +95,122 @@ async def error_handler(update, exception):
     return False
 
 
+def create_dispatcher(bot, storage, order_pipeline=None):
+    """
+    Диспетчер с роутерами, middleware и общими зависимостями обработчиков.
+    Используется и нагрузочным бенчмарком, чтобы замерять ту же конфигурацию, что в продакшене.
+    """
+    dp = Dispatcher(storage=storage)
+
+    # Регистрация роутеров (админский — первым: в пользовательском есть обработчики «всего остального»)
+    dp.include_router(admin_handlers.router)
+    dp.include_router(user_handlers.router)
+
+    # Регистрация обработчика ошибок
+    dp.errors.register(error_handler)
+    dp.update.outer_middleware(track_first_update)
+    setup_metrics_middlewares(dp)
+    setup_tracing_middlewares(dp)
+    setup_callback_ack(dp, bot)
+
+    # Общий рассыльщик: уведомления и объявления делят один лимит скорости
+    dp["broadcaster"] = Broadcaster(bot)
+    if order_pipeline is not None:
+        dp["order_pipeline"] = order_pipeline
+    return dp
+
+
 async def main():
     """Основная функция запуска бота"""
     if not Config.BOT_TOKEN:
         logger.critical("❌ ОШИБКА: Не указан TELEGRAM_BOT_TOKEN в .env")
         return
 
-    # Проверка на несколько экземпляров
-    logger.info("🔍 Проверка на наличие других экземпляров бота...")
-    time.sleep(3)  # Небольшая задержка для завершения предыдущих экземпляров
-
     bot = Bot(token=Config.BOT_TOKEN)
-    dp = Dispatcher()
+    storage = create_fsm_storage()
 
-    # Регистрация роутеров
-    dp.include_router(user_handlers.router)
-    dp.include_router(admin_handlers.router)
+    # Заказы принимаются в локальный журнал и переносятся в таблицу в фоне
+    order_pipeline = None
+    if Config.ORDER_JOURNAL:
+        order_pipeline = OrderPipeline(OrderJournal(), sheets_service)
 
-    # Регистрация обработчика ошибок
-    dp.errors.register(error_handler)
+    dp = create_dispatcher(bot, storage, order_pipeline)
+    broadcaster = dp["broadcaster"]
 
     # Информация о запуске
     logger.info("🚀 Бот запущен!")
     logger.info(f"🔧 Режим: {'ЛОКАЛЬНЫЙ' if Config.LOCAL_MODE else 'ПРОДАКШН'}")
+    logger.info(f"📡 Получение апдейтов: {Config.BOT_MODE}")
     logger.info(f"⏱️ Тестовый режим (без дедлайна): {'ВКЛЮЧЕН' if Config.TEST_MODE else 'ВЫКЛЮЧЕН'}")
     if not Config.LOCAL_MODE:
         logger.info(f"📊 Google Sheets ID: {Config.SPREADSHEET_ID}")
 
-    # Запуск polling
+    # Планировщик прогрева кэшей и фиксации заказов;
+    # периодические задачи с внешними последствиями выполняет один процесс-лидер
+    scheduler = BotScheduler(sheets_service, leader=create_leader_elector())
+    scheduler.add_warmup(user_handlers.prerender_menu)
+    notifier = DeliveryNotifier(bot, sheets_service, broadcaster)
+    scheduler.add_job("delivery_notify", notifier.next_run, notifier.notify_delivery)
+
+    if order_pipeline is not None:
+        scheduler.add_flusher(order_pipeline.flush)
+
+    # Сброс кэша между процессами: изменения админа видны всем воркерам
+    cache_bus = create_cache_bus()
+    if cache_bus is not None:
+        cache_bus.attach(sheets_service)
+
+    # Подключение к Google Sheets — в фоне, прием апдейтов начинается сразу
+    sheets_connect = asyncio.create_task(sheets_service.connect())
+    metrics_server = MetricsServer(sheets_service, storage)
+
+    # Запуск polling или webhook-сервера
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dp.start_polling(bot)
+        await metrics_server.start()
+        if cache_bus is not None:
+            cache_bus.start()
+        if order_pipeline is not None:
+            order_pipeline.start()
+        scheduler.start()
+        if hasattr(storage, "start_sweeper"):
+            storage.start_sweeper()
+        if Config.BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
     except TelegramConflictError:
-        logger.critical("❌ КРИТИЧЕСКАЯ ОШИБКА: Обнаружен другой запущенный экземпляр бота")
-        logger.critical("💡 СРОЧНОЕ РЕШЕНИЕ:")
-        logger.critical("1. Закройте все окна терминала с запущенным ботом")
-        logger.critical("2. Выполните в PowerShell: Stop-Process -Name 'python' -Force")
-        logger.critical("3. Подождите 30 секунд")
-        logger.critical("4. Перезапустите бота")
+        logger.critical("❌ КРИТИЧЕСКАЯ ОШИБКА: Обнаружен другой экземпляр бота в режиме polling")
+        logger.critical("💡 Для нескольких процессов запустите воркеры с BOT_MODE=webhook за фронтом front.py")
     except KeyboardInterrupt:
         logger.info("🛑 Бот остановлен пользователем")
     except Exception as e:
         logger.exception(f"Критическая ошибка: {e}")
     finally:
+        sheets_connect.cancel()
+        await metrics_server.stop()
+        await scheduler.stop()
+        if order_pipeline is not None:
+            await order_pipeline.stop()
+        try:
+            api_call_stats.dump(Config.API_STATS_PATH)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось сохранить статистику вызовов Sheets: {e}")
+        if cache_bus is not None:
+            await cache_bus.stop()
+        await storage.close()
         await graceful_shutdown(bot)
 
 
 if __name__ == "__main__":
+    # Настройка логирования: вывод в отдельном потоке, не блокирует обработку апдейтов
+    setup_logging()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("⏹️ Бот завершил работу по Ctrl+C")
     except Exception as e:
         logger.exception(f"Необработанное исключение: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        stop_logging()
\ No newline at end of file
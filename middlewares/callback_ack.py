@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, EditMessageReplyMarkup
+from config.settings import Config
+from utils.safe_message_edit import remember_message_content
+
+logger = logging.getLogger(__name__)
+
+# Callback текущего апдейта, на который уже ответили заранее
+_acked_query = ContextVar("acked_callback_query", default=None)
+# Выставляется в задаче, которая показывает прогресс (ее правки не ждут сами себя)
+_progress_edit = ContextVar("callback_progress_edit", default=False)
+
+
+class AckedQuery:
+    """Состояние callback, на который middleware ответил до запуска обработчика"""
+
+    __slots__ = ("query_id", "chat_id", "message_id", "edit_lock", "progress_shown", "handler_edited", "done")
+
+    def __init__(self, query_id, chat_id, message_id):
+        self.query_id = query_id
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.edit_lock = asyncio.Lock()  # правки обработчика не обгоняют правку «⏳» и наоборот
+        self.progress_shown = False
+        self.handler_edited = False
+        self.done = False
+
+
+class CallbackAckMiddleware(BaseMiddleware):
+    """
+    Ответ на callback сразу, до работы обработчика: кнопка перестает «крутиться»,
+    а Telegram не отбрасывает поздний ответ как «query is too old».
+
+    Флаги обработчика:
+    ack=False — не отвечать заранее (обработчик сам показывает alert, и он быстрый);
+    ack="текст" — ответить этим текстом;
+    progress="текст" — если обработчик работает дольше CALLBACK_PROGRESS_DELAY, показать текст в сообщении.
+    """
+
+    async def __call__(self, handler, event, data):
+        ack = get_flag(data, "ack", default=True)
+        if ack is False:
+            return await handler(event, data)
+
+        try:
+            await event.answer(ack if isinstance(ack, str) else None)
+        except TelegramBadRequest as e:
+            logger.debug("🔄 Не удалось ответить на callback заранее: %s", e)
+
+        message = event.message
+        acked = AckedQuery(
+            event.id,
+            message.chat.id if message else event.from_user.id,
+            message.message_id if message else None
+        )
+        token = _acked_query.set(acked)
+        progress = get_flag(data, "progress")
+        timer = None
+        if progress and getattr(message, "text", None):
+            timer = asyncio.create_task(self._show_progress(acked, message, progress))
+        try:
+            return await handler(event, data)
+        finally:
+            acked.done = True
+            _acked_query.reset(token)
+            if timer is not None:
+                # Если «⏳» уже отправляется, дожидаемся ее, иначе отменяем ожидание
+                async with acked.edit_lock:
+                    timer.cancel()
+                await self._restore(acked, message)
+
+    async def _show_progress(self, acked, message, text):
+        await asyncio.sleep(Config.CALLBACK_PROGRESS_DELAY)
+        _progress_edit.set(True)
+        async with acked.edit_lock:
+            if acked.done or acked.handler_edited:
+                return
+            try:
+                # Клавиатуру оставляем: если обработчик не изменит сообщение, оно вернется как было
+                await message.edit_text(text, reply_markup=message.reply_markup)
+                remember_message_content(acked.chat_id, acked.message_id, text, message.reply_markup)
+                acked.progress_shown = True
+            except TelegramBadRequest as e:
+                logger.debug("🔄 Прогресс не показан: %s", e)
+
+    async def _restore(self, acked, message):
+        """Обработчик завершился, не изменив сообщение (например, ошибкой) — убираем «⏳»"""
+        if not acked.progress_shown or acked.handler_edited:
+            return
+        try:
+            await message.edit_text(message.text, reply_markup=message.reply_markup)
+            remember_message_content(acked.chat_id, acked.message_id, message.text, message.reply_markup)
+        except TelegramBadRequest as e:
+            logger.debug("🔄 Сообщение после прогресса не восстановлено: %s", e)
+
+
+class AnsweredCallbackGuard(BaseRequestMiddleware):
+    """
+    Middleware запросов к Bot API для callback, на которые уже ответили заранее:
+    повторный answerCallbackQuery не отправляется (Telegram вернет ошибку),
+    alert превращается в обычное сообщение, чтобы пользователь его увидел;
+    правки сообщения обработчиком ждут окончания правки «⏳».
+    """
+
+    async def __call__(self, make_request, bot, method):
+        acked = _acked_query.get()
+        if acked is None or _progress_edit.get():
+            return await make_request(bot, method)
+
+        if isinstance(method, AnswerCallbackQuery) and method.callback_query_id == acked.query_id:
+            if method.show_alert and method.text:
+                await bot.send_message(acked.chat_id, method.text)
+            elif method.text:
+                logger.debug("💬 Ответ на callback после раннего ответа пропущен: %s", method.text)
+            return True
+
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)) and method.message_id == acked.message_id:
+            async with acked.edit_lock:
+                acked.handler_edited = True
+                return await make_request(bot, method)
+
+        return await make_request(bot, method)
+
+
+def setup_callback_ack(dp, bot):
+    dp.callback_query.middleware(CallbackAckMiddleware())
+    bot.session.middleware(AnsweredCallbackGuard())
@@ -0,0 +1,49 @@
+import time
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from utils.metrics import UPDATES_TOTAL, UPDATE_LATENCY, HANDLER_LATENCY
+
+
+def handler_name(data):
+    """Имя функции-обработчика из данных aiogram"""
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__name__", "unknown")
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware апдейтов: число апдейтов и полное время обработки по типу"""
+
+    async def __call__(self, handler, event, data):
+        update_type = event.event_type
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_LATENCY.observe(time.perf_counter() - started, type=update_type)
+            UPDATES_TOTAL.inc(type=update_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время работы конкретного обработчика и результат"""
+
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                outcome = "unhandled"
+            return result
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, handler=handler_name(data), outcome=outcome)
+
+
+def setup_metrics_middlewares(dp):
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
@@ -0,0 +1,21 @@
+from aiogram import BaseMiddleware
+from middlewares.metrics import handler_name
+from utils.api_trace import api_call_stats
+
+
+class SheetsTraceMiddleware(BaseMiddleware):
+    """Привязка вызовов Sheets API к обработчику и ID апдейта"""
+
+    async def __call__(self, handler, event, data):
+        update = data.get("event_update")
+        token = api_call_stats.start(handler_name(data), update.update_id if update else None)
+        try:
+            return await handler(event, data)
+        finally:
+            api_call_stats.finish(token)
+
+
+def setup_tracing_middlewares(dp):
+    trace = SheetsTraceMiddleware()
+    dp.message.middleware(trace)
+    dp.callback_query.middleware(trace)
@@ -0,0 +1,83 @@
+"""
+Отправка записанных апдейтов на локальный webhook-сервер.
+
+Файл — JSON Lines (один апдейт в строке) или ответ getUpdates ({"ok": true, "result": [...]}).
+
+    BOT_MODE=webhook LOCAL_MODE=True python main.py
+    python scripts/replay_updates.py updates.jsonl --concurrency 10 --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from aiohttp import ClientSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import Config  # noqa: E402
+
+
+def load_updates(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        return data.get("result", [data])
+    return data
+
+
+async def replay(url, updates, secret, concurrency, repeat):
+    queue = asyncio.Queue()
+    update_id = 0
+    for _ in range(repeat):
+        for update in updates:
+            update_id += 1
+            queue.put_nowait(dict(update, update_id=update_id))
+
+    statuses = {}
+    latencies = []
+
+    async def worker(session):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        while not queue.empty():
+            update = queue.get_nowait()
+            started = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Отправлено: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} апд./с)")
+    print(f"Статусы: {statuses}")
+    if latencies:
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        print(f"Время ответа: p50 {p50:.1f} мс, p95 {p95:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отправка записанных апдейтов на webhook")
+    parser.add_argument("file", help="JSON Lines или ответ getUpdates")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=Config.WEBHOOK_SECRET)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    updates = load_updates(args.file)
+    asyncio.run(replay(args.url, updates, args.secret, args.concurrency, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
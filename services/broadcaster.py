@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNetworkError,
+    TelegramServerError
+)
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Ограничитель скорости отправки: общий лимит бота (сообщений в секунду)
+    и минимальный интервал между сообщениями в один чат.
+    Общая пауза выставляется при получении RetryAfter от Telegram.
+    """
+
+    def __init__(self, rate, per_chat_interval=1.0):
+        self.interval = 1.0 / rate
+        self.per_chat_interval = per_chat_interval
+        self._next_slot = 0.0
+        self._chat_next = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, chat_id):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot, self._chat_next.get(chat_id, 0.0))
+            self._next_slot = slot + self.interval
+            self._chat_next[chat_id] = slot + self.per_chat_interval
+            if len(self._chat_next) > 10000:
+                self._chat_next = {k: v for k, v in self._chat_next.items() if v > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Глобальная пауза (flood control)"""
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class BroadcastCheckpoint:
+    """
+    Состояние рассылки на диске, позволяющее продолжить ее после перезапуска.
+    Файл читает тот процесс, который станет лидером, поэтому при LEADER_BACKEND=redis
+    каталог DATA_DIR должен быть общим для всех машин.
+    """
+
+    def __init__(self, run_id, directory=None):
+        self.run_id = run_id
+        self.path = os.path.join(directory or os.path.join(Config.DATA_DIR, "broadcasts"), f"{run_id}.json")
+        self.data = {'run_id': run_id, 'text': "", 'recipients': [], 'sent': [], 'failed': {},
+                     'done': False, 'cancelled': False, 'started_at': None, 'finished_at': None}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, run_id, directory=None):
+        checkpoint = cls(run_id, directory)
+        try:
+            with open(checkpoint.path, 'r', encoding='utf-8') as f:
+                checkpoint.data.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"⚠️ Не удалось прочитать чекпоинт рассылки {run_id}: {e}")
+        return checkpoint
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def mark_sent(self, chat_id):
+        self.data['sent'].append(chat_id)
+        self.data['failed'].pop(str(chat_id), None)
+        self._dirty = True
+
+    def mark_failed(self, chat_id, error):
+        self.data['failed'][str(chat_id)] = error
+        self._dirty = True
+
+    def pending(self, only_failed=False):
+        """Получатели, которым сообщение еще не доставлено"""
+        if only_failed:
+            return [int(chat_id) for chat_id in self.data['failed']]
+        done = set(self.data['sent']) | {int(chat_id) for chat_id in self.data['failed']}
+        return [chat_id for chat_id in self.data['recipients'] if chat_id not in done]
+
+    def save(self, force=False):
+        if not (self._dirty or force):
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class Broadcaster:
+    """
+    Массовая рассылка с ограниченной параллельностью в пределах лимитов Telegram.
+    Прогресс сохраняется в чекпоинт, прерванная рассылка продолжается с места остановки.
+    """
+
+    MAX_ATTEMPTS = 3
+    CHECKPOINT_INTERVAL = 1.0
+
+    def __init__(self, bot, rate=None, concurrency=None, checkpoint_dir=None):
+        self.bot = bot
+        self.limiter = RateLimiter(rate or Config.BROADCAST_RATE)
+        self.concurrency = concurrency or Config.BROADCAST_CONCURRENCY
+        self.checkpoint_dir = checkpoint_dir
+
+    def load_checkpoint(self, run_id):
+        return BroadcastCheckpoint.load(run_id, self.checkpoint_dir)
+
+    async def _send(self, chat_id, text, reply_markup):
+        """Отправка одного сообщения; возвращает None при успехе или текст ошибки"""
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            await self.limiter.acquire(chat_id)
+            try:
+                await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+                return None
+            except TelegramRetryAfter as e:
+                logger.warning(f"⏳ Flood control: пауза {e.retry_after} с")
+                self.limiter.pause(e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                return str(e)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == self.MAX_ATTEMPTS:
+                    return str(e)
+                await asyncio.sleep(attempt)
+        return "retry limit exceeded"
+
+    async def run(self, run_id, recipients=None, text=None, reply_markup=None,
+                  only_failed=False, progress=None, cancel_event=None):
+        """
+        Рассылка сообщения списку получателей.
+        Если чекпоинт run_id уже существует, рассылка продолжается с него
+        (recipients и text берутся из чекпоинта, если не переданы).
+        progress(stats) вызывается после каждой порции отправок, cancel_event прерывает рассылку.
+        """
+        checkpoint = self.load_checkpoint(run_id)
+        if recipients is not None and not checkpoint.data['recipients']:
+            checkpoint.data['recipients'] = list(dict.fromkeys(int(chat_id) for chat_id in recipients))
+        if text is not None and not checkpoint.data['text']:
+            checkpoint.data['text'] = text
+        if only_failed:
+            checkpoint.data['done'] = False
+        checkpoint.data['cancelled'] = False
+        checkpoint.data['started_at'] = checkpoint.data['started_at'] or time.time()
+        checkpoint.save(force=True)
+
+        pending = checkpoint.pending(only_failed=only_failed)
+        stats = {'run_id': run_id, 'total': len(checkpoint.data['recipients']), 'queued': len(pending),
+                 'sent': 0, 'failed': 0, 'elapsed': 0.0, 'rate': 0.0, 'cancelled': False}
+        started = time.monotonic()
+
+        queue = asyncio.Queue()
+        for chat_id in pending:
+            queue.put_nowait(chat_id)
+
+        async def worker():
+            while not queue.empty():
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                chat_id = queue.get_nowait()
+                error = await self._send(chat_id, checkpoint.data['text'], reply_markup)
+                if error is None:
+                    checkpoint.mark_sent(chat_id)
+                    stats['sent'] += 1
+                else:
+                    checkpoint.mark_failed(chat_id, error)
+                    stats['failed'] += 1
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(self.CHECKPOINT_INTERVAL)
+                checkpoint.save()
+                if progress is not None:
+                    await self._report(progress, stats, started)
+
+        reporter_task = asyncio.create_task(reporter())
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)) or 1)))
+        except BaseException:
+            # Остановка бота или ошибка: сохраняем прогресс, рассылка продолжится после перезапуска
+            checkpoint.data['done'] = False
+            checkpoint.save(force=True)
+            raise
+        finally:
+            reporter_task.cancel()
+
+        stats['cancelled'] = cancel_event is not None and cancel_event.is_set()
+        checkpoint.data['cancelled'] = stats['cancelled']
+        checkpoint.data['done'] = not stats['cancelled']
+        checkpoint.data['finished_at'] = time.time()
+        checkpoint.save(force=True)
+
+        stats['elapsed'] = time.monotonic() - started
+        stats['rate'] = stats['sent'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        stats['failed_total'] = len(checkpoint.data['failed'])
+
+        logger.info(
+            f"📨 Рассылка {run_id}: отправлено {stats['sent']}, ошибок {stats['failed']}, "
+            f"{stats['elapsed']:.1f} с ({stats['rate']:.1f} сообщ./с)"
+        )
+        return stats
+
+    @staticmethod
+    async def _report(progress, stats, started):
+        stats['elapsed'] = time.monotonic() - started
+        stats['rate'] = stats['sent'] / stats['elapsed'] if stats['elapsed'] else 0.0
+        try:
+            await progress(dict(stats))
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка отчета о прогрессе рассылки: {e}")
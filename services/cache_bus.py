@@ -0,0 +1,189 @@
+import asyncio
+from abc import ABC, abstractmethod
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import logging
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBus(ABC):
+    """
+    Канал сброса кэша между рабочими процессами бота.
+
+    У каждого воркера свой кэш таблиц в памяти. Когда воркер меняет данные
+    (выключено блюдо, добавлен заказ), ключи сброшенного кэша публикуются,
+    а остальные воркеры — на этой же машине или на других — сбрасывают у себя
+    те же ключи и при следующем обращении перечитывают таблицу.
+    """
+
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._services = []
+        self._loop = None
+        self._outbox = None
+        self._tasks = []
+
+    def attach(self, sheets):
+        """Подписать сервис таблиц этого процесса на канал"""
+        if sheets in self._services:
+            return
+        self._services.append(sheets)
+        sheets.invalidation_listeners.append(lambda keys, source=sheets: self._on_local_invalidate(source, keys))
+
+    def _on_local_invalidate(self, source, keys):
+        # Другие экземпляры в этом же процессе сбрасываем сразу
+        for sheets in self._services:
+            if sheets is not source:
+                sheets.invalidate(*keys, publish=False)
+        if self._loop is None:
+            return
+        # Может вызываться из потока (asyncio.to_thread), публикация — в цикле событий
+        try:
+            self._loop.call_soon_threadsafe(self._outbox.put_nowait, list(keys))
+        except RuntimeError:
+            pass  # цикл событий уже остановлен
+
+    def _apply_remote(self, keys):
+        logger.info(f"📣 Сброс кэша по сигналу другого процесса: {', '.join(keys)}")
+        for sheets in self._services:
+            sheets.invalidate(*keys, publish=False)
+
+    async def _publisher(self):
+        while True:
+            keys = await self._outbox.get()
+            try:
+                await self.publish(keys)
+            except Exception as e:
+                logger.error(f"❌ Не удалось опубликовать сброс кэша {keys}: {e}")
+
+    @abstractmethod
+    async def publish(self, keys):
+        """Отправка ключей сброшенного кэша другим процессам"""
+
+    @abstractmethod
+    async def listen(self):
+        """Получение сбросов от других процессов до остановки; вызывает _apply_remote"""
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._outbox = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._publisher()), asyncio.create_task(self.listen())]
+        logger.info(f"📣 Канал сброса кэша запущен: {type(self).__name__} ({self.origin})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+
+class SQLiteCacheBus(CacheBus):
+    """Канал через общий файл SQLite — для нескольких процессов на одной машине"""
+
+    RETENTION = 3600  # события старше часа удаляются
+
+    def __init__(self, path=None, poll_interval=1.0):
+        super().__init__()
+        self.path = path or os.path.join(Config.DATA_DIR, "cache_bus.sqlite3")
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, keys TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        # Читаем только события, появившиеся после запуска
+        self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def publish(self, keys):
+        now = time.time()
+        await asyncio.to_thread(
+            self._execute, "INSERT INTO events (origin, keys, created) VALUES (?, ?, ?)",
+            (self.origin, json.dumps(keys), now)
+        )
+        await asyncio.to_thread(self._execute, "DELETE FROM events WHERE created < ?", (now - self.RETENTION,))
+
+    async def listen(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await asyncio.to_thread(
+                    self._execute, "SELECT id, origin, keys FROM events WHERE id > ? ORDER BY id", (self._last_id,)
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Ошибка чтения канала сброса кэша: {e}")
+                continue
+            for event_id, origin, keys in rows:
+                self._last_id = event_id
+                if origin != self.origin:
+                    self._apply_remote(json.loads(keys))
+
+    async def stop(self):
+        await super().stop()
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCacheBus(CacheBus):
+    """Канал через Redis pub/sub — для процессов на разных машинах"""
+
+    CHANNEL = "cafebot:cache"
+
+    def __init__(self, url=None):
+        super().__init__()
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("Для CACHE_BUS=redis установите пакет redis: pip install redis")
+        self.redis = Redis.from_url(url or Config.FSM_REDIS_URL)
+
+    async def publish(self, keys):
+        await self.redis.publish(self.CHANNEL, json.dumps({'origin': self.origin, 'keys': keys}))
+
+    async def listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get('type') != 'message':
+                            continue
+                        event = json.loads(message['data'])
+                        if event.get('origin') != self.origin:
+                            self._apply_remote(event.get('keys', []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Потеряно соединение канала сброса кэша: {e}")
+                await asyncio.sleep(5)
+
+    async def stop(self):
+        await super().stop()
+        await self.redis.aclose()
+
+
+def create_cache_bus():
+    """
+    Канал сброса кэша по настройке CACHE_BUS: none (один процесс, по умолчанию),
+    sqlite (несколько процессов на одной машине) или redis.
+    """
+    backend = Config.CACHE_BUS.lower()
+    if backend == "sqlite":
+        return SQLiteCacheBus()
+    if backend == "redis":
+        return RedisCacheBus()
+    return None
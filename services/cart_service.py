@@ -0,0 +1,103 @@
+from aiogram.fsm.context import FSMContext
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Cart:
+    """
+    Корзина пользователя.
+    Позиции хранятся по ID блюда (поиск и обновление без перебора списка),
+    флаг dirty отмечает реальные изменения, которые нужно сохранить.
+    """
+
+    def __init__(self, items=None):
+        self._items = items or {}
+        self.dirty = False
+
+    @classmethod
+    def from_data(cls, data):
+        """Восстановление из FSM-данных (поддерживает и старый формат — список позиций)"""
+        if isinstance(data, list):
+            return cls({str(item["ID"]): item for item in data if "ID" in item})
+        if isinstance(data, dict):
+            return cls(dict(data))
+        return cls()
+
+    def to_data(self):
+        return self._items
+
+    def get(self, dish_id):
+        return self._items.get(str(dish_id))
+
+    def add(self, dish, quantity):
+        """Добавление блюда; возвращает позицию корзины с итоговым количеством"""
+        dish_id = str(dish["ID"])
+        item = self._items.get(dish_id)
+        if item:
+            item["quantity"] += quantity
+        else:
+            item = {
+                "ID": dish["ID"],
+                "Название": dish["Название"],
+                "quantity": quantity,
+                "Цена": dish.get("Цена", 0),
+                "Описание": dish.get("Описание", ""),
+                "Кафе": dish.get("Кафе", "Coffee Time")
+            }
+            self._items[dish_id] = item
+        self.dirty = True
+        return item
+
+    def clear(self):
+        if self._items:
+            self._items = {}
+            self.dirty = True
+
+    def items(self):
+        return list(self._items.values())
+
+    def fingerprint(self):
+        """Хэш состава корзины: одинаковые корзины дают одинаковый отпечаток"""
+        content = sorted((str(item["ID"]), item["quantity"], item.get("Цена", 0)) for item in self._items.values())
+        return hashlib.sha1(repr(content).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def total(self):
+        return sum(item.get('Цена', 0) * item['quantity'] for item in self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+
+class CartService:
+    """Загрузка и сохранение корзины в FSM-хранилище; запись только при реальных изменениях"""
+
+    KEY = "cart"
+
+    async def load(self, state: FSMContext) -> Cart:
+        try:
+            data = await state.get_data()
+            return Cart.from_data(data.get(self.KEY))
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения корзины: {str(e)}")
+            return Cart()
+
+    async def save(self, state: FSMContext, cart: Cart) -> bool:
+        if not cart.dirty:
+            return False
+        try:
+            await state.update_data({self.KEY: cart.to_data()})
+            cart.dirty = False
+            logger.debug(f"💾 Корзина сохранена: {len(cart)} товаров")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения корзины: {str(e)}")
+            return False
+
+
+cart_service = CartService()
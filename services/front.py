@@ -0,0 +1,154 @@
+import asyncio
+import secrets
+import signal
+import logging
+from aiohttp import web, ClientSession, ClientTimeout, ClientError
+from aiogram import Bot
+from config.settings import Config
+from services.webhook import get_update_chat_id
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateRouter:
+    """
+    Распределение апдейтов от Telegram между процессами-воркерами.
+
+    Чат закреплен за воркером по chat_id % N, поэтому все апдейты одного
+    пользователя попадают в один процесс. Внутри воркера у чата своя очередь
+    (lane): апдейты пересылаются в ней строго по одному и в порядке поступления,
+    а разные очереди работают параллельно. Недоступный воркер не теряет
+    апдейты — пересылка повторяется, пока воркер не ответит.
+    """
+
+    RETRY_DELAYS = (0.5, 1, 2, 5)
+
+    def __init__(self, worker_urls, lanes_per_worker=None, secret=None, queue_size=1000):
+        if not worker_urls:
+            raise RuntimeError("Не задан WORKER_URLS: список адресов воркеров")
+        self.worker_urls = worker_urls
+        self.lanes_per_worker = lanes_per_worker or Config.FRONT_LANES
+        self.secret = secret
+        self._queues = [
+            [asyncio.Queue(maxsize=queue_size) for _ in range(self.lanes_per_worker)]
+            for _ in worker_urls
+        ]
+        self._tasks = []
+        self._session = None
+        self.forwarded = 0
+
+    def route(self, chat_id):
+        """(номер воркера, номер очереди) для чата"""
+        chat_id = abs(chat_id or 0)
+        worker = chat_id % len(self.worker_urls)
+        lane = (chat_id // len(self.worker_urls)) % self.lanes_per_worker
+        return worker, lane
+
+    async def put(self, update):
+        worker, lane = self.route(get_update_chat_id(update))
+        await self._queues[worker][lane].put(update)
+
+    async def _forward(self, url, update):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.secret} if self.secret else {}
+        attempt = 0
+        while True:
+            try:
+                async with self._session.post(url, json=update, headers=headers) as response:
+                    if response.status < 500:
+                        if response.status != 200:
+                            logger.warning(f"⚠️ Воркер {url} ответил {response.status}, апдейт пропущен")
+                        return
+                    error = f"HTTP {response.status}"
+            except (ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            delay = self.RETRY_DELAYS[min(attempt, len(self.RETRY_DELAYS) - 1)]
+            attempt += 1
+            logger.warning(f"⚠️ Воркер {url} недоступен ({error}), повтор через {delay} с")
+            await asyncio.sleep(delay)
+
+    async def _lane(self, url, queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self._forward(url, update)
+                self.forwarded += 1
+            finally:
+                queue.task_done()
+
+    def start(self):
+        self._session = ClientSession(timeout=ClientTimeout(total=30))
+        for url, queues in zip(self.worker_urls, self._queues):
+            for queue in queues:
+                self._tasks.append(asyncio.create_task(self._lane(url, queue)))
+        logger.info(f"🔀 Воркеров: {len(self.worker_urls)}, очередей на воркер: {self.lanes_per_worker}")
+
+    async def drain(self, timeout):
+        """Дождаться пересылки уже принятых апдейтов"""
+        pending = [queue.join() for queues in self._queues for queue in queues]
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), timeout)
+        except asyncio.TimeoutError:
+            left = sum(queue.qsize() for queues in self._queues for queue in queues)
+            logger.warning(f"⚠️ Не переслано {left} апдейтов за {timeout} с")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._session is not None:
+            await self._session.close()
+
+
+async def run_front(bot: Bot, stop_event: asyncio.Event = None):
+    """
+    Фронтовой процесс: принимает webhook от Telegram и раздает апдейты воркерам.
+    Воркеры — обычные процессы бота в режиме BOT_MODE=webhook без WEBHOOK_URL,
+    каждый на своем порту.
+    """
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    worker_urls = [url.strip() for url in Config.WORKER_URLS.split(",") if url.strip()]
+    router = UpdateRouter(worker_urls, secret=Config.WEBHOOK_SECRET or None)
+    draining = False
+
+    async def handle(request):
+        if draining:
+            return web.Response(status=503, text="Shutting down")
+        if Config.WEBHOOK_SECRET and not secrets.compare_digest(
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), Config.WEBHOOK_SECRET):
+            return web.Response(status=401, text="Unauthorized")
+        await router.put(await request.json())
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_post(Config.WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT).start()
+    router.start()
+    logger.info(f"🌐 Фронт слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+
+    if Config.WEBHOOK_URL:
+        await bot.set_webhook(
+            Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+            secret_token=Config.WEBHOOK_SECRET or None,
+            max_connections=min(Config.WEBHOOK_MAX_IN_FLIGHT, 100)
+        )
+        logger.info(f"✅ Webhook зарегистрирован: {Config.WEBHOOK_URL}")
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("🛑 Остановка фронта...")
+        draining = True
+        await router.drain(Config.WEBHOOK_DRAIN_TIMEOUT)
+        await router.stop()
+        await runner.cleanup()
+        logger.info(f"✅ Фронт остановлен, переслано апдейтов: {router.forwarded}")
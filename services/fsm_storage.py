@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище в локальном файле SQLite.
+
+    Состояние и данные (включая корзину) переживают перезапуск бота.
+    Каждая запись продлевает срок жизни ключа на ttl секунд; просроченные
+    записи не читаются и удаляются фоновым сборщиком.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.path.join(Config.DATA_DIR, "fsm.sqlite3")
+        self.ttl = ttl if ttl is not None else Config.FSM_TTL
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}', expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fsm_expires ON fsm (expires_at)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run(self, sql, params=()):
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        now = time.time()
+        # Данные просроченной, но еще не удаленной записи не должны «воскреснуть»
+        await self._run(
+            "INSERT INTO fsm (key, state, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state, "
+            "data = CASE WHEN fsm.expires_at <= ? THEN '{}' ELSE fsm.data END, "
+            "expires_at = excluded.expires_at",
+            (self.key_builder.build(key), state, now + self.ttl, now)
+        )
+
+    async def get_state(self, key):
+        rows = await self._run(
+            "SELECT state FROM fsm WHERE key = ? AND expires_at > ?",
+            (self.key_builder.build(key), time.time())
+        )
+        return rows[0][0] if rows else None
+
+    async def set_data(self, key, data):
+        now = time.time()
+        await self._run(
+            "INSERT INTO fsm (key, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data, "
+            "state = CASE WHEN fsm.expires_at <= ? THEN NULL ELSE fsm.state END, "
+            "expires_at = excluded.expires_at",
+            (self.key_builder.build(key), json.dumps(data, ensure_ascii=False), now + self.ttl, now)
+        )
+
+    async def get_data(self, key):
+        rows = await self._run(
+            "SELECT data FROM fsm WHERE key = ? AND expires_at > ?",
+            (self.key_builder.build(key), time.time())
+        )
+        return json.loads(rows[0][0]) if rows else {}
+
+    async def sweep(self):
+        """Удаление просроченных записей"""
+        def delete_expired():
+            with self._lock:
+                return self._conn.execute("DELETE FROM fsm WHERE expires_at <= ?", (time.time(),)).rowcount
+
+        removed = await asyncio.to_thread(delete_expired)
+        if removed:
+            logger.info(f"🧹 FSM: удалено просроченных записей: {removed}")
+        return removed
+
+    async def size(self):
+        rows = await self._run("SELECT COUNT(*) FROM fsm WHERE expires_at > ?", (time.time(),))
+        return rows[0][0]
+
+    def start_sweeper(self, interval=None):
+        """Фоновая очистка просроченных записей"""
+        interval = interval or Config.FSM_SWEEP_INTERVAL
+
+        async def sweeper():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.sweep()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка очистки FSM-хранилища: {e}")
+
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(sweeper())
+        return self._sweeper
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+def create_fsm_storage():
+    """
+    Создание FSM-хранилища по настройке FSM_STORAGE:
+    sqlite (по умолчанию), redis (FSM_REDIS_URL, нужен пакет redis) или memory.
+    """
+    backend = Config.FSM_STORAGE.lower()
+
+    if backend == "memory":
+        logger.warning("⚠️ FSM в памяти: корзины будут потеряны при перезапуске")
+        return MemoryStorage()
+
+    if backend == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError:
+            raise RuntimeError("Для FSM_STORAGE=redis установите пакет redis: pip install redis")
+        logger.info(f"🗄 FSM-хранилище: Redis ({Config.FSM_REDIS_URL})")
+        return RedisStorage.from_url(
+            Config.FSM_REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_destiny=True),
+            state_ttl=Config.FSM_TTL,
+            data_ttl=Config.FSM_TTL
+        )
+
+    storage = SQLiteStorage()
+    logger.info(f"🗄 FSM-хранилище: SQLite ({storage.path}), TTL {storage.ttl} с")
+    return storage
@@ -1,33 +1,89 @@
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from google.oauth2.service_account import Credentials
 from datetime import datetime, timedelta
 import pytz
+import asyncio
 import logging
 import os
+import threading
 import time
 import json
+import hashlib
+from collections import OrderedDict
+from types import MappingProxyType
 from config.settings import Config
+from utils.date_utils import deadline_clock
+from utils.metrics import registry, SHEETS_CALLS, SHEETS_LATENCY, CACHE_REQUESTS
+from utils.api_trace import api_call_stats
 
 logger = logging.getLogger(__name__)
 
 
+def record_sheets_call(method, sheet, func, *args, **kwargs):
+    """Вызов Sheets API с учетом в метриках и в статистике по обработчикам"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        SHEETS_LATENCY.observe(duration, method=method, sheet=sheet)
+        SHEETS_CALLS.inc(method=method, sheet=sheet, outcome=outcome)
+        api_call_stats.record(method, sheet, duration, outcome)
+
+
+class InstrumentedWorksheet:
+    """Обертка листа gspread: каждый вызов метода попадает в метрики"""
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+        self.title = worksheet.title
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return record_sheets_call(name, self.title, attr, *args, **kwargs)
+        return call
+
+
 class GoogleSheetsService:
+    CONNECT_RETRY_INTERVAL = 60
+
     def __init__(self):
         self.is_local_mode = Config.LOCAL_MODE
         self.spreadsheet = None
         self.client = None
+        self._worksheets = {}  # название -> лист; заполняется одним вызовом worksheets()
+        self._connect_lock = threading.Lock()
+        self._next_connect_attempt = 0.0
         self.timezone = pytz.timezone(Config.TIMEZONE)
         self.cache = {
             'menu': {'data': None, 'timestamp': None},
+            'menu_all': {'data': None, 'timestamp': None},
             'employees': {'data': None, 'timestamp': None},
             'orders': {'data': None, 'timestamp': None},
             'settings': {'data': None, 'timestamp': None}
         }
         self.CACHE_TTL = 300  # 5 минут кэширования
-
-        if not self.is_local_mode:
-            self._init_google_client()
+        self.data_versions = {}  # ключ кэша -> хэш содержимого (меняется только при изменении данных)
+        self.frozen_orders = {}  # дата доставки -> неизменяемый снимок заказов
+        self._menu_index = None
+        self._menu_active_col = None  # номер колонки «Активно» (с 1), определяется при загрузке menu_all
+        self._menu_id_col = None  # номер колонки ID (с 1), там же
+        self._orders_index = (None, {})  # (исходный список заказов, дата доставки -> заказы)
+        self._kitchen_totals = (None, {})  # (исходный список заказов, дата доставки -> итоги по кафе)
+        self.frozen_totals = {}  # дата доставки -> итоги по кафе зафиксированного дня
+        self._order_results = OrderedDict()  # ключ идемпотентности -> (время, результат add_order)
+        self._orders_in_flight = {}  # ключ идемпотентности -> threading.Event записи, которая идет сейчас
+        self._order_lock = threading.Lock()
+        self.invalidation_listeners = []  # вызываются с ключами сброшенного кэша (рассылка другим процессам)
+        # Подключение к Google — лениво, при первом обращении или через connect()
 
     def _init_google_client(self):
         """Инициализация подключения к Google Sheets с детальной диагностикой и обработкой ошибок аутентификации"""
@@ -82,6 +138,8 @@ class GoogleSheetsService:
                     )
 
                     self.client = gspread.authorize(creds)
+                    # Без таймаута зависший запрос пережил бы аренду пачки заказов в журнале
+                    self.client.set_timeout(Config.SHEETS_TIMEOUT)
                     logger.info("✅ Успешная аутентификация в Google API")
                     break
 
@@ -115,21 +173,19 @@ class GoogleSheetsService:
 
             # Открытие таблицы
             logger.info(f"📄 Попытка открыть таблицу с ID: {Config.SPREADSHEET_ID}")
-            self.spreadsheet = self.client.open_by_key(Config.SPREADSHEET_ID)
+            self.spreadsheet = record_sheets_call("open_by_key", "*", self.client.open_by_key, Config.SPREADSHEET_ID)
             logger.info(f"✅ Таблица успешно открыта: {self.spreadsheet.title}")
 
-            # Проверка наличия всех необходимых листов
+            # Проверка наличия всех необходимых листов (один запрос метаданных)
             required_sheets = ["Сотрудники", "Меню", "Заказы", "Настройки"]
-            existing_sheets = [sheet.title for sheet in self.spreadsheet.worksheets()]
+            existing_sheets = self._load_worksheets()
 
             logger.info(f"📋 Доступные листы: {', '.join(existing_sheets)}")
 
-            for sheet in required_sheets:
-                if sheet not in existing_sheets:
-                    logger.warning(f"⚠️ Отсутствует обязательный лист: {sheet}")
-                    self._create_required_sheet(sheet)
-                else:
-                    logger.info(f"✅ Лист '{sheet}' существует")
+            missing_sheets = [sheet for sheet in required_sheets if sheet not in existing_sheets]
+            if missing_sheets:
+                logger.warning(f"⚠️ Отсутствуют обязательные листы: {', '.join(missing_sheets)}")
+                self._create_required_sheets(missing_sheets)
 
         except Exception as e:
             logger.error(f"❌ Критическая ошибка подключения к Google Sheets: {str(e)}", exc_info=True)
@@ -142,90 +198,110 @@ class GoogleSheetsService:
 
             self.spreadsheet = None
 
-    def _create_required_sheet(self, sheet_name):
-        """Создание обязательного листа с правильной структурой (БЕЗ категории в меню)"""
+    def _required_sheet_template(self, sheet_name):
+        """Размер и начальные строки обязательного листа (БЕЗ категории в меню)"""
+        today = datetime.now(self.timezone).strftime("%Y-%m-%d")
+        next_year = (datetime.now(self.timezone) + timedelta(days=365)).strftime("%Y-%m-%d")
+
+        if sheet_name == "Сотрудники":
+            return 5, [["Telegram ID", "ФИО", "Роль", "Статус", "Дата регистрации"]]
+        if sheet_name == "Меню":
+            return 8, [
+                ["ID", "Кафе", "Название", "Описание", "Активно", "Дата_начала", "Дата_окончания", "Цена"],
+                [1, "Coffee Time", "Борщ", "Свекольный суп с говядиной", "Да", today, next_year, 250],
+                [2, "Coffee Time", "Котлета", "Куриная котлета с гречкой", "Да", today, next_year, 300],
+                [3, "Coffee Time", "Салат Цезарь", "Салат с курицей и соусом", "Да", today, next_year, 200],
+                [4, "Coffee Time", "Чай черный", "Черный чай с лимоном", "Да", today, next_year, 50],
+                [5, "Coffee Time", "Компот", "Фруктовый компот", "Да", today, next_year, 70],
+                [6, "Coffee Time", "Хлеб", "Свежий белый хлеб", "Да", today, next_year, 30]
+            ]
+        if sheet_name == "Заказы":
+            return 8, [["ID", "Дата_заказа", "Дата_доставки", "Сотрудник", "Кафе", "Состав", "Сумма", "Статус"]]
+        if sheet_name == "Настройки":
+            return 3, [
+                ["Ключ", "Значение", "Описание"],
+                ["order_deadline_hour", "10", "Час дедлайна заказа"],
+                ["order_deadline_minute", "0", "Минуты дедлайна заказа"],
+                ["allowed_order_days", "1", "Дней вперед для заказа"],
+                ["default_cafe", "Coffee Time", "Кафе по умолчанию"],
+                ["default_delivery_time", "13:00-14:00", "Время доставки по умолчанию"]
+            ]
+        return None
+
+    def _create_required_sheets(self, sheet_names):
+        """
+        Создание отсутствующих обязательных листов: один запрос на добавление
+        всех листов и один на запись их начальных строк.
+        """
+        templates = {name: self._required_sheet_template(name) for name in sheet_names}
+        templates = {name: template for name, template in templates.items() if template}
+        if not templates:
+            return
         try:
-            logger.info(f"🔧 Создаю отсутствующий лист '{sheet_name}'...")
-
-            if sheet_name == "Сотрудники":
-                new_sheet = self.spreadsheet.add_worksheet(title="Сотрудники", rows=100, cols=5)
-                new_sheet.append_row(["Telegram ID", "ФИО", "Роль", "Статус", "Дата регистрации"])
-                logger.info("✅ Лист 'Сотрудники' успешно создан с правильной структурой")
-
-            elif sheet_name == "Меню":
-                new_sheet = self.spreadsheet.add_worksheet(title="Меню", rows=100, cols=8)
-                new_sheet.append_row([
-                    "ID", "Кафе", "Название", "Описание",
-                    "Активно", "Дата_начала", "Дата_окончания", "Цена"
-                ])
-
-                today = datetime.now(self.timezone).strftime("%Y-%m-%d")
-                next_year = (datetime.now(self.timezone) + timedelta(days=365)).strftime("%Y-%m-%d")
-
-                test_dishes = [
-                    [1, "Coffee Time", "Борщ", "Свекольный суп с говядиной", "Да", today, next_year, 250],
-                    [2, "Coffee Time", "Котлета", "Куриная котлета с гречкой", "Да", today, next_year, 300],
-                    [3, "Coffee Time", "Салат Цезарь", "Салат с курицей и соусом", "Да", today, next_year, 200],
-                    [4, "Coffee Time", "Чай черный", "Черный чай с лимоном", "Да", today, next_year, 50],
-                    [5, "Coffee Time", "Компот", "Фруктовый компот", "Да", today, next_year, 70],
-                    [6, "Coffee Time", "Хлеб", "Свежий белый хлеб", "Да", today, next_year, 30]
-                ]
-
-                for dish in test_dishes:
-                    new_sheet.append_row(dish)
-
-                logger.info("✅ Лист 'Меню' успешно создан с тестовыми данными (БЕЗ категории)")
-
-            elif sheet_name == "Заказы":
-                new_sheet = self.spreadsheet.add_worksheet(title="Заказы", rows=100, cols=8)
-                new_sheet.append_row([
-                    "ID", "Дата_заказа", "Дата_доставки", "Сотрудник",
-                    "Кафе", "Состав", "Сумма", "Статус"
-                ])
-                logger.info("✅ Лист 'Заказы' успешно создан")
-
-            elif sheet_name == "Настройки":
-                new_sheet = self.spreadsheet.add_worksheet(title="Настройки", rows=100, cols=3)
-                new_sheet.append_row(["Ключ", "Значение", "Описание"])
-
-                default_settings = [
-                    ["order_deadline_hour", "10", "Час дедлайна заказа"],
-                    ["order_deadline_minute", "0", "Минуты дедлайна заказа"],
-                    ["allowed_order_days", "1", "Дней вперед для заказа"],
-                    ["default_cafe", "Coffee Time", "Кафе по умолчанию"],
-                    ["default_delivery_time", "13:00-14:00", "Время доставки по умолчанию"]
-                ]
-
-                for setting in default_settings:
-                    new_sheet.append_row(setting)
-
-                logger.info("✅ Лист 'Настройки' успешно создан с настройками по умолчанию")
-
+            logger.info(f"🔧 Создаю отсутствующие листы: {', '.join(templates)}")
+            record_sheets_call("batch_update", "*", self.spreadsheet.batch_update, {"requests": [
+                {"addSheet": {"properties": {
+                    "title": name,
+                    "gridProperties": {"rowCount": 100, "columnCount": cols}
+                }}}
+                for name, (cols, rows) in templates.items()
+            ]})
+            record_sheets_call("values_batch_update", "*", self.spreadsheet.values_batch_update, {
+                "valueInputOption": "RAW",
+                "data": [{"range": f"'{name}'!A1", "values": rows} for name, (cols, rows) in templates.items()]
+            })
+            logger.info(f"✅ Листы созданы: {', '.join(templates)}")
         except Exception as e:
-            logger.error(f"❌ Не удалось создать лист '{sheet_name}': {str(e)}", exc_info=True)
+            logger.error(f"❌ Не удалось создать листы {', '.join(templates)}: {str(e)}", exc_info=True)
+        self._load_worksheets()
+
+    def _load_worksheets(self):
+        """Все листы таблицы одним запросом метаданных"""
+        worksheets = record_sheets_call("worksheets", "*", self.spreadsheet.worksheets)
+        self._worksheets = {sheet.title: InstrumentedWorksheet(sheet) for sheet in worksheets}
+        return self._worksheets
+
+    def _ensure_connected(self):
+        """Ленивое подключение при первом обращении; после ошибки — повтор не чаще CONNECT_RETRY_INTERVAL"""
+        if self.spreadsheet is not None:
+            return True
+        with self._connect_lock:
+            if self.spreadsheet is not None:
+                return True
+            if time.monotonic() < self._next_connect_attempt:
+                return False
+            self._init_google_client()
+            if self.spreadsheet is None:
+                self._next_connect_attempt = time.monotonic() + self.CONNECT_RETRY_INTERVAL
+            return self.spreadsheet is not None
+
+    async def connect(self):
+        """Подключение в фоне после запуска цикла событий, не задерживая прием апдейтов"""
+        if self.is_local_mode:
+            return True
+        started = time.monotonic()
+        connected = await asyncio.to_thread(self._ensure_connected)
+        if connected:
+            logger.info(f"✅ Google Sheets готов за {time.monotonic() - started:.2f} с")
+        return connected
 
     def get_worksheet(self, name):
-        """Получение листа таблицы с автоматическим созданием при отсутствии"""
+        """Получение листа таблицы (из кэша листов) с автоматическим созданием при отсутствии"""
         if self.is_local_mode:
             logger.warning("⚠️ Работаю в ЛОКАЛЬНОМ режиме (без Google Sheets)")
             return None
 
-        if not self.spreadsheet:
+        if not self._ensure_connected():
             logger.error("❌ Нет подключения к Google Sheets")
             return None
 
         try:
-            worksheet = self.spreadsheet.worksheet(name)
-            logger.debug(f"✅ Лист '{name}' успешно получен")
+            worksheet = self._worksheets.get(name)
+            if worksheet is None:
+                logger.error(f"❌ Лист '{name}' не найден в таблице")
+                self._create_required_sheets([name])
+                worksheet = self._worksheets.get(name)
             return worksheet
-        except gspread.exceptions.WorksheetNotFound:
-            logger.error(f"❌ Лист '{name}' не найден в таблице")
-            self._create_required_sheet(name)
-            try:
-                return self.spreadsheet.worksheet(name)
-            except Exception as e:
-                logger.error(f"❌ Окончательная ошибка получения листа '{name}': {str(e)}")
-                return None
         except Exception as e:
             logger.error(f"❌ Ошибка получения листа '{name}': {str(e)}", exc_info=True)
             return None
@@ -233,22 +309,84 @@ class GoogleSheetsService:
     def _get_cached_data(self, cache_key, fetch_func):
         """Получение данных с кэшированием"""
         if self.is_local_mode:
-            return fetch_func()
+            data = fetch_func()
+            self._update_version(cache_key, data)
+            return data
 
         current_time = datetime.now().timestamp()
         cached = self.cache[cache_key]
 
         if cached['data'] is not None and (current_time - cached['timestamp']) < self.CACHE_TTL:
+            CACHE_REQUESTS.inc(key=cache_key, result="hit")
             return cached['data']
 
         try:
             data = fetch_func()
+            CACHE_REQUESTS.inc(key=cache_key, result="miss")
             self.cache[cache_key] = {'data': data, 'timestamp': current_time}
+            self._update_version(cache_key, data)
             return data
         except Exception as e:
             logger.error(f"❌ Ошибка получения данных для {cache_key}: {str(e)}")
+            CACHE_REQUESTS.inc(key=cache_key, result="stale")
             return cached['data'] if cached['data'] is not None else []
 
+    def cache_ages(self):
+        """Возраст загруженных данных по ключам кэша, секунды (None — данные не загружены)"""
+        now = datetime.now().timestamp()
+        return {
+            cache_key: (now - cached['timestamp']) if cached['data'] is not None and cached['timestamp'] else None
+            for cache_key, cached in self.cache.items()
+        }
+
+    @property
+    def is_connected(self):
+        return self.is_local_mode or self.spreadsheet is not None
+
+    def probe(self):
+        """Проверочный запрос к таблице (только ID, без данных листов); ошибки пробрасываются"""
+        if self.is_local_mode:
+            return
+        if self.spreadsheet is None:
+            raise RuntimeError("Нет подключения к Google Sheets")
+        self.spreadsheet.fetch_sheet_metadata({"fields": "spreadsheetId"})
+
+    def _update_version(self, cache_key, data):
+        version = hashlib.sha1(
+            json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()[:16]
+        if self.data_versions.get(cache_key) != version:
+            self.data_versions[cache_key] = version
+            logger.debug(f"🔖 Новая версия данных '{cache_key}': {version}")
+
+    def get_data_version(self, cache_key):
+        """Версия (хэш) последних загруженных данных; None, если данные еще не загружались"""
+        return self.data_versions.get(cache_key)
+
+    def expire_cache(self, *cache_keys):
+        """Пометить кэш устаревшим, сохранив данные как резерв на случай ошибки чтения"""
+        for cache_key in cache_keys or self.cache.keys():
+            if cache_key in self.cache:
+                self.cache[cache_key]['timestamp'] = 0
+
+    def invalidate(self, *cache_keys, publish=True):
+        """
+        Сброс кэша после изменения данных.
+        При publish=True об изменении узнают и другие процессы бота (через invalidation_listeners).
+        """
+        for cache_key in cache_keys:
+            if cache_key in self.cache:
+                self.cache[cache_key] = {'data': None, 'timestamp': None}
+        if publish:
+            self._publish_invalidation(cache_keys)
+
+    def _publish_invalidation(self, cache_keys):
+        for listener in self.invalidation_listeners:
+            try:
+                listener(cache_keys)
+            except Exception as e:
+                logger.error(f"❌ Ошибка оповещения о сбросе кэша: {e}")
+
     def get_employees(self):
         def fetch_employees():
             if self.is_local_mode:
@@ -347,10 +485,124 @@ class GoogleSheetsService:
 
         return self._get_cached_data('menu', fetch_dishes)
 
-    # ✅ ДОБАВЛЕННЫЙ МЕТОД — ОБЯЗАТЕЛЕН ДЛЯ АДМИН-ПАНЕЛИ
+    def get_menu_index(self):
+        """
+        Индекс активного меню: блюда по ID и предвычисленные срезы по кафе с версией каждого среза.
+        Перестраивается только при смене версии данных меню.
+        """
+        dishes = self.get_active_dishes()
+        version = self.get_data_version('menu')
+        if self._menu_index is not None and self._menu_index['version'] == version:
+            return self._menu_index
+
+        by_cafe = {}
+        for dish in dishes:
+            by_cafe.setdefault(str(dish.get("Кафе", "Coffee Time")), []).append(dish)
+
+        # Версия каждого кафе отдельно: правка блюда одного кафе не сбрасывает страницы других
+        previous = self._menu_index['cafe_versions'] if self._menu_index else {}
+        cafe_versions = {}
+        for cafe, cafe_dishes in by_cafe.items():
+            cafe_version = hashlib.sha1(
+                json.dumps(cafe_dishes, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+            ).hexdigest()[:16]
+            if previous.get(cafe) != cafe_version:
+                logger.debug(f"🔖 Новая версия меню кафе '{cafe}': {cafe_version}")
+            cafe_versions[cafe] = cafe_version
+
+        self._menu_index = {
+            'version': version,
+            'dishes': dishes,
+            'by_id': {str(dish["ID"]): dish for dish in dishes},
+            'cafes': sorted(by_cafe),
+            'by_cafe': by_cafe,
+            'cafe_versions': cafe_versions
+        }
+        return self._menu_index
+
+    def get_all_dishes(self):
+        """
+        Все блюда меню (активные и неактивные) с номерами строк листа — для админки.
+        Номер строки позволяет менять статус блюда одной записью, без перечитывания листа.
+        """
+        def fetch_all_dishes():
+            if self.is_local_mode:
+                return [
+                    {"ID": str(dish["ID"]), "Название": dish["Название"], "Активно": dish["Активно"], "Строка": i + 2}
+                    for i, dish in enumerate(self.get_active_dishes())
+                ]
+
+            worksheet = self.get_worksheet("Меню")
+            if not worksheet:
+                return []
+
+            all_values = worksheet.get_all_values()
+            if not all_values:
+                return []
+
+            headers = [h.strip().lower() for h in all_values[0]]
+            if "id" not in headers or "активно" not in headers:
+                logger.error(f"❌ Колонки ID/Активно не найдены. Заголовки: {headers}")
+                return []
+            id_col = headers.index("id")
+            active_col = headers.index("активно")
+            name_col = headers.index("название") if "название" in headers else None
+            self._menu_active_col = active_col + 1
+            self._menu_id_col = id_col + 1
+
+            dishes = []
+            for row_number, row in enumerate(all_values[1:], start=2):
+                dish_id = str(row[id_col]).strip() if id_col < len(row) else ""
+                if not dish_id:
+                    continue
+                name = str(row[name_col]).strip() if name_col is not None and name_col < len(row) else ""
+                dishes.append({
+                    "ID": dish_id,
+                    "Название": name or "Без названия",
+                    "Активно": str(row[active_col]).strip() if active_col < len(row) else "Нет",
+                    "Строка": row_number
+                })
+            return dishes
+
+        return self._get_cached_data('menu_all', fetch_all_dishes)
+
+    def _find_dish_row(self, dish_id):
+        """Блюдо из кэша полного меню; при промахе кэш перечитывается один раз (блюдо могли добавить вручную)"""
+        for attempt in range(2):
+            for dish in self.get_all_dishes():
+                if dish["ID"] == str(dish_id):
+                    return dish
+            if attempt == 0:
+                self.invalidate('menu_all', publish=False)
+        return None
+
+    def _verified_dish_row(self, worksheet, dish_id):
+        """
+        Блюдо из кэша, сверенное с листом: строку могли сдвинуть правкой вручную.
+        Строка проверяется одним чтением; при расхождении полное меню перечитывается.
+        Возвращает (блюдо, текущее значение «Активно») или (None, None).
+
+        Это отступление от «одна запись без чтений»: у Sheets API нет условной записи ячейки,
+        а без проверки ручная правка листа в пределах CACHE_TTL переключила бы чужое блюдо.
+        Чтение одной строки дешево по сравнению с перечитыванием листа.
+        """
+        for attempt in range(2):
+            dish = self._find_dish_row(dish_id)
+            if dish is None or not self._menu_active_col or not self._menu_id_col:
+                return None, None
+            row = worksheet.row_values(dish["Строка"])
+            row += [""] * (max(self._menu_id_col, self._menu_active_col) - len(row))
+            if str(row[self._menu_id_col - 1]).strip() == str(dish_id):
+                return dish, str(row[self._menu_active_col - 1]).strip()
+            logger.warning(f"⚠️ Строка {dish['Строка']} листа 'Меню' больше не блюдо ID {dish_id}, перечитываем меню")
+            self.invalidate('menu_all', publish=False)
+        return None, None
+
     def toggle_dish_status(self, dish_id: int) -> bool:
         """
         Переключает статус блюда (Да ↔ Нет) по ID в листе 'Меню'.
+        Строка берется из кэша полного меню и перед записью сверяется с листом чтением одной строки
+        (одно чтение и одна запись вместо чтения всего листа); кэш обновляется сразу, не дожидаясь перечитывания листа.
         Возвращает True при успехе, False — если не найдено или ошибка.
         """
         if self.is_local_mode:
@@ -363,48 +615,83 @@ class GoogleSheetsService:
                 logger.error("❌ Не удалось получить лист 'Меню'")
                 return False
 
-            all_values = worksheet.get_all_values()
-            if not all_values:
-                logger.warning("⚠️ Лист 'Меню' пуст")
+            dish, current = self._verified_dish_row(worksheet, dish_id)
+            if dish is None:
+                logger.warning(f"⚠️ Блюдо ID {dish_id} не найдено")
                 return False
 
-            headers = [h.strip().lower() for h in all_values[0]]
-            try:
-                id_col = headers.index("id")
-                active_col = headers.index("активно")
-            except ValueError as e:
-                logger.error(f"❌ Колонки ID/Активно не найдены. Заголовки: {headers}")
-                return False
+            current = current.lower()
+            new_status = "Нет" if current in ("да", "yes", "1", "true", "+", "✓") else "Да"
+            worksheet.update_cell(dish["Строка"], self._menu_active_col, new_status)
 
-            # Поиск по ID (начиная со строки 2)
-            for row_idx in range(1, len(all_values)):  # row_idx = 1 → 2-я строка в таблице
-                row = all_values[row_idx]
-                if len(row) <= id_col:
-                    continue
-                try:
-                    row_id = str(row[id_col]).strip()
-                    if row_id == str(dish_id):
-                        current = str(row[active_col]).strip().lower() if active_col < len(row) else ""
-                        new_status = "Нет" if current in ("да", "yes", "1", "true", "+", "✓") else "Да"
-
-                        # Обновление ячейки (нумерация с 1)
-                        worksheet.update_cell(row_idx + 1, active_col + 1, new_status)
-
-                        # Сброс кэша
-                        self.cache['menu'] = {'data': None, 'timestamp': None}
-                        logger.info(f"✅ Статус блюда ID {dish_id} переключён на '{new_status}'")
-                        return True
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка обработки строки {row_idx + 1}: {e}")
-                    continue
-
-            logger.warning(f"⚠️ Блюдо ID {dish_id} не найдено")
-            return False
+            # Оптимистичное обновление: полное меню правим на месте, активное меню перечитается при запросе
+            dish["Активно"] = new_status
+            self.invalidate('menu', publish=False)
+            self._publish_invalidation(('menu', 'menu_all'))
+            logger.info(f"✅ Статус блюда ID {dish_id} переключён на '{new_status}'")
+            return True
 
         except Exception as e:
             logger.error(f"❌ Ошибка toggle_dish_status для ID {dish_id}: {e}", exc_info=True)
             return False
 
+    def get_menu_sheet_values(self):
+        """Лист «Меню» целиком (с заголовком) одним чтением — для сверки при импорте"""
+        if self.is_local_mode:
+            header = ["ID", "Кафе", "Название", "Описание", "Активно", "Дата_начала", "Дата_окончания", "Цена"]
+            return [header] + [[str(dish.get(column, "")) for column in header] for dish in self.get_active_dishes()]
+
+        worksheet = self.get_worksheet("Меню")
+        if not worksheet:
+            raise RuntimeError("Лист «Меню» недоступен")
+        return worksheet.get_all_values()
+
+    def apply_menu_import(self, plan):
+        """
+        Применение плана импорта меню одним запросом batch_update:
+        изменения и выключения — по ячейкам, новые блюда — appendCells в конец листа.
+        Запрос атомарный: либо применяется целиком, либо не применяется ничего.
+        """
+        if self.is_local_mode:
+            logger.info(f"[ЛОКАЛЬНЫЙ РЕЖИМ] Импорт меню: +{len(plan.inserts)}, "
+                        f"~{len(plan.updates)}, -{len(plan.deactivations)}")
+            return True
+
+        worksheet = self.get_worksheet("Меню")
+        if not worksheet:
+            raise RuntimeError("Лист «Меню» недоступен")
+
+        def cell(value):
+            return {"userEnteredValue": {"stringValue": str(value)}}
+
+        def update_cell_request(row_number, column, value):
+            return {"updateCells": {
+                "rows": [{"values": [cell(value)]}],
+                "fields": "userEnteredValue",
+                "start": {"sheetId": worksheet.id, "rowIndex": row_number - 1,
+                          "columnIndex": plan.header.index(column)}
+            }}
+
+        requests = []
+        for row_number, _, dish, changed in plan.updates:
+            requests.extend(update_cell_request(row_number, column, dish[column]) for column in changed)
+        for row_number, _ in plan.deactivations:
+            requests.append(update_cell_request(row_number, "Активно", "Нет"))
+        if plan.inserts:
+            requests.append({"appendCells": {
+                "sheetId": worksheet.id,
+                "rows": [{"values": [cell(value) for value in plan.row_values(dish)]} for dish in plan.inserts],
+                "fields": "userEnteredValue"
+            }})
+        if not requests:
+            return True
+
+        record_sheets_call("batch_update", "Меню", self.spreadsheet.batch_update, {"requests": requests})
+        self.invalidate('menu', 'menu_all')
+        logger.info(f"✅ Меню импортировано: новых {len(plan.inserts)}, изменено {len(plan.updates)}, "
+                    f"выключено {len(plan.deactivations)}")
+        return True
+
     def add_dish(self, dish_name, description, price, cafe="Coffee Time"):
         if self.is_local_mode:
             logger.info(f"🍽️ [ЛОКАЛЬНЫЙ РЕЖИМ] Добавление блюда: {dish_name}, {price}₽")
@@ -432,7 +719,7 @@ class GoogleSheetsService:
                 str(price)
             ])
 
-            self.cache['menu'] = {'data': None, 'timestamp': None}
+            self.invalidate('menu', 'menu_all')
             logger.info(f"✅ Блюдо добавлено: {dish_name}, ID: {next_id}")
             return True
 
@@ -456,7 +743,7 @@ class GoogleSheetsService:
                 return False
 
             worksheet.delete_rows(cell.row)
-            self.cache['menu'] = {'data': None, 'timestamp': None}
+            self.invalidate('menu', 'menu_all')
             logger.info(f"✅ Блюдо ID {dish_id} удалено")
             return True
 
@@ -487,6 +774,55 @@ class GoogleSheetsService:
 
         return self._get_cached_data('orders', fetch_orders)
 
+    def get_orders_by_delivery_date(self, delivery_date):
+        """Заказы на дату доставки из индекса, перестраиваемого только при обновлении кэша заказов"""
+        orders = self.get_all_orders()
+        source, index = self._orders_index
+        if source is not orders:
+            index = {}
+            for order in orders:
+                index.setdefault(str(order.get("Дата_доставки", "")).strip(), []).append(order)
+            self._orders_index = (orders, index)
+        return index.get(delivery_date, [])
+
+    @staticmethod
+    def aggregate_orders(orders):
+        """Итоги для кухни по кафе: число заказов, сумма и количество каждого блюда"""
+        totals = {}
+        for order in orders:
+            if str(order.get("Статус", "")).strip().lower() == "cancelled":
+                continue
+            cafe = totals.setdefault(str(order.get("Кафе", "")).strip() or "—",
+                                     {'orders': 0, 'total': 0, 'dishes': {}})
+            cafe['orders'] += 1
+            try:
+                cafe['total'] += int(float(str(order.get("Сумма", 0)) or 0))
+            except ValueError:
+                pass
+            for item in str(order.get("Состав", "")).split("; "):
+                name, _, quantity = item.strip().rpartition(" x")
+                if not name or not quantity.isdigit():
+                    continue
+                cafe['dishes'][name] = cafe['dishes'].get(name, 0) + int(quantity)
+        return totals
+
+    def get_kitchen_totals(self, delivery_date):
+        """
+        Итоги по кафе на дату доставки. Считаются один раз на версию заказов
+        (после фиксации — на снимок), повторные запросы кухни не пересчитывают их.
+        """
+        frozen = self.frozen_totals.get(delivery_date)
+        if frozen is not None:
+            return frozen
+        orders = self.get_orders_by_delivery_date(delivery_date)
+        source, totals_by_date = self._kitchen_totals
+        if source is not self._orders_index[0]:
+            totals_by_date = {}
+            self._kitchen_totals = (self._orders_index[0], totals_by_date)
+        if delivery_date not in totals_by_date:
+            totals_by_date[delivery_date] = self.aggregate_orders(orders)
+        return totals_by_date[delivery_date]
+
     def get_active_orders(self):
         all_orders = self.get_all_orders()
         return [order for order in all_orders if order.get("Статус", "").lower() in ["active", "pending"]]
@@ -561,35 +897,75 @@ class GoogleSheetsService:
             logger.error(f"❌ Ошибка генерации отчета: {str(e)}", exc_info=True)
             return {}
 
-    def add_order(self, user_id, cart_items):
-        if self.is_local_mode:
-            logger.info(f"📦 [ЛОКАЛЬНЫЙ РЕЖИМ] Заказ от {user_id}: {cart_items}")
-            return True
+    def add_order(self, user_id, cart_items, idempotency_key=None):
+        """
+        Запись заказа: корзина делится на заказы по кафе, все строки пишутся одним вызовом.
+        Возвращает список ID заказов при успехе и False при ошибке.
+        Повтор с тем же idempotency_key (двойное нажатие, повторная доставка апдейта)
+        не пишет вторую строку, а возвращает результат первой записи —
+        в том числе если первая запись еще выполняется.
+        """
+        if idempotency_key is None:
+            return self._append_order(user_id, cart_items)
+
+        while True:
+            with self._order_lock:
+                self._prune_order_results()
+                done = self._order_results.get(idempotency_key)
+                if done is not None:
+                    logger.info(f"🔁 Повторное подтверждение заказа пользователя {user_id}, строка не добавлена")
+                    return done[1]
+                in_flight = self._orders_in_flight.get(idempotency_key)
+                if in_flight is None:
+                    in_flight = self._orders_in_flight[idempotency_key] = threading.Event()
+                    break
+            in_flight.wait(timeout=30)
 
+        result = False
         try:
-            worksheet = self.get_worksheet("Заказы")
-            if not worksheet:
-                return False
-
-            all_values = worksheet.get_all_values()
-            next_id = len(all_values)
-
+            result = self._append_order(user_id, cart_items)
+        finally:
+            with self._order_lock:
+                if result:  # ошибки не запоминаем — повтор должен попробовать снова
+                    self._order_results[idempotency_key] = (time.monotonic(), result)
+                del self._orders_in_flight[idempotency_key]
+            in_flight.set()
+        return result
+
+    def _prune_order_results(self):
+        deadline = time.monotonic() - Config.ORDER_DEDUPE_TTL
+        while self._order_results:
+            key, (created, _) = next(iter(self._order_results.items()))
+            if created >= deadline:
+                break
+            del self._order_results[key]
+
+    def build_order_rows(self, user_id, cart_items):
+        """
+        Строки листа «Заказы» без ID — по одной на каждое кафе из корзины
+        (даты, сотрудник, кафе, состав, сумма, статус).
+        """
+        now = datetime.now(self.timezone)
+        # Та же дата, что у фиксации заказов и уведомлений: после дедлайна — послезавтра
+        delivery_date = deadline_clock.get_delivery_date(now.timestamp())
+        order_date = now.strftime("%Y-%m-%d")
+
+        default_cafe = "Coffee Time"
+        settings = self.get_settings()
+        if settings and 'default_cafe' in settings:
+            default_cafe = settings['default_cafe']
+
+        by_cafe = {}
+        for item in cart_items:
+            by_cafe.setdefault(item.get('Кафе') or default_cafe, []).append(item)
+
+        rows = []
+        for cafe_name, items in by_cafe.items():
             items_text = "; ".join([
-                f"{item['Название']} x{item['quantity']}" for item in cart_items
+                f"{item['Название']} x{item['quantity']}" for item in items
             ])
-
-            total_price = sum(item.get('Цена', 0) * item['quantity'] for item in cart_items)
-            now = datetime.now(self.timezone)
-            delivery_date = (now + timedelta(days=1)).strftime("%Y-%m-%d")
-            order_date = now.strftime("%Y-%m-%d")
-
-            cafe_name = "Coffee Time"
-            settings = self.get_settings()
-            if settings and 'default_cafe' in settings:
-                cafe_name = settings['default_cafe']
-
-            worksheet.append_row([
-                str(next_id),
+            total_price = sum(item.get('Цена', 0) * item['quantity'] for item in items)
+            rows.append([
                 order_date,
                 delivery_date,
                 str(user_id),
@@ -598,38 +974,104 @@ class GoogleSheetsService:
                 str(total_price),
                 "active"
             ])
+        return rows
 
-            self.cache['orders'] = {'data': None, 'timestamp': None}
-            return True
+    def _append_order(self, user_id, cart_items):
+        if self.is_local_mode:
+            logger.info(f"📦 [ЛОКАЛЬНЫЙ РЕЖИМ] Заказ от {user_id}: {len(cart_items)} позиций")
+            return ["local"]
+
+        try:
+            worksheet = self.get_worksheet("Заказы")
+            if not worksheet:
+                return False
+
+            all_values = worksheet.get_all_values()
+            next_id = len(all_values)
+
+            rows = self.build_order_rows(user_id, cart_items)
+            order_ids = [str(next_id + i) for i in range(len(rows))]
+            worksheet.append_rows([[order_id] + row for order_id, row in zip(order_ids, rows)])
+
+            self.invalidate('orders')
+            return order_ids
 
         except Exception as e:
             logger.error(f"❌ Ошибка добавления заказа: {str(e)}", exc_info=True)
             return False
 
-    def get_user_orders(self, user_id):
-        def fetch_orders():
-            if self.is_local_mode:
-                return [
-                    {"ID": "101", "Дата_заказа": "20.12.2024", "Состав": "Борщ x1, Котлета x1", "Сумма": "550",
-                     "Статус": "active"},
-                    {"ID": "98", "Дата_заказа": "19.12.2024", "Состав": "Салат Цезарь x1", "Сумма": "200",
-                     "Статус": "delivered"}
-                ]
+    def append_order_rows(self, rows):
+        """Запись готовых строк заказов (с ID) одним вызовом; ошибки пробрасываются вызывающему"""
+        if self.is_local_mode:
+            logger.info(f"📦 [ЛОКАЛЬНЫЙ РЕЖИМ] Записано заказов: {len(rows)}")
+            return
 
-            worksheet = self.get_worksheet("Заказы")
-            if not worksheet:
-                return []
+        worksheet = self.get_worksheet("Заказы")
+        if not worksheet:
+            raise RuntimeError("Лист «Заказы» недоступен")
+        worksheet.append_rows(rows)
+        self.invalidate('orders')
 
-            try:
-                records = worksheet.get_all_records()
-                user_orders = [order for order in records if
-                               str(order.get("Сотрудник", "")).strip() == str(user_id).strip()]
-                return user_orders
-            except Exception as e:
-                logger.error(f"❌ Ошибка получения заказов: {str(e)}", exc_info=True)
-                return []
+    def get_order_ids(self):
+        """ID всех заказов в листе — свежим чтением, без кэша; ошибки пробрасываются"""
+        if self.is_local_mode:
+            return set()
 
-        return self._get_cached_data('orders', lambda: fetch_orders())
+        worksheet = self.get_worksheet("Заказы")
+        if not worksheet:
+            raise RuntimeError("Лист «Заказы» недоступен")
+        return {str(row[0]).strip() for row in worksheet.get_all_values()[1:] if row}
+
+    def get_user_orders(self, user_id):
+        if self.is_local_mode:
+            return [
+                {"ID": "101", "Дата_заказа": "20.12.2024", "Состав": "Борщ x1, Котлета x1", "Сумма": "550",
+                 "Статус": "active"},
+                {"ID": "98", "Дата_заказа": "19.12.2024", "Состав": "Салат Цезарь x1", "Сумма": "200",
+                 "Статус": "delivered"}
+            ]
+
+        # Фильтруем общий кэш заказов, а не кэшируем выборку одного пользователя под ключом 'orders'
+        return [order for order in self.get_all_orders() if
+                str(order.get("Сотрудник", "")).strip() == str(user_id).strip()]
+
+    def freeze_orders(self, delivery_date):
+        """
+        Фиксация заказов на дату доставки в неизменяемый снимок для кухни и отчетов.
+        Лист читается без кэша и резервных данных: ошибка чтения или пустой лист
+        пробрасываются как исключение, чтобы фиксацию повторили, а не зафиксировали пустой день.
+        """
+        if self.is_local_mode:
+            orders = self.get_all_orders()
+        else:
+            worksheet = self.get_worksheet("Заказы")
+            if not worksheet:
+                raise RuntimeError("Лист «Заказы» недоступен")
+            orders = worksheet.get_all_records()
+            if not orders:
+                raise RuntimeError("Лист «Заказы» прочитан пустым")
+            self.cache['orders'] = {'data': orders, 'timestamp': datetime.now().timestamp()}
+            self._update_version('orders', orders)
+
+        snapshot = tuple(
+            MappingProxyType(dict(order)) for order in orders
+            if str(order.get("Дата_доставки", "")).strip() == delivery_date
+            and str(order.get("Статус", "")).strip().lower() != "cancelled"
+        )
+        self.frozen_orders[delivery_date] = snapshot
+        self.frozen_totals[delivery_date] = self.aggregate_orders(snapshot)
+        logger.info(f"🧊 Заказы на {delivery_date} зафиксированы: {len(snapshot)} шт.")
+        return snapshot
+
+    def get_frozen_orders(self, delivery_date):
+        """Снимок заказов на дату доставки или None, если день еще не зафиксирован"""
+        return self.frozen_orders.get(delivery_date)
+
+    def drop_frozen_orders(self, before_date):
+        """Удаление снимков за даты раньше указанной"""
+        for delivery_date in [d for d in self.frozen_orders if d < before_date]:
+            del self.frozen_orders[delivery_date]
+            self.frozen_totals.pop(delivery_date, None)
 
     def get_user_stats(self, user_id):
         orders = self.get_user_orders(user_id)
@@ -702,6 +1144,7 @@ class GoogleSheetsService:
             try:
                 records = worksheet.get_all_records()
                 settings = {}
+                previous_deadline = (Config.ORDER_DEADLINE_HOUR, Config.ORDER_DEADLINE_MINUTE)
                 for record in records:
                     key = str(record.get("Ключ", "")).strip()
                     value = str(record.get("Значение", "")).strip()
@@ -717,6 +1160,8 @@ class GoogleSheetsService:
                                 Config.ORDER_DEADLINE_MINUTE = int(value)
                             except:
                                 pass
+                if (Config.ORDER_DEADLINE_HOUR, Config.ORDER_DEADLINE_MINUTE) != previous_deadline:
+                    deadline_clock.refresh()
                 return settings
 
             except Exception as e:
@@ -744,9 +1189,22 @@ class GoogleSheetsService:
 
             now = datetime.now(self.timezone).strftime("%Y-%m-%d")
             worksheet.append_row([str(user_id), full_name, role, "active", now])
-            self.cache['employees'] = {'data': None, 'timestamp': None}
+            self.invalidate('employees')
             return True
 
         except Exception as e:
             logger.error(f"❌ Ошибка регистрации: {str(e)}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
+
+
+# Общий экземпляр: один клиент Google и один кэш на процесс
+sheets_service = GoogleSheetsService()
+
+registry.gauge(
+    "sheets_cache_age_seconds", "Возраст данных в кэше таблиц", ("key",),
+    function=lambda: {(key,): age for key, age in sheets_service.cache_ages().items()}
+)
+registry.gauge(
+    "sheets_connected", "Подключение к Google Sheets установлено (1) или нет (0)",
+    function=lambda: int(sheets_service.is_connected)
+)
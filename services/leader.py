@@ -0,0 +1,199 @@
+import asyncio
+from abc import ABC, abstractmethod
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector(ABC):
+    """
+    Выбор лидера среди процессов бота через аренду (lease) с ограниченным сроком.
+
+    Лидер продлевает аренду каждые ttl/3 секунд. Если он завис или упал,
+    аренда истекает, и ее забирает другой процесс при следующей попытке.
+    Подклассы реализуют _try_acquire() (захват или продление) и _release().
+    """
+
+    def __init__(self, name="scheduler", ttl=None):
+        self.name = name
+        self.ttl = ttl or Config.LEADER_TTL
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._is_leader = False
+        self._expires_at = 0.0
+        self._task = None
+
+    @property
+    def renew_interval(self):
+        return max(self.ttl / 3, 1)
+
+    @property
+    def is_leader(self):
+        """Лидер ли этот процесс (с учетом того, что аренда могла истечь без продления)"""
+        return self._is_leader and time.monotonic() < self._expires_at
+
+    @abstractmethod
+    async def _try_acquire(self):
+        """Захват или продление аренды; True, если процесс — лидер"""
+
+    @abstractmethod
+    async def _release(self):
+        """Освобождение аренды, если она принадлежит этому процессу"""
+
+    async def check(self):
+        """Захват или продление аренды; возвращает True, если процесс — лидер"""
+        started = time.monotonic()
+        try:
+            acquired = await self._try_acquire()
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка продления аренды '{self.name}': {e}")
+            acquired = False
+
+        if acquired != self._is_leader:
+            if acquired:
+                logger.info(f"👑 Процесс {self.holder} стал лидером '{self.name}'")
+            else:
+                logger.warning(f"🔻 Процесс {self.holder} больше не лидер '{self.name}'")
+        self._is_leader = acquired
+        if acquired:
+            # Отсчет от начала запроса: реальная аренда истекает не раньше
+            self._expires_at = started + self.ttl
+        return acquired
+
+    async def run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.renew_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        """Остановка и освобождение аренды, чтобы другой процесс принял работу сразу"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._is_leader:
+            try:
+                await self._release()
+                logger.info(f"👋 Аренда '{self.name}' освобождена")
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось освободить аренду '{self.name}': {e}")
+            self._is_leader = False
+
+
+class LocalLeader(LeaderElector):
+    """Единственный процесс — всегда лидер"""
+
+    async def _try_acquire(self):
+        return True
+
+    async def _release(self):
+        pass
+
+
+class SQLiteLeaderElector(LeaderElector):
+    """Аренда в общем файле SQLite — для процессов на одной машине"""
+
+    def __init__(self, name="scheduler", ttl=None, path=None):
+        super().__init__(name, ttl)
+        self.path = path or os.path.join(Config.DATA_DIR, "leases.sqlite3")
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _acquire_sync(self):
+        now = time.time()
+        with self._lock:
+            # Одна атомарная операция: занимаем свободную/просроченную аренду или продлеваем свою
+            self._conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at <= ?",
+                (self.name, self.holder, now + self.ttl, now)
+            )
+            row = self._conn.execute("SELECT holder FROM leases WHERE name = ?", (self.name,)).fetchone()
+        return row is not None and row[0] == self.holder
+
+    def _release_sync(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+
+    async def _try_acquire(self):
+        return await asyncio.to_thread(self._acquire_sync)
+
+    async def _release(self):
+        await asyncio.to_thread(self._release_sync)
+
+    async def stop(self):
+        await super().stop()
+        with self._lock:
+            self._conn.close()
+
+
+class RedisLeaderElector(LeaderElector):
+    """
+    Аренда в Redis (SET NX PX) — для процессов на разных машинах.
+
+    Чекпоинты рассылок (DATA_DIR/broadcasts) остаются файлами: DATA_DIR должен быть
+    общим для всех машин (сетевой диск), иначе новый лидер после перехода не увидит
+    прогресс прежнего и повторно отправит уже доставленные уведомления.
+    """
+
+    _RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    _RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, name="scheduler", ttl=None, url=None):
+        super().__init__(name, ttl)
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise RuntimeError("Для LEADER_BACKEND=redis установите пакет redis: pip install redis")
+        self.redis = Redis.from_url(url or Config.FSM_REDIS_URL, decode_responses=True)
+        self.key = f"cafebot:leader:{name}"
+
+    async def _try_acquire(self):
+        ttl_ms = int(self.ttl * 1000)
+        if await self.redis.set(self.key, self.holder, nx=True, px=ttl_ms):
+            return True
+        return bool(await self.redis.eval(self._RENEW_SCRIPT, 1, self.key, self.holder, ttl_ms))
+
+    async def _release(self):
+        await self.redis.eval(self._RELEASE_SCRIPT, 1, self.key, self.holder)
+
+    async def stop(self):
+        await super().stop()
+        await self.redis.aclose()
+
+
+def create_leader_elector(name="scheduler"):
+    """
+    Выбор лидера по настройке LEADER_BACKEND: sqlite (по умолчанию, процессы
+    на одной машине), redis (несколько машин, с общим DATA_DIR) или none (один процесс — всегда лидер).
+    """
+    backend = Config.LEADER_BACKEND.lower()
+    if backend == "none":
+        return LocalLeader(name)
+    if backend == "redis":
+        return RedisLeaderElector(name)
+    return SQLiteLeaderElector(name)
@@ -0,0 +1,291 @@
+import codecs
+import csv
+import hashlib
+import io
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+MENU_COLUMNS = ["ID", "Кафе", "Название", "Описание", "Активно", "Дата_начала", "Дата_окончания", "Цена"]
+ACTIVE_VALUES = ("да", "yes", "1", "true", "+", "✓")
+DEFAULT_CAFE = "Coffee Time"
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+MAX_ROWS = 5000
+MAX_ERRORS = 20
+
+
+def _cell_to_str(value):
+    """Значение ячейки XLSX/CSV в строку так, как его записал бы человек"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _detect_encoding(data):
+    """UTF-8 (с BOM или без) или cp1251 — Excel в русской локали сохраняет CSV именно так"""
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(data[:65536], final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp1251"
+
+
+def _iter_csv(data):
+    text = io.TextIOWrapper(io.BytesIO(data), encoding=_detect_encoding(data), newline="")
+    first_line = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(first_line, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    text.seek(0)
+    for row in csv.reader(text, dialect):
+        yield [_cell_to_str(value) for value in row]
+
+
+def _iter_xlsx(data):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Для импорта XLSX установите пакет openpyxl: pip install openpyxl")
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        sheet = workbook["Меню"] if "Меню" in workbook.sheetnames else workbook.active
+        for row in sheet.iter_rows(values_only=True):
+            yield [_cell_to_str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_menu_file(filename, data):
+    """
+    Построчное чтение файла меню (CSV или XLSX) в словари по колонкам меню.
+    Заголовки сопоставляются без учета регистра; возвращает (номер строки файла, запись).
+    """
+    name = (filename or "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        rows = _iter_xlsx(data)
+    elif name.endswith((".csv", ".txt")):
+        rows = _iter_csv(data)
+    else:
+        raise ValueError("Поддерживаются файлы .csv и .xlsx")
+
+    known = {column.lower(): column for column in MENU_COLUMNS}
+    header = None
+    for line_number, row in enumerate(rows, start=1):
+        if not any(row):
+            continue
+        if header is None:
+            header = [known.get(value.strip().lower()) for value in row]
+            if "Название" not in header or "Цена" not in header:
+                raise ValueError("В файле нет колонок «Название» и «Цена» в первой строке")
+            continue
+        yield line_number, {column: row[i] if i < len(row) else "" for i, column in enumerate(header) if column}
+
+
+def normalize_price(value):
+    """Цена в виде строки-числа; None, если это не число"""
+    text = str(value).replace(" ", "").replace("₽", "").replace(",", ".")
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    if price < 0:
+        return None
+    return str(int(price)) if price.is_integer() else str(price)
+
+
+def _valid_date(value):
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def insert_defaults(today=None):
+    """Значения для колонок, не заполненных у нового блюда"""
+    today = today or date.today()
+    return {
+        "Кафе": DEFAULT_CAFE,
+        "Описание": "",
+        "Активно": "Да",
+        "Дата_начала": today.isoformat(),
+        "Дата_окончания": (today + timedelta(days=365)).isoformat(),
+    }
+
+
+def validate_menu_rows(records):
+    """
+    Проверка строк файла. Пустые ячейки в блюде не сохраняются: у существующего блюда
+    такая колонка не меняется, новому подставляется значение по умолчанию.
+    Возвращает (блюда, ошибки); ошибки — строки вида «Строка N: ...».
+    """
+    dishes, errors = [], []
+    seen_ids, seen_names = set(), set()
+
+    for line_number, record in records:
+        if len(dishes) >= MAX_ROWS:
+            errors.append(f"Больше {MAX_ROWS} строк — разделите файл")
+            break
+
+        dish = {column: str(value).strip() for column, value in record.items() if str(value).strip()}
+        problems = []
+
+        if not dish.get("Название"):
+            problems.append("пустое название")
+        price = normalize_price(dish.get("Цена", ""))
+        if price is None:
+            problems.append(f"цена «{dish.get('Цена', '')}» не число")
+        else:
+            dish["Цена"] = price
+        for column in ("Дата_начала", "Дата_окончания"):
+            if column in dish:
+                dish[column] = dish[column][:10]
+                if not _valid_date(dish[column]):
+                    problems.append(f"{column} «{dish[column]}» не в формате ГГГГ-ММ-ДД")
+        if not problems and dish.get("Дата_начала", "") > dish.get("Дата_окончания", "9999"):
+            problems.append("дата начала позже даты окончания")
+        if "Активно" in dish:
+            dish["Активно"] = "Да" if dish["Активно"].lower() in ACTIVE_VALUES else "Нет"
+
+        if dish.get("ID"):
+            if dish["ID"] in seen_ids:
+                problems.append(f"ID {dish['ID']} повторяется")
+            seen_ids.add(dish["ID"])
+        else:
+            name_key = (dish.get("Кафе", DEFAULT_CAFE).lower(), dish.get("Название", "").lower())
+            if name_key in seen_names:
+                problems.append(f"«{dish.get('Название', '')}» ({dish.get('Кафе', DEFAULT_CAFE)}) повторяется")
+            seen_names.add(name_key)
+
+        if problems:
+            if len(errors) < MAX_ERRORS:
+                errors.append(f"Строка {line_number}: {', '.join(problems)}")
+            elif len(errors) == MAX_ERRORS:
+                errors.append("…")
+            continue
+        dishes.append(dish)
+
+    return dishes, errors
+
+
+class MenuImportPlan:
+    """
+    Разница между файлом и листом «Меню»: новые блюда, изменения и деактивации.
+    Блюда, которых нет в файле, выключаются (файл — это меню целиком), но не удаляются.
+    """
+
+    def __init__(self, header, inserts, updates, deactivations):
+        self.header = header  # колонки листа в его порядке
+        self.inserts = inserts  # [блюдо]
+        self.updates = updates  # [(номер строки, было, стало, измененные колонки)] — пишутся только эти ячейки
+        self.deactivations = deactivations  # [(номер строки, блюдо)]
+
+    @property
+    def is_empty(self):
+        return not (self.inserts or self.updates or self.deactivations)
+
+    def signature(self):
+        """Отпечаток плана: применяем только то, что админ видел в предпросмотре"""
+        updates = [(row, {column: new[column] for column in changed}) for row, _, new, changed in self.updates]
+        payload = [self.header, self.inserts, updates, [row for row, _ in self.deactivations]]
+        return hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    def row_values(self, dish):
+        return [dish.get(column, "") for column in self.header]
+
+    def format_diff(self, limit=10):
+        lines = [
+            f"➕ Новые: {len(self.inserts)}   ✏️ Изменения: {len(self.updates)}   "
+            f"⏸ Выключение: {len(self.deactivations)}"
+        ]
+        if self.inserts:
+            lines.append("\n➕ Новые блюда:")
+            lines.extend(f"• ID {d['ID']}: {d['Название']} ({d['Кафе']}) — {d['Цена']}₽" for d in self.inserts[:limit])
+            if len(self.inserts) > limit:
+                lines.append(f"… и еще {len(self.inserts) - limit}")
+        if self.updates:
+            lines.append("\n✏️ Изменения:")
+            for _, old, new, changed in self.updates[:limit]:
+                diff = "; ".join(f"{column}: {old.get(column, '') or '—'} → {new[column] or '—'}" for column in changed)
+                lines.append(f"• ID {new['ID']} {new['Название']}: {diff}")
+            if len(self.updates) > limit:
+                lines.append(f"… и еще {len(self.updates) - limit}")
+        if self.deactivations:
+            lines.append("\n⏸ Нет в файле, будут выключены:")
+            lines.extend(f"• ID {d['ID']}: {d['Название']}" for _, d in self.deactivations[:limit])
+            if len(self.deactivations) > limit:
+                lines.append(f"… и еще {len(self.deactivations) - limit}")
+        return "\n".join(lines)
+
+
+def _sheet_value(column, value):
+    """Значение из листа в том же виде, что и после проверки файла (для сравнения)"""
+    value = str(value).strip()
+    if column == "Цена":
+        return normalize_price(value) or value
+    if column == "Активно":
+        return "Да" if value.lower() in ACTIVE_VALUES else "Нет"
+    if column in ("Дата_начала", "Дата_окончания"):
+        return value[:10]
+    return value
+
+
+def build_import_plan(sheet_values, dishes, today=None):
+    """План импорта по содержимому листа «Меню» (get_all_values) и проверенным блюдам из файла"""
+    if not sheet_values:
+        raise ValueError("Лист «Меню» пуст — нет строки заголовков")
+    known = {column.lower(): column for column in MENU_COLUMNS}
+    header = [known.get(value.strip().lower(), value) for value in sheet_values[0]]
+    columns = [column for column in MENU_COLUMNS if column in header]
+    if "ID" not in columns or "Активно" not in columns:
+        raise ValueError("В листе «Меню» нет колонок ID/Активно")
+
+    current = []  # (номер строки, блюдо)
+    for row_number, row in enumerate(sheet_values[1:], start=2):
+        dish = {column: _sheet_value(column, row[i]) if i < len(row) else "" for i, column in enumerate(header)}
+        if dish.get("ID"):
+            current.append((row_number, dish))
+    by_id = {dish["ID"]: (row_number, dish) for row_number, dish in current}
+    by_name = {(dish.get("Кафе", "").lower(), dish.get("Название", "").lower()): (row_number, dish)
+               for row_number, dish in current}
+
+    # Новые ID не должны совпасть ни с листом, ни с явными ID ниже в том же файле
+    taken_ids = set(by_id) | {dish["ID"] for dish in dishes if dish.get("ID")}
+    next_id = max((int(dish["ID"]) for _, dish in current if dish["ID"].isdigit()), default=0) + 1
+    defaults = insert_defaults(today)
+    inserts, updates, matched = [], [], set()
+    for dish in dishes:
+        if dish.get("ID"):
+            found = by_id.get(dish["ID"])
+        else:
+            found = by_name.get((dish.get("Кафе", DEFAULT_CAFE).lower(), dish["Название"].lower()))
+        if found is None:
+            dish = dict(defaults, **dish)
+            if not dish.get("ID"):
+                while str(next_id) in taken_ids:
+                    next_id += 1
+                dish["ID"] = str(next_id)
+                next_id += 1
+            inserts.append(dish)
+            continue
+        row_number, old = found
+        dish = dict(dish, ID=old["ID"])
+        matched.add(row_number)
+        changed = [column for column in columns
+                   if column != "ID" and column in dish and old.get(column, "") != dish[column]]
+        if changed:
+            updates.append((row_number, old, dish, changed))
+
+    deactivations = [(row_number, dish) for row_number, dish in current
+                     if row_number not in matched and dish.get("Активно") == "Да"]
+    return MenuImportPlan(header, inserts, updates, deactivations)
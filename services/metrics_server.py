@@ -0,0 +1,110 @@
+import asyncio
+import time
+import logging
+from aiohttp import web
+from aiogram.fsm.storage.memory import MemoryStorage
+from config.settings import Config
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+FSM_SIZE = registry.gauge("bot_fsm_storage_keys", "Число активных записей FSM (состояния и корзины пользователей)")
+
+
+async def fsm_storage_size(storage):
+    """Размер FSM-хранилища; None, если хранилище не умеет его сообщать"""
+    if isinstance(storage, MemoryStorage):
+        return len(storage.storage)
+    size = getattr(storage, "size", None)
+    if size is None:
+        return None
+    try:
+        return await size()
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось получить размер FSM-хранилища: {e}")
+        return None
+
+
+class MetricsServer:
+    """
+    Локальный HTTP-сервер наблюдаемости:
+    /metrics — метрики в текстовом формате Prometheus,
+    /healthz — доступность Google Sheets (проверочный запрос не чаще HEALTH_PROBE_INTERVAL)
+    и возраст загруженных данных.
+    """
+
+    PROBE_TIMEOUT = 10
+
+    def __init__(self, sheets, storage, host=None, port=None):
+        self.sheets = sheets
+        self.storage = storage
+        self.host = host or Config.METRICS_HOST
+        self.port = port if port is not None else Config.METRICS_PORT
+        self._runner = None
+        self._probe = (0.0, None)  # (время проверки, ошибка или None)
+        self._probe_lock = asyncio.Lock()
+
+    async def probe_sheets(self):
+        """Ошибка последнего проверочного запроса к таблице или None; результат кэшируется"""
+        async with self._probe_lock:
+            checked_at, error = self._probe
+            if time.monotonic() - checked_at < Config.HEALTH_PROBE_INTERVAL:
+                return error
+            try:
+                await asyncio.wait_for(asyncio.to_thread(self.sheets.probe), timeout=self.PROBE_TIMEOUT)
+                error = None
+            except asyncio.TimeoutError:
+                error = f"нет ответа за {self.PROBE_TIMEOUT} с"
+            except Exception as e:
+                error = str(e)[:200]
+            if error:
+                logger.warning(f"⚠️ Проверка Google Sheets не прошла: {error}")
+            self._probe = (time.monotonic(), error)
+            return error
+
+    async def handle_metrics(self, request):
+        FSM_SIZE.set(await fsm_storage_size(self.storage))
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def handle_health(self, request):
+        ages = self.sheets.cache_ages()
+        max_age = Config.HEALTH_MAX_DATA_AGE
+        stale = [key for key in ('menu', 'settings') if ages.get(key) is not None and ages[key] > max_age]
+        probe_error = await self.probe_sheets()
+        status = "ok"
+        if probe_error:
+            status = "sheets_unavailable"
+        elif stale:
+            status = "stale"
+        body = {
+            'status': status,
+            'sheets': "local" if self.sheets.is_local_mode else ("unavailable" if probe_error else "available"),
+            'sheets_error': probe_error,
+            'data_age_seconds': {key: round(age, 1) if age is not None else None for key, age in ages.items()},
+            'stale': stale,
+        }
+        # Устаревшие данные — предупреждение, а не отказ: ночью кэш честно не обновляется
+        return web.json_response(body, status=503 if status == "sheets_unavailable" else 200)
+
+    async def start(self):
+        if not self.port:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/healthz", self.handle_health)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Несколько воркеров на одной машине: каждому нужен свой METRICS_PORT
+            logger.error(f"❌ Сервер метрик не запущен на порту {self.port}: {e}")
+            await self.stop()
+            return
+        logger.info(f"📈 Метрики: http://{self.host}:{self.port}/metrics, проверка: /healthz")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
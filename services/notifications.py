@@ -0,0 +1,105 @@
+import asyncio
+import time
+import logging
+from config.settings import Config
+from services.broadcaster import Broadcaster
+from utils.date_utils import deadline_clock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELIVERY_TIME = "13:00-14:00"
+
+
+class DeliveryNotifier:
+    """
+    Уведомления о доставке, обещанные при оформлении заказа.
+    За NOTIFY_BEFORE_DELIVERY_MINUTES до начала доставки рассылает сообщение всем,
+    у кого есть заказ на сегодня. Прерванная рассылка продолжается после перезапуска.
+    """
+
+    RESUME_WINDOW = 2 * 3600  # после времени рассылки догоняем ее не дольше 2 часов
+    RETRY_DELAY = 60
+
+    def __init__(self, bot, sheets, broadcaster=None, clock=deadline_clock):
+        self.bot = bot
+        self.sheets = sheets
+        self.broadcaster = broadcaster or Broadcaster(bot)
+        self.clock = clock
+        self._last_attempt_ts = 0.0
+
+    def _delivery_window(self):
+        # Берем настройки из кэша, чтобы не ходить в Sheets из цикла планировщика
+        settings = self.sheets.cache['settings']['data'] or {}
+        return str(settings.get('default_delivery_time') or DEFAULT_DELIVERY_TIME)
+
+    def _notify_ts(self):
+        """Timestamp сегодняшней рассылки"""
+        try:
+            hour, minute = (int(part) for part in self._delivery_window().split("-")[0].strip().split(":"))
+        except ValueError:
+            hour, minute = 13, 0
+        return self.clock.today_at(hour, minute) - Config.NOTIFY_BEFORE_DELIVERY_MINUTES * 60
+
+    @staticmethod
+    def run_id(delivery_date):
+        return f"delivery_{delivery_date}"
+
+    def next_run(self):
+        now_ts = time.time()
+        notify_ts = self._notify_ts()
+        if now_ts < notify_ts:
+            return notify_ts
+
+        checkpoint = self.broadcaster.load_checkpoint(self.run_id(self.clock.today()))
+        if not checkpoint.data['done'] and now_ts < notify_ts + self.RESUME_WINDOW:
+            # Рассылка еще не выполнена или прервана перезапуском — продолжаем
+            return max(now_ts, self._last_attempt_ts + self.RETRY_DELAY)
+        return notify_ts + 86400
+
+    def get_recipients(self, delivery_date):
+        """Получатели из зафиксированного снимка дня или из индекса заказов"""
+        orders = self.sheets.get_frozen_orders(delivery_date)
+        if orders is None:
+            orders = self.sheets.get_orders_by_delivery_date(delivery_date)
+
+        recipients = []
+        for order in orders:
+            if str(order.get("Статус", "")).strip().lower() not in ("active", "pending"):
+                continue
+            try:
+                recipients.append(int(str(order.get("Сотрудник", "")).strip()))
+            except ValueError:
+                continue
+        return list(dict.fromkeys(recipients))
+
+    async def notify_delivery(self):
+        self._last_attempt_ts = time.time()
+        delivery_date = self.clock.today()
+        run_id = self.run_id(delivery_date)
+
+        checkpoint = self.broadcaster.load_checkpoint(run_id)
+        recipients = None
+        if not checkpoint.exists:
+            recipients = await asyncio.to_thread(self.get_recipients, delivery_date)
+            logger.info(f"🔔 Уведомление о доставке на {delivery_date}: {len(recipients)} получателей")
+
+        delivery_window = self._delivery_window().replace("-", " до ")
+        text = (
+            f"🔔 Ваш обед будет доставлен сегодня с {delivery_window}!\n"
+            "📍 Адрес: Офис компании\n\n"
+            "Приятного аппетита!"
+        )
+        stats = await self.broadcaster.run(run_id, recipients, text)
+
+        if Config.ADMIN_TELEGRAM_ID:
+            report = (
+                f"📨 Уведомления о доставке {delivery_date}:\n"
+                f"✅ Отправлено: {stats['sent']} из {stats['total']}\n"
+                f"❌ Ошибок: {stats['failed_total']}\n"
+                f"⏱ {stats['elapsed']:.1f} с ({stats['rate']:.1f} сообщ./с)"
+            )
+            try:
+                await self.bot.send_message(Config.ADMIN_TELEGRAM_ID, report)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось отправить отчет о рассылке администратору: {e}")
+        return stats
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from config.settings import Config
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PENDING = registry.gauge("bot_order_journal_pending", "Заказы в журнале, еще не записанные в таблицу")
+JOURNAL_FLUSHED = registry.counter("bot_order_journal_flushed_total", "Заказы, перенесенные из журнала в таблицу")
+
+
+class OrderJournal:
+    """
+    Локальный журнал принятых заказов в SQLite (WAL, synchronous=FULL):
+    заказ считается принятым, как только запись журнала зафиксирована на диске.
+
+    Записи переносятся в лист «Заказы» пачками. Чтобы несколько процессов не писали
+    одно и то же, пачка сначала «захватывается» на время аренды; запись в таблицу
+    начинается, только если до конца аренды больше таймаута запроса к Sheets.
+    ID заказа — J{номер записи журнала}; по нему после сбоя видно, дошла ли запись до таблицы.
+    """
+
+    LEASE = 120  # не меньше двух таймаутов Sheets API (Config.SHEETS_TIMEOUT)
+    RETENTION = 7 * 86400  # записанные в таблицу заказы хранятся неделю, затем удаляются
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(Config.DATA_DIR, "orders_journal.sqlite3")
+        self.lease = max(self.LEASE, 2 * Config.SHEETS_TIMEOUT)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")  # fsync при каждой фиксации: принятый заказ не теряется
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, idempotency_key TEXT UNIQUE, created REAL NOT NULL, "
+            "row TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, claim TEXT, "
+            "claimed_until REAL NOT NULL DEFAULT 0, retry_at REAL NOT NULL DEFAULT 0, "
+            "written_at REAL, last_error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS journal_pending ON journal (written_at, id)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def order_id(entry_id):
+        return f"J{entry_id}"
+
+    def append(self, rows, idempotency_key=None):
+        """
+        Запись заказа (строки листа без ID, по одной на кафе) в журнал одной транзакцией;
+        возвращает список ID заказов. Повтор с тем же idempotency_key возвращает ID уже принятых заказов.
+        """
+        keys = [None] * len(rows) if idempotency_key is None else [f"{idempotency_key}:{i}" for i in range(len(rows))]
+        created = time.time()
+        entry_ids = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row, key in zip(rows, keys):
+                    cursor = self._conn.execute(
+                        "INSERT INTO journal (idempotency_key, created, row) VALUES (?, ?, ?) "
+                        "ON CONFLICT(idempotency_key) DO NOTHING RETURNING id",
+                        (key, created, json.dumps(row, ensure_ascii=False))
+                    )
+                    inserted = cursor.fetchone()
+                    cursor.fetchall()
+                    if inserted is None:
+                        inserted = self._conn.execute("SELECT id FROM journal WHERE idempotency_key = ?", (key,)).fetchone()
+                    entry_ids.append(inserted[0])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [self.order_id(entry_id) for entry_id in entry_ids]
+
+    def claim(self, limit):
+        """Захват пачки незаписанных заказов: (метка захвата, [(id, строка без ID, номер попытки)])"""
+        now = time.time()
+        claim = uuid.uuid4().hex
+        rows = self._execute(
+            "UPDATE journal SET claim = ?, claimed_until = ?, attempts = attempts + 1 "
+            "WHERE id IN (SELECT id FROM journal WHERE written_at IS NULL AND claimed_until < ? AND retry_at <= ? "
+            "ORDER BY id LIMIT ?) RETURNING id, row, attempts",
+            (claim, now + self.lease, now, now, limit)
+        )
+        return claim, sorted((entry_id, json.loads(row), attempts) for entry_id, row, attempts in rows)
+
+    def holds(self, entry_ids, claim, margin=0):
+        """Пачка все еще захвачена этой меткой и аренды хватит еще минимум на margin секунд"""
+        placeholders = ",".join("?" * len(entry_ids))
+        held = self._execute(
+            f"SELECT COUNT(*) FROM journal WHERE id IN ({placeholders}) AND claim = ? AND claimed_until > ?",
+            (*entry_ids, claim, time.time() + margin)
+        )[0][0]
+        return held == len(entry_ids)
+
+    def mark_written(self, entry_ids, claim=None):
+        """Отметка о записи в таблицу; с claim — только записей, все еще захваченных этой меткой"""
+        if not entry_ids:
+            return []
+        placeholders = ",".join("?" * len(entry_ids))
+        condition = "" if claim is None else " AND claim = ?"
+        rows = self._execute(
+            f"UPDATE journal SET written_at = ?, claim = NULL, last_error = NULL "
+            f"WHERE id IN ({placeholders}){condition} RETURNING id",
+            (time.time(), *entry_ids, *(() if claim is None else (claim,)))
+        )
+        return [entry_id for entry_id, in rows]
+
+    def release(self, entry_ids, error, retry_at, claim=None):
+        """Возврат пачки после ошибки записи: повтор не раньше retry_at (чужой захват не трогаем)"""
+        placeholders = ",".join("?" * len(entry_ids))
+        condition = "" if claim is None else " AND claim = ?"
+        self._execute(
+            f"UPDATE journal SET claim = NULL, claimed_until = 0, retry_at = ?, last_error = ? "
+            f"WHERE id IN ({placeholders}) AND written_at IS NULL{condition}",
+            (retry_at, str(error)[:500], *entry_ids, *(() if claim is None else (claim,)))
+        )
+
+    def pending_count(self):
+        return self._execute("SELECT COUNT(*) FROM journal WHERE written_at IS NULL")[0][0]
+
+    def purge(self):
+        self._execute("DELETE FROM journal WHERE written_at IS NOT NULL AND written_at < ?",
+                      (time.time() - self.RETENTION,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OrderPipeline:
+    """
+    Прием заказов через журнал и фоновый перенос в лист «Заказы».
+
+    submit() подтверждает заказ сразу после записи в журнал. Фоновая задача собирает
+    заказы в пачки (append_rows — один вызов API на пачку) и повторяет запись
+    с нарастающей паузой, пока таблица недоступна.
+
+    Ровно один раз: запись, которую уже пытались перенести (после сбоя или перезапуска),
+    сначала ищется в листе по ID J… и повторно не добавляется.
+    """
+
+    BATCH_SIZE = 50
+    BATCH_DELAY = 0.5  # ожидание соседних заказов перед записью пачки, с
+    IDLE_INTERVAL = 60  # проверка журнала без новых заказов (повторы после ошибок), с
+    MAX_BACKOFF = 300
+
+    def __init__(self, journal, sheets):
+        self.journal = journal
+        self.sheets = sheets
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    async def submit(self, user_id, cart_items, idempotency_key=None):
+        """Прием заказа (по заказу на каждое кафе из корзины); возвращает список ID заказов"""
+        rows = await asyncio.to_thread(self.sheets.build_order_rows, user_id, cart_items)
+        order_ids = await asyncio.to_thread(self.journal.append, rows, idempotency_key)
+        JOURNAL_PENDING.set(await asyncio.to_thread(self.journal.pending_count))
+        logger.info(f"📒 Заказ {', '.join(order_ids)} принят в журнал",
+                    extra={"event": "order_journaled", "user_id": user_id})
+        self.notify()
+        return order_ids
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _backoff(self, attempts):
+        return min(2 ** attempts, self.MAX_BACKOFF)
+
+    def _flush_batch(self):
+        """Перенос одной пачки; возвращает число перенесенных заказов (0 — переносить нечего)"""
+        claim, claimed = self.journal.claim(self.BATCH_SIZE)
+        if not claimed:
+            return 0
+        entry_ids = [entry_id for entry_id, _, _ in claimed]
+        batch = claimed
+        try:
+            if any(attempts > 1 for _, _, attempts in batch):
+                # Прошлая попытка могла дойти до таблицы — не добавляем такие заказы второй раз
+                existing = self.sheets.get_order_ids()
+                already = [entry_id for entry_id in entry_ids if self.journal.order_id(entry_id) in existing]
+                if already:
+                    logger.info(f"📒 Заказы уже в таблице, повтор пропущен: {len(already)}")
+                    self.journal.mark_written(already)
+                batch = [entry for entry in batch if entry[0] not in already]
+
+            rows = [[self.journal.order_id(entry_id)] + row for entry_id, row, _ in batch]
+            lost = 0
+            if rows:
+                batch_ids = [entry_id for entry_id, _, _ in batch]
+                # Запрос к Sheets ограничен таймаутом: если аренды на него не хватит,
+                # пачку может перехватить другой процесс — тогда не пишем, а повторим позже
+                if not self.journal.holds(batch_ids, claim, margin=Config.SHEETS_TIMEOUT):
+                    raise RuntimeError("аренда пачки истекает раньше таймаута запроса к таблице")
+                self.sheets.append_order_rows(rows)
+                lost = len(batch_ids) - len(self.journal.mark_written(batch_ids, claim))
+                if lost:
+                    logger.warning(f"⚠️ Аренда пачки истекла во время записи: "
+                                   f"{lost} заказов будут сверены с таблицей повторно")
+            JOURNAL_FLUSHED.inc(len(entry_ids) - lost)
+            return len(entry_ids)
+        except Exception as e:
+            delay = self._backoff(max(attempts for _, _, attempts in claimed))
+            self.journal.release(entry_ids, e, time.time() + delay, claim)
+            logger.warning(f"⚠️ Заказы из журнала не записаны ({len(entry_ids)} шт.), повтор через {delay} с: {e}")
+            raise
+
+    async def flush(self):
+        """Перенос всех готовых к записи заказов; при ошибке таблицы остаток ждет следующей попытки"""
+        async with self._flush_lock:
+            flushed = 0
+            while True:
+                try:
+                    count = await asyncio.to_thread(self._flush_batch)
+                except Exception:
+                    break  # пачка возвращена в журнал с паузой, остальные подождут следующего прохода
+                if not count:
+                    break
+                flushed += count
+            JOURNAL_PENDING.set(await asyncio.to_thread(self.journal.pending_count))
+            if flushed:
+                logger.info(f"📒 Из журнала в таблицу перенесено заказов: {flushed}")
+            return flushed
+
+    async def _run(self):
+        # Первый проход — заказы, оставшиеся с прошлого запуска
+        await self.flush()
+        await asyncio.to_thread(self.journal.purge)
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.IDLE_INTERVAL)
+                await asyncio.sleep(self.BATCH_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка переноса заказов из журнала: {e}", exc_info=True)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self, timeout=10):
+        """Остановка с последней попыткой перенести принятые заказы"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Не все заказы из журнала перенесены до остановки — перенесем при запуске")
+        pending = await asyncio.to_thread(self.journal.pending_count)
+        if pending:
+            logger.warning(f"📒 В журнале осталось заказов: {pending}")
+        self.journal.close()
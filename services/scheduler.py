@@ -0,0 +1,165 @@
+import asyncio
+import time
+import logging
+from config.settings import Config
+from utils.date_utils import deadline_clock
+
+logger = logging.getLogger(__name__)
+
+
+class BotScheduler:
+    """
+    Планировщик фоновых задач бота, работающий в event loop aiogram.
+
+    Перед дедлайном прогревает кэши меню, сотрудников и настроек (и держит их
+    свежими до дедлайна), в момент дедлайна сбрасывает отложенные записи и
+    фиксирует заказы дня в неизменяемый снимок.
+
+    При нескольких процессах задачи с внешними последствиями (рассылки) выполняет
+    только лидер. Прогрев, фиксация и очистка касаются памяти своего процесса и
+    выполняются в каждом; каждый процесс перед фиксацией сбрасывает свои отложенные
+    записи, а снимок после перезапуска восстанавливается при старте.
+    """
+
+    MAX_SLEEP = 300  # не спим дольше 5 минут, чтобы учесть смену настроек дедлайна
+    FREEZE_RETRY_INTERVAL = 60  # повтор фиксации, если таблица не прочиталась, с
+    FREEZE_ATTEMPTS = 30
+    FREEZE_GRACE = 15  # ожидание сброса журналов других процессов перед чтением заказов, с
+
+    def __init__(self, sheets, clock=deadline_clock, leader=None):
+        self.sheets = sheets
+        self.clock = clock
+        self.leader = leader
+        self._jobs = []
+        self._warmups = []
+        self._flushers = []
+        self._tasks = []
+        self._last_warmup_ts = 0.0
+
+    def add_job(self, name, next_run, func, leader_only=True):
+        """
+        Регистрация периодической задачи.
+        next_run() возвращает timestamp следующего запуска, func — корутинная функция.
+        leader_only=False — задача выполняется в каждом процессе.
+        """
+        self._jobs.append((name, next_run, func, leader_only))
+
+    def add_warmup(self, func):
+        """Дополнительный шаг прогрева (например, пререндер меню)"""
+        self._warmups.append(func)
+        return func
+
+    def add_flusher(self, func):
+        """Сброс отложенных записей перед фиксацией заказов"""
+        self._flushers.append(func)
+        return func
+
+    async def _is_leader(self):
+        if self.leader is None or self.leader.is_leader:
+            return True
+        # Аренда могла освободиться только что (лидер остановился) — пробуем занять сразу
+        return await self.leader.check()
+
+    async def _run_job(self, name, func, leader_only=True):
+        """Выполнение задачи; False — задачу пропустил не-лидер"""
+        if leader_only and not await self._is_leader():
+            logger.debug(f"⏲️ Задача '{name}' пропущена: процесс не лидер")
+            return False
+        started = time.monotonic()
+        try:
+            await func()
+            logger.info(f"⏲️ Задача '{name}' выполнена за {time.monotonic() - started:.2f} с")
+        except Exception as e:
+            logger.error(f"❌ Ошибка задачи '{name}': {e}", exc_info=True)
+        return True
+
+    async def _job_loop(self, name, next_run, func, leader_only):
+        while True:
+            delay = next_run() - time.time()
+            if delay > 0:
+                await asyncio.sleep(min(delay, self.MAX_SLEEP))
+                continue
+            if not await self._run_job(name, func, leader_only):
+                # Задачу выполняет лидер; если он упадет, подхватим после истечения аренды
+                await asyncio.sleep(self.leader.renew_interval)
+
+    def _next_warmup_ts(self):
+        """Начало окна прогрева, а внутри окна — повторный прогрев до истечения TTL кэша"""
+        now_ts = time.time()
+        deadline_ts = self.clock.deadline_timestamp()
+        window_start = deadline_ts - Config.PREWARM_MINUTES * 60
+
+        if window_start <= now_ts < deadline_ts:
+            refresh_interval = max(self.sheets.CACHE_TTL - 30, 30)
+            return max(self._last_warmup_ts + refresh_interval, window_start)
+        if now_ts < window_start:
+            return window_start
+        return window_start + 86400
+
+    async def warm_up(self):
+        """Прогрев кэшей меню, сотрудников и настроек"""
+        self._last_warmup_ts = time.time()
+        self.sheets.expire_cache('menu', 'employees', 'settings')
+
+        await asyncio.to_thread(self.sheets.get_settings)
+        await asyncio.to_thread(self.sheets.get_active_dishes)
+        await asyncio.to_thread(self.sheets.get_employees)
+
+        for warmup in self._warmups:
+            await warmup()
+
+    def _frozen_delivery_date(self):
+        # Заказы, принятые до дедлайна, доставляются на следующий день
+        return self.clock.get_delivery_date(self.clock.deadline_timestamp() - 1)
+
+    async def freeze(self, grace=None):
+        """Сброс отложенных записей своего процесса и фиксация заказов дня"""
+        for flusher in self._flushers:
+            await flusher()
+
+        if grace is None:
+            grace = self.FREEZE_GRACE if self.leader is not None else 0
+        if grace:
+            # Остальные воркеры в тот же момент сбрасывают свои журналы
+            await asyncio.sleep(grace)
+
+        delivery_date = self._frozen_delivery_date()
+        for attempt in range(1, self.FREEZE_ATTEMPTS + 1):
+            try:
+                await asyncio.to_thread(self.sheets.freeze_orders, delivery_date)
+                return
+            except Exception as e:
+                if attempt == self.FREEZE_ATTEMPTS:
+                    raise
+                logger.warning(f"⚠️ Заказы на {delivery_date} не зафиксированы (попытка {attempt}), "
+                               f"повтор через {self.FREEZE_RETRY_INTERVAL} с: {e}")
+                await asyncio.sleep(self.FREEZE_RETRY_INTERVAL)
+
+    async def _on_midnight(self):
+        self.sheets.drop_frozen_orders(self.clock.today())
+
+    def start(self):
+        self.clock.on_deadline(lambda: self._run_job("freeze", self.freeze, leader_only=False))
+        self.clock.on_midnight(lambda: self._run_job("cleanup", self._on_midnight, leader_only=False))
+        self._tasks.append(self.clock.start())
+        if self.clock.is_deadline_passed() and self.sheets.get_frozen_orders(self._frozen_delivery_date()) is None:
+            # Запуск после дедлайна: снимок дня был только в памяти прежнего процесса
+            self._tasks.append(asyncio.create_task(
+                self._run_job("freeze", lambda: self.freeze(grace=0), leader_only=False)
+            ))
+        if self.leader is not None:
+            self._tasks.append(self.leader.start())
+
+        self.add_job("warm_up", self._next_warmup_ts, self.warm_up, leader_only=False)
+        for name, next_run, func, leader_only in self._jobs:
+            self._tasks.append(asyncio.create_task(self._job_loop(name, next_run, func, leader_only)))
+        logger.info(f"⏲️ Планировщик запущен: {len(self._jobs)} задач(и)")
+
+    async def stop(self):
+        await self.clock.stop()
+        if self.leader is not None:
+            await self.leader.stop()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,144 @@
+import asyncio
+import signal
+import logging
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_chat_id(update):
+    """ID чата апдейта (сырой dict от Telegram); для апдейтов без чата — ID пользователя"""
+    for key, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get('chat') or (event.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = event.get('from') or event.get('user')
+        if user:
+            return user['id']
+    return None
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Прием апдейтов через webhook с ограничением числа одновременно обрабатываемых.
+
+    Telegram получает ответ сразу, обработка идет в фоне. Когда в работе уже
+    max_in_flight апдейтов, ответ на следующий запрос задерживается до
+    освобождения слота — Telegram сам притормаживает доставку.
+    Апдейты одного чата обрабатываются строго по очереди, в порядке поступления.
+    После начала остановки новые апдейты отклоняются с 503 (Telegram доставит
+    их повторно), а уже принятые дорабатываются в пределах drain_timeout.
+    """
+
+    def __init__(self, dispatcher, bot, max_in_flight=None, drain_timeout=None, **kwargs):
+        super().__init__(dispatcher, bot, **kwargs)
+        self.max_in_flight = max_in_flight or Config.WEBHOOK_MAX_IN_FLIGHT
+        self.drain_timeout = drain_timeout if drain_timeout is not None else Config.WEBHOOK_DRAIN_TIMEOUT
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._chat_tails = {}  # chat_id -> последняя задача чата
+        self._draining = False
+
+    @property
+    def in_flight(self):
+        return len(self._background_feed_update_tasks)
+
+    async def _ordered_feed_update(self, bot, update, previous):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            await self._background_feed_update(bot, update)
+        finally:
+            self._slots.release()
+
+    def _forget_chat_tail(self, chat_id, task):
+        if self._chat_tails.get(chat_id) is task:
+            del self._chat_tails[chat_id]
+
+    async def _handle_request_background(self, bot, request):
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        if self._draining:
+            self._slots.release()
+            return web.Response(status=503, text="Shutting down")
+        chat_id = get_update_chat_id(update)
+        task = asyncio.create_task(self._ordered_feed_update(bot, update, self._chat_tails.get(chat_id)))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        if chat_id is not None:
+            self._chat_tails[chat_id] = task
+            task.add_done_callback(lambda t: self._forget_chat_tail(chat_id, t))
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def handle(self, request):
+        if self._draining:
+            return web.Response(status=503, text="Shutting down")
+        return await super().handle(request)
+
+    async def drain(self):
+        """Прекратить прием апдейтов и дождаться обработки принятых"""
+        self._draining = True
+        pending = set(self._background_feed_update_tasks)
+        if not pending:
+            return
+        logger.info(f"⏳ Ожидание обработки {len(pending)} апдейтов...")
+        done, not_done = await asyncio.wait(pending, timeout=self.drain_timeout)
+        if not_done:
+            logger.warning(f"⚠️ Не дождались обработки {len(not_done)} апдейтов за {self.drain_timeout} с")
+            for task in not_done:
+                task.cancel()
+
+    async def close(self):
+        # Сессию бота закрывает main при завершении работы
+        await self.drain()
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, stop_event: asyncio.Event = None):
+    """
+    Запуск встроенного aiohttp-сервера и прием апдейтов до сигнала остановки.
+    Если WEBHOOK_URL не задан, webhook в Telegram не регистрируется — апдейты
+    можно отправлять на сервер локально (scripts/replay_updates.py).
+    """
+    stop_event = stop_event or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: остановка по KeyboardInterrupt
+
+    app = web.Application()
+    handler = LimitedRequestHandler(dp, bot, secret_token=Config.WEBHOOK_SECRET or None)
+    handler.register(app, path=Config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    app["webhook_handler"] = handler
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"🌐 Webhook-сервер слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+
+    if Config.WEBHOOK_URL:
+        if not Config.WEBHOOK_SECRET:
+            logger.warning("⚠️ WEBHOOK_SECRET не задан: запросы к webhook не проверяются")
+        await bot.set_webhook(
+            Config.WEBHOOK_URL.rstrip("/") + Config.WEBHOOK_PATH,
+            secret_token=Config.WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(Config.WEBHOOK_MAX_IN_FLIGHT, 100)
+        )
+        logger.info(f"✅ Webhook зарегистрирован: {Config.WEBHOOK_URL}")
+    else:
+        logger.warning("⚠️ WEBHOOK_URL не задан: webhook в Telegram не регистрируется")
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("🛑 Остановка webhook-сервера...")
+        # on_shutdown: дожидаемся принятых апдейтов, затем emit_shutdown диспетчера
+        await runner.cleanup()
@@ -0,0 +1,43 @@
+import asyncio
+
+from services.broadcaster import Broadcaster
+
+
+class SlowBot:
+    """Бот, который «отправляет» сообщения с задержкой и запоминает получателей"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        await asyncio.sleep(self.delay)
+        self.sent.append(chat_id)
+
+
+def test_cancelled_run_resumes_from_pending_recipients(tmp_path):
+    recipients = list(range(1, 21))
+
+    async def scenario():
+        bot = SlowBot()
+        broadcaster = Broadcaster(bot, rate=1000, concurrency=1, checkpoint_dir=str(tmp_path))
+        task = asyncio.create_task(broadcaster.run("resume", recipients=recipients, text="hi"))
+        while len(bot.sent) < 4:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        checkpoint = broadcaster.load_checkpoint("resume")
+        assert checkpoint.data['done'] is False
+        pending = checkpoint.pending()
+        assert pending and len(pending) < len(recipients)
+
+        first_run = list(bot.sent)
+        bot.sent.clear()
+        stats = await broadcaster.run("resume")
+        assert broadcaster.load_checkpoint("resume").data['done'] is True
+        assert set(bot.sent) == set(pending)
+        assert set(first_run) | set(bot.sent) == set(recipients)
+        assert stats['sent'] == len(pending)
+
+    asyncio.run(scenario())
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from utils import date_utils
+from utils.date_utils import DeadlineClock
+
+
+def test_early_timer_wakeup_fires_deadline_hooks_once(monkeypatch):
+    # Часы отстают от таймера цикла событий: после ожидания дедлайн «еще не наступил»
+    base = time.time()
+    monkeypatch.setattr(date_utils.time, "time", lambda: base + (time.monotonic() - started) / 2)
+    started = time.monotonic()
+
+    clock = DeadlineClock()
+    clock._recompute(base)
+    clock._deadline_ts = base + 0.05
+    clock._midnight_ts = base + 3600
+    fired = []
+
+    @clock.on_deadline
+    async def on_deadline():
+        fired.append("deadline")
+
+    async def scenario():
+        clock.start()
+        await asyncio.sleep(0.3)
+        await clock.stop()
+
+    asyncio.run(scenario())
+    assert fired == ["deadline"]
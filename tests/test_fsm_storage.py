@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from services import fsm_storage
+from services.cart_service import Cart, cart_service
+from services.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=42, chat_id=1, user_id=1)
+TTL = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время хранилища"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(fsm_storage.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl_and_are_swept(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), ttl=TTL)
+        try:
+            await storage.set_state(KEY, "Order:cart")
+            await storage.set_data(KEY, {"cart": {"1": {"ID": 1, "quantity": 2}}})
+
+            clock[0] += TTL - 1
+            assert await storage.get_state(KEY) == "Order:cart"
+            assert await storage.get_data(KEY)
+
+            clock[0] += 1
+            assert await storage.get_state(KEY) is None
+            assert await storage.get_data(KEY) == {}
+            assert await storage.size() == 0
+
+            # Новое состояние не возвращает данные просроченной, еще не удаленной записи
+            await storage.set_state(KEY, "Order:menu")
+            assert await storage.get_data(KEY) == {}
+
+            clock[0] += TTL
+            assert await storage.sweep() == 1
+            assert storage._execute("SELECT COUNT(*) FROM fsm")[0][0] == 0
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_each_write_extends_the_ttl(tmp_path, clock):
+    async def scenario():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"), ttl=TTL)
+        try:
+            await storage.set_data(KEY, {"cart": {"1": {"ID": 1, "quantity": 1}}})
+
+            # Пользователь активен: каждая запись состояния продлевает срок и для данных
+            for _ in range(3):
+                clock[0] += TTL - 10
+                await storage.set_state(KEY, "Order:menu")
+            assert await storage.get_data(KEY) == {"cart": {"1": {"ID": 1, "quantity": 1}}}
+
+            clock[0] += TTL - 10
+            await storage.set_data(KEY, {"cart": {}})
+            clock[0] += TTL - 10
+            assert await storage.get_state(KEY) == "Order:menu"
+            assert await storage.sweep() == 0
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_cart_survives_storage_reopen(tmp_path):
+    path = str(tmp_path / "fsm.sqlite3")
+    dish = {"ID": 7, "Название": "Борщ", "Цена": 250, "Кафе": "Coffee Time"}
+
+    async def save_cart():
+        storage = SQLiteStorage(path, ttl=TTL)
+        cart = Cart()
+        cart.add(dish, 2)
+        await cart_service.save(FSMContext(storage, KEY), cart)
+        await storage.close()
+        return cart
+
+    async def load_cart():
+        storage = SQLiteStorage(path, ttl=TTL)
+        try:
+            return await cart_service.load(FSMContext(storage, KEY))
+        finally:
+            await storage.close()
+
+    saved = asyncio.run(save_cart())
+    restored = asyncio.run(load_cart())  # как после перезапуска бота
+    assert restored.items() == saved.items()
+    assert restored.fingerprint() == saved.fingerprint()
+    assert restored.total == 500
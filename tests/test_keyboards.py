@@ -0,0 +1,48 @@
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from keyboards.inline_keyboards import (
+    _build_quantity_keyboard, compute_fingerprint, get_quantity_keyboard, keyboard_fingerprint, keyboard_registry
+)
+
+
+def request_payload(method):
+    """Поля запроса к Bot API в том виде, в каком их отправит сессия aiogram"""
+    session = AiohttpSession()
+    bot = Bot("42:test", session=session)
+    return {name: session.prepare_value(value, bot, {}) for name, value in method if value is not None}
+
+
+def plain_menu_keyboard():
+    builder = InlineKeyboardBuilder()
+    builder.button(text="Борщ (250₽)", callback_data="select_1_a")
+    builder.button(text="⬅️ Назад", callback_data="back_to_main")
+    builder.adjust(1)
+    return builder.as_markup()
+
+
+@pytest.mark.parametrize("registered, plain", [
+    (get_quantity_keyboard(), _build_quantity_keyboard()),
+    (keyboard_registry.track(plain_menu_keyboard()), plain_menu_keyboard()),
+])
+def test_registered_keyboard_payload_matches_plain_markup(registered, plain):
+    for method in (EditMessageText(chat_id=1, message_id=2, text="t", reply_markup=registered),
+                   SendMessage(chat_id=1, text="t", reply_markup=registered)):
+        expected = type(method)(**dict(dict(method), reply_markup=plain))
+        assert request_payload(method) == request_payload(expected)
+        assert method.model_dump(include={"reply_markup"}) == expected.model_dump(include={"reply_markup"})
+    assert '"url"' not in request_payload(SendMessage(chat_id=1, text="t", reply_markup=registered))["reply_markup"]
+
+
+def test_registered_keyboard_is_immutable():
+    keyboard = get_quantity_keyboard()
+    with pytest.raises(TypeError):
+        keyboard.inline_keyboard.append([])
+    with pytest.raises(TypeError):
+        keyboard.inline_keyboard[0].pop()
+    with pytest.raises(Exception):
+        keyboard.inline_keyboard[0][0].text = "x"
+    assert keyboard_fingerprint(keyboard) == compute_fingerprint(_build_quantity_keyboard())
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from benchmarks.fakes import FakeTelegramSession, UpdateFactory, install_fake_sheets
+from config.settings import Config
+from services.google_sheets import sheets_service
+
+USER_ID = 10 ** 9
+
+
+def order_rows(spreadsheet):
+    return spreadsheet.worksheet("Заказы").rows[1:]
+
+
+def test_concurrent_add_order_with_same_key_writes_one_row():
+    spreadsheet = install_fake_sheets(sheets_service, [USER_ID], latency=0.02)
+    cart_items = [{'ID': '1', 'Название': 'Борщ', 'Цена': 250, 'quantity': 1, 'Кафе': 'Coffee Time'}]
+    start = threading.Barrier(4)
+    results = []
+
+    def confirm():
+        start.wait()
+        results.append(sheets_service.add_order(USER_ID, cart_items, "double-tap"))
+
+    threads = [threading.Thread(target=confirm) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(order_rows(spreadsheet)) == 1
+    assert results[0] and all(result == results[0] for result in results)
+
+    # Повторная доставка апдейта после записи тоже возвращает первый результат
+    assert sheets_service.add_order(USER_ID, cart_items, "double-tap") == results[0]
+    assert len(order_rows(spreadsheet)) == 1
+
+
+def test_replayed_finalize_update_creates_one_order(monkeypatch):
+    from main import create_dispatcher
+
+    monkeypatch.setattr(Config, "TEST_MODE", True)  # дедлайн не мешает оформить заказ
+    spreadsheet = install_fake_sheets(sheets_service, [USER_ID], latency=0.02)
+    session = FakeTelegramSession()
+    bot = Bot("42:test", session=session)
+    dp = create_dispatcher(bot, MemoryStorage())
+    updates = UpdateFactory()
+
+    async def scenario():
+        await dp.feed_update(bot, updates.message(USER_ID, "/start"))
+        for data in ("menu", "select_1_a", "quantity_2", "cart", "confirm_order"):
+            await dp.feed_update(bot, updates.callback(USER_ID, data, session.last_message_id.get(USER_ID, 1)))
+
+        finalize = updates.callback(USER_ID, "finalize_order", session.last_message_id[USER_ID])
+        # Двойное нажатие: оба апдейта обрабатываются одновременно, пока корзина еще не очищена
+        await asyncio.gather(dp.feed_update(bot, finalize), dp.feed_update(bot, finalize))
+        # Повторная доставка того же апдейта позже
+        await dp.feed_update(bot, finalize)
+
+    asyncio.run(scenario())
+    assert len(order_rows(spreadsheet)) == 1
@@ -0,0 +1,87 @@
+import pytest
+
+from services.order_journal import OrderJournal, OrderPipeline
+
+
+class FakeOrderSheet:
+    """Лист «Заказы»: запоминает добавленные строки и каждый вызов append"""
+
+    def __init__(self):
+        self.rows = []
+        self.appends = 0
+
+    def get_order_ids(self):
+        return {row[0] for row in self.rows}
+
+    def append_order_rows(self, rows):
+        self.appends += 1
+        self.rows.extend(rows)
+
+
+ORDER_ROWS = [["2026-10-19", "2026-10-20", "1", "Иван", "Coffee Time", "Борщ x1", "250", "Новый"],
+              ["2026-10-19", "2026-10-20", "1", "Иван", "Vilka", "Плов x1", "300", "Новый"]]
+
+
+def expire_claims(journal):
+    """Аренда истекла (процесс упал или завис) — пачку снова можно захватить"""
+    journal._execute("UPDATE journal SET claimed_until = 0, retry_at = 0")
+
+
+def test_same_idempotency_key_returns_same_order_ids(tmp_path):
+    journal = OrderJournal(str(tmp_path / "journal.sqlite3"))
+    try:
+        first = journal.append(ORDER_ROWS, "42:100:confirm:abc")
+        replay = journal.append(ORDER_ROWS, "42:100:confirm:abc")
+        assert replay == first
+        assert len(first) == 2 and all(order_id.startswith("J") for order_id in first)
+        assert journal.pending_count() == 2
+
+        other = journal.append(ORDER_ROWS, "42:101:confirm:abc")
+        assert set(other).isdisjoint(first)
+        assert journal.pending_count() == 4
+    finally:
+        journal.close()
+
+
+def test_retried_batch_already_in_sheet_is_not_appended_again(tmp_path):
+    journal = OrderJournal(str(tmp_path / "journal.sqlite3"))
+    sheet = FakeOrderSheet()
+    pipeline = OrderPipeline(journal, sheet)
+    try:
+        order_ids = journal.append(ORDER_ROWS, "42:100:confirm:abc")
+
+        # Первая попытка дошла до таблицы, но процесс упал до отметки в журнале
+        _, claimed = journal.claim(OrderPipeline.BATCH_SIZE)
+        sheet.append_order_rows([[journal.order_id(entry_id)] + row for entry_id, row, _ in claimed])
+        expire_claims(journal)
+
+        assert pipeline._flush_batch() == 2
+        assert sheet.appends == 1
+        assert sorted(row[0] for row in sheet.rows) == sorted(order_ids)
+        assert journal.pending_count() == 0
+        assert pipeline._flush_batch() == 0
+    finally:
+        journal.close()
+
+
+def test_expired_lease_blocks_the_write(tmp_path):
+    journal = OrderJournal(str(tmp_path / "journal.sqlite3"))
+    sheet = FakeOrderSheet()
+    pipeline = OrderPipeline(journal, sheet)
+    try:
+        journal.append(ORDER_ROWS, "42:100:confirm:abc")
+        claim, claimed = journal.claim(OrderPipeline.BATCH_SIZE)
+        entry_ids = [entry_id for entry_id, _, _ in claimed]
+        assert journal.holds(entry_ids, claim)
+
+        expire_claims(journal)
+        assert not journal.holds(entry_ids, claim)
+
+        # Аренды не хватает на запрос к таблице — пачка не пишется и возвращается в журнал
+        journal.lease = 0
+        with pytest.raises(RuntimeError):
+            pipeline._flush_batch()
+        assert sheet.appends == 0
+        assert journal.pending_count() == 2
+    finally:
+        journal.close()
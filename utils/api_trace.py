@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+import logging
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND = "<фон>"  # вызовы вне обработки апдейта: планировщик, прогрев, рассылки
+
+_current_trace = ContextVar("sheets_trace", default=None)
+
+
+class CallTrace:
+    """Вызовы Sheets API, сделанные при обработке одного апдейта"""
+
+    __slots__ = ("handler", "update_id", "calls", "started")
+
+    def __init__(self, handler, update_id):
+        self.handler = handler
+        self.update_id = update_id
+        self.calls = []  # (метод, лист, длительность, результат)
+        self.started = time.perf_counter()
+
+
+class ApiCallStats:
+    """
+    Учет вызовов Sheets API по обработчикам: сколько вызовов и времени
+    приходится на один апдейт каждого обработчика.
+    Контекст апдейта передается через contextvars и сохраняется в asyncio.to_thread.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._handlers = {}
+        self._lock = threading.Lock()  # record() вызывается из потоков asyncio.to_thread
+
+    def _entry(self, handler):
+        entry = self._handlers.get(handler)
+        if entry is None:
+            entry = self._handlers[handler] = {
+                'updates': 0, 'calls': 0, 'errors': 0, 'api_time': 0.0, 'max_calls': 0, 'methods': {}
+            }
+        return entry
+
+    def start(self, handler, update_id):
+        """Начало обработки апдейта; возвращает токен для finish()"""
+        return _current_trace.set(CallTrace(handler, update_id))
+
+    def finish(self, token):
+        trace = _current_trace.get()
+        _current_trace.reset(token)
+        if trace is None:
+            return None
+        with self._lock:
+            entry = self._entry(trace.handler)
+            entry['updates'] += 1
+            entry['max_calls'] = max(entry['max_calls'], len(trace.calls))
+        if trace.calls and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Апдейт %s (%s): %d вызовов Sheets: %s", trace.update_id, trace.handler,
+                         len(trace.calls), ", ".join(f"{method}({sheet})" for method, sheet, _, _ in trace.calls))
+        return trace
+
+    def record(self, method, sheet, duration, outcome):
+        """Учет одного вызова API в контексте текущего апдейта"""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.calls.append((method, sheet, duration, outcome))
+        key = f"{method}:{sheet}"
+        with self._lock:
+            entry = self._entry(trace.handler if trace is not None else BACKGROUND)
+            entry['calls'] += 1
+            entry['api_time'] += duration
+            if outcome != "ok":
+                entry['errors'] += 1
+            entry['methods'][key] = entry['methods'].get(key, 0) + 1
+
+    def table(self):
+        """Строки отчета, отсортированные по числу вызовов на апдейт"""
+        with self._lock:
+            snapshot = [(handler, dict(entry, methods=dict(entry['methods'])))
+                        for handler, entry in self._handlers.items()]
+        rows = []
+        for handler, entry in snapshot:
+            updates = entry['updates']
+            rows.append({
+                'handler': handler,
+                'updates': updates,
+                'calls': entry['calls'],
+                'calls_per_update': entry['calls'] / updates if updates else float(entry['calls']),
+                'max_calls': entry['max_calls'],
+                'errors': entry['errors'],
+                'api_time': entry['api_time'],
+                'methods': dict(sorted(entry['methods'].items(), key=lambda item: -item[1])),
+            })
+        rows.sort(key=lambda row: (-row['calls_per_update'], -row['calls']))
+        return rows
+
+    def format_table(self, limit=15):
+        rows = [row for row in self.table() if row['calls']]
+        if not rows:
+            return "📊 Вызовов Sheets API пока не было"
+        minutes = (time.time() - self.started_at) / 60
+        lines = [f"📊 Вызовы Sheets API за {minutes:.0f} мин (на апдейт / всего / макс.):", ""]
+        for row in rows[:limit]:
+            methods = ", ".join(f"{name}×{count}" for name, count in list(row['methods'].items())[:3])
+            lines.append(
+                f"• {row['handler']}: {row['calls_per_update']:.1f} / {row['calls']} / {row['max_calls']}"
+                f" — {row['api_time']:.1f} с{', ошибок ' + str(row['errors']) if row['errors'] else ''}"
+            )
+            lines.append(f"   {methods}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Сохранение отчета в JSON-файл (для сравнения между версиями)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        payload = {'started_at': self.started_at, 'dumped_at': time.time(), 'handlers': self.table()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._handlers = {}
+
+
+api_call_stats = ApiCallStats()
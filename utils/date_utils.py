@@ -1,4 +1,6 @@
+import asyncio
 from datetime import datetime, timedelta
+import time
 import pytz
 from config.settings import Config
 import logging
@@ -6,62 +8,186 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def is_order_deadline_passed():
+class DeadlineClock:
     """
-    Проверяет, прошел ли дедлайн для оформления заказов.
-    В тестовом режиме дедлайн отключен.
+    Предвычисленные дедлайн и дата доставки.
+
+    Дедлайн текущих суток, ближайшая полночь и дата доставки пересчитываются
+    один раз в сутки и при изменении настроек (часовой пояс, час/минуты дедлайна),
+    поэтому проверка дедлайна сводится к одному сравнению timestamp.
     """
-    try:
-        # Для тестирования отключаем дедлайн
-        if Config.TEST_MODE or Config.LOCAL_MODE:
-            logger.debug("🕒 Проверка дедлайна отключена в тестовом/локальном режиме")
-            return False
 
-        tz = pytz.timezone(Config.TIMEZONE)
-        now = datetime.now(tz)
+    def __init__(self):
+        self._settings_key = None
+        self._tz = None
+        self._today = None
+        self._deadline_ts = 0.0
+        self._midnight_ts = 0.0
+        self._delivery_before = ""
+        self._delivery_after = ""
+        self._deadline_hooks = []
+        self._midnight_hooks = []
+        self._last_fired = None  # (дата, "deadline" | "midnight") последнего вызова хуков
+        self._task = None
+        self._wakeup = None
 
-        # Определяем дату заказа (сегодня или завтра в зависимости от времени)
-        order_date = now.date()
-        if now.hour >= Config.ORDER_DEADLINE_HOUR and now.minute >= Config.ORDER_DEADLINE_MINUTE:
-            order_date += timedelta(days=1)
+    @property
+    def timezone(self):
+        self._ensure_fresh()
+        return self._tz
 
-        # Дедлайн для заказов на следующий день
-        deadline = tz.localize(datetime.combine(
-            order_date,
-            datetime.min.time().replace(
-                hour=Config.ORDER_DEADLINE_HOUR,
-                minute=Config.ORDER_DEADLINE_MINUTE
-            )
-        ))
+    def _current_settings_key(self):
+        return Config.TIMEZONE, Config.ORDER_DEADLINE_HOUR, Config.ORDER_DEADLINE_MINUTE
 
-        logger.debug(f"🕒 Текущее время: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        logger.debug(f"🕒 Дедлайн заказа: {deadline.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        logger.debug(f"🕒 Сравнение: now={now} > deadline={deadline} = {now > deadline}")
+    def _ensure_fresh(self, now_ts=None):
+        """Пересчет значений после полуночи или при смене настроек"""
+        if now_ts is None:
+            now_ts = time.time()
+        if self._settings_key != self._current_settings_key() or now_ts >= self._midnight_ts:
+            self._recompute(now_ts)
 
-        return now > deadline
+    def _recompute(self, now_ts):
+        settings_key = self._current_settings_key()
+        tz_name, hour, minute = settings_key
 
-    except Exception as e:
-        logger.error(f"❌ Ошибка проверки дедлайна: {str(e)}", exc_info=True)
-        # В случае ошибки разрешаем заказы (fail-safe)
-        return False
+        if self._tz is None or self._settings_key is None or self._settings_key[0] != tz_name:
+            self._tz = pytz.timezone(tz_name)
+
+        now = datetime.fromtimestamp(now_ts, self._tz)
+        today = now.date()
+
+        deadline = self._tz.localize(datetime.combine(today, datetime.min.time().replace(hour=hour, minute=minute)))
+        midnight = self._tz.localize(datetime.combine(today + timedelta(days=1), datetime.min.time()))
+
+        self._today = today
+        self._deadline_ts = deadline.timestamp()
+        self._midnight_ts = midnight.timestamp()
+        self._delivery_before = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+        self._delivery_after = (today + timedelta(days=2)).strftime("%Y-%m-%d")
+        self._settings_key = settings_key
+
+        logger.debug(f"🕒 Дедлайн пересчитан: {deadline.strftime('%Y-%m-%d %H:%M %Z')}")
+
+    def refresh(self):
+        """Принудительный пересчет (например, после загрузки настроек из таблицы)"""
+        self._settings_key = None
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def is_deadline_passed(self, now_ts=None):
+        if now_ts is None:
+            now_ts = time.time()
+        self._ensure_fresh(now_ts)
+        return now_ts >= self._deadline_ts
+
+    def get_delivery_date(self, now_ts=None):
+        if now_ts is None:
+            now_ts = time.time()
+        self._ensure_fresh(now_ts)
+        return self._delivery_after if now_ts >= self._deadline_ts else self._delivery_before
+
+    def deadline_timestamp(self):
+        """Timestamp дедлайна текущих суток"""
+        self._ensure_fresh()
+        return self._deadline_ts
+
+    def midnight_timestamp(self):
+        """Timestamp ближайшей полуночи"""
+        self._ensure_fresh()
+        return self._midnight_ts
+
+    def today_at(self, hour, minute):
+        """Timestamp указанного времени текущих суток в часовом поясе бота"""
+        self._ensure_fresh()
+        return self._tz.localize(
+            datetime.combine(self._today, datetime.min.time().replace(hour=hour, minute=minute))
+        ).timestamp()
 
+    def today(self):
+        """Текущая дата в часовом поясе бота (YYYY-MM-DD)"""
+        self._ensure_fresh()
+        return self._today.strftime("%Y-%m-%d")
 
-def get_next_delivery_date():
+    def on_deadline(self, callback):
+        """Регистрация async-хука, вызываемого в момент дедлайна"""
+        self._deadline_hooks.append(callback)
+        return callback
+
+    def on_midnight(self, callback):
+        """Регистрация async-хука, вызываемого в полночь"""
+        self._midnight_hooks.append(callback)
+        return callback
+
+    async def _fire(self, hooks, name):
+        for hook in list(hooks):
+            try:
+                await hook()
+            except Exception as e:
+                logger.error(f"❌ Ошибка хука '{name}' ({getattr(hook, '__name__', hook)}): {e}", exc_info=True)
+
+    async def run(self):
+        """Цикл, вызывающий хуки дедлайна и полуночи (каждый — не больше раза в сутки)"""
+        self._wakeup = asyncio.Event()
+        while True:
+            now_ts = time.time()
+            self._ensure_fresh(now_ts)
+            # Хуки дедлайна уже вызваны (таймер сработал чуть раньше) — ждем полночь
+            deadline_pending = now_ts < self._deadline_ts and self._last_fired != (self._today, "deadline")
+            target_ts = self._deadline_ts if deadline_pending else self._midnight_ts
+            fired = (self._today, "deadline" if deadline_pending else "midnight")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(target_ts - now_ts, 0))
+                continue  # настройки изменились — пересчитываем цель
+            except asyncio.TimeoutError:
+                pass
+
+            # Таймер цикла событий мог сработать раньше часов, а refresh() — вернуть те же сутки
+            if fired == self._last_fired:
+                continue
+            self._last_fired = fired
+
+            if deadline_pending:
+                logger.info("⏰ Наступил дедлайн заказов")
+                await self._fire(self._deadline_hooks, "deadline")
+            else:
+                logger.info("🌙 Наступила полночь")
+                self._recompute(time.time() + 1)
+                await self._fire(self._midnight_hooks, "midnight")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+deadline_clock = DeadlineClock()
+
+
+def is_order_deadline_passed():
     """
-    Возвращает дату ближайшей доставки (завтра или послезавтра в зависимости от дедлайна)
+    Проверяет, прошел ли дедлайн для оформления заказов.
+    В тестовом режиме дедлайн отключен.
     """
     try:
-        tz = pytz.timezone(Config.TIMEZONE)
-        now = datetime.now(tz)
+        # Для тестирования отключаем дедлайн
+        if Config.TEST_MODE or Config.LOCAL_MODE:
+            return False
 
-        # Если сейчас после дедлайна, доставка будет послезавтра
-        if now.hour > Config.ORDER_DEADLINE_HOUR or (
-                now.hour == Config.ORDER_DEADLINE_HOUR and now.minute >= Config.ORDER_DEADLINE_MINUTE):
-            return (now + timedelta(days=2)).strftime("%Y-%m-%d")
-        else:
-            return (now + timedelta(days=1)).strftime("%Y-%m-%d")
+        return deadline_clock.is_deadline_passed()
 
     except Exception as e:
-        logger.error(f"❌ Ошибка получения даты доставки: {str(e)}")
-        # В случае ошибки возвращаем завтрашнюю дату
-        return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
\ No newline at end of file
+        logger.error(f"❌ Ошибка проверки дедлайна: {str(e)}", exc_info=True)
+        # В случае ошибки разрешаем заказы (fail-safe)
+        return False
+
@@ -0,0 +1,184 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
+from config.settings import Config
+
+# Стандартные атрибуты LogRecord; все остальное пришло через extra=... и попадает в JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, уровень, модуль, сообщение и поля из extra"""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Текстовый формат; потерянные при переполнении очереди записи тоже видны"""
+
+    def format(self, record):
+        text = super().format(record)
+        dropped = getattr(record, "dropped", 0)
+        if dropped:
+            text += f" [потеряно записей лога: {dropped}]"
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Прореживание частых событий: для модуля с частотой N пропускается
+    каждая N-я запись одного события — extra event, а без него места вызова.
+    WARNING и выше проходят всегда.
+    """
+
+    MAX_KEYS = 4096  # счетчики давно не встречавшихся событий вытесняются
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate <= 1:
+            return True
+        # Сообщения — f-строки, поэтому событие определяется не текстом, а event или местом вызова
+        event = getattr(record, "event", None)
+        key = (record.name, event) if event else (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counters.get(key, 0)
+            self._counters[key] = count + 1
+            self._counters.move_to_end(key)
+            if len(self._counters) > self.MAX_KEYS:
+                self._counters.popitem(last=False)
+        if count % rate:
+            return False
+        if count:
+            record.sampled = rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который никогда не ждет: при переполнении очереди запись
+    отбрасывается, а число потерянных записей выводится со следующей успешной.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Форматирование аргументов и трейсбека — здесь, чтобы запись не ссылалась
+        # на изменяемые объекты; сама запись в поток — в потоке QueueListener
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.dropped = self.dropped
+            self.dropped = 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    """'aiogram.event=WARNING,services=DEBUG' -> {'aiogram.event': 'WARNING', 'services': 'DEBUG'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if value:
+            levels[name.strip()] = value.strip().upper()
+    return levels
+
+
+def parse_sampling(spec):
+    """'aiogram.event=20' -> {'aiogram.event': 20}"""
+    rates = {}
+    for name, value in parse_levels(spec).items():
+        try:
+            rates[name] = max(int(value), 1)
+        except ValueError:
+            pass
+    return rates
+
+
+def setup_logging():
+    """
+    Настройка логирования: обработчики только ставят запись в очередь,
+    форматирование и вывод выполняет отдельный поток QueueListener.
+    Повторный вызов ничего не делает.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if Config.LOG_FORMAT.lower() == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sampling(Config.LOG_SAMPLING)))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(Config.LOG_LEVEL.upper())
+
+    for name, level in parse_levels(Config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Остановка потока логирования с выводом оставшихся в очереди записей"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,38 @@
+from aiogram.types import InlineKeyboardButton
+
+MAX_MESSAGE_LENGTH = 4096  # лимит Telegram на длину текста сообщения
+MENU_PAGE_SIZE = 8
+ADMIN_PAGE_SIZE = 15
+
+
+def paginate(items, page, page_size):
+    """Срез элементов для страницы; номер страницы приводится к допустимому диапазону"""
+    pages = max((len(items) + page_size - 1) // page_size, 1)
+    page = min(max(page, 0), pages - 1)
+    start = page * page_size
+    return items[start:start + page_size], page, pages
+
+
+def page_of(index, page_size):
+    """Номер страницы, на которой находится элемент с указанным индексом"""
+    return index // page_size if index >= 0 else 0
+
+
+def build_nav_row(callback_prefix, page, pages):
+    """Строка навигации «◀️ 2/5 ▶️»; пустая, если страница одна"""
+    if pages <= 1:
+        return []
+    row = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=f"{callback_prefix}{page - 1}"))
+    row.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=f"{callback_prefix}{page + 1}"))
+    return row
+
+
+def fit_message(text, suffix="\n…"):
+    """Обрезка текста до лимита Telegram"""
+    if len(text) <= MAX_MESSAGE_LENGTH:
+        return text
+    return text[:MAX_MESSAGE_LENGTH - len(suffix)] + suffix
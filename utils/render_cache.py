@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Кэш отрендеренных сообщений (текст и клавиатура).
+    Запись привязана к версии исходных данных и пересобирается только при ее смене.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, render):
+        """Значение для ключа и версии данных; render() вызывается только при промахе"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = render()
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.debug(f"🎨 Рендер '{key}' для версии {version}")
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+menu_render_cache = RenderCache()
@@ -1,38 +1,35 @@
+from collections import OrderedDict
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup
+from aiogram.types import CallbackQuery
+from keyboards.inline_keyboards import keyboard_fingerprint
 import logging
-import json
-import traceback
 
 logger = logging.getLogger(__name__)
 
+# Последнее отправленное нами содержимое сообщений: (chat_id, message_id) -> (хэш текста, отпечаток клавиатуры)
+_MAX_TRACKED_MESSAGES = 10000
+_sent_content = OrderedDict()
+
+
+def _content_key(text, reply_markup):
+    return hash((text or "").strip()), keyboard_fingerprint(reply_markup)
 
-def serialize_keyboard(keyboard: InlineKeyboardMarkup) -> str:
-    """Сериализация клавиатуры в строку для сравнения"""
-    if keyboard is None:
-        return ""
-    try:
-        # Преобразуем клавиатуру в JSON-строку для точного сравнения
-        buttons = []
-        for row in keyboard.inline_keyboard:
-            row_buttons = []
-            for button in row:
-                button_data = {
-                    'text': button.text,
-                    'callback_data': button.callback_data,
-                    'url': button.url,
-                    'switch_inline_query': button.switch_inline_query,
-                    'switch_inline_query_current_chat': button.switch_inline_query_current_chat
-                }
-                # Удаляем None значения для чистоты сравнения
-                button_data = {k: v for k, v in button_data.items() if v is not None}
-                row_buttons.append(button_data)
-            buttons.append(row_buttons)
-        return json.dumps(buttons, sort_keys=True)
-    except Exception as e:
-        logger.warning(f"⚠️ Ошибка сериализации клавиатуры: {str(e)}")
-        logger.warning(traceback.format_exc())
-        return ""
+
+def remember_message_content(chat_id, message_id, text, reply_markup=None):
+    """Запомнить содержимое, которое сейчас показано в сообщении"""
+    key = (chat_id, message_id)
+    _sent_content[key] = _content_key(text, reply_markup)
+    _sent_content.move_to_end(key)
+    if len(_sent_content) > _MAX_TRACKED_MESSAGES:
+        _sent_content.popitem(last=False)
+
+
+def _current_content(message):
+    """Содержимое сообщения: из нашего кэша, а если его нет — из callback.message"""
+    cached = _sent_content.get((message.chat.id, message.message_id))
+    if cached is not None:
+        return cached
+    return _content_key(message.text, message.reply_markup)
 
 
 async def safe_edit_message(
@@ -42,94 +39,72 @@ async def safe_edit_message(
         on_same_content=None,
         parse_mode=None
 ):
-    """Безопасное редактирование сообщения с детальным логированием"""
-    logger.debug(f"✏️ Попытка редактирования сообщения для пользователя ID: {callback.from_user.id}")
-    logger.debug(f"📄 Текст сообщения: {text[:100]}...")
-    logger.debug(f"⌨️ Клавиатура: {reply_markup}")
-    logger.debug(f"🎨 Parse mode: {parse_mode}")
+    """Безопасное редактирование сообщения: пропуск без изменений, обработка недоступных сообщений"""
+    message = callback.message
+    if not message:
+        logger.error("❌ Callback message is None")
+        return False
 
-    try:
-        # Проверяем, есть ли message у callback
-        if not callback.message:
-            logger.error("❌ Callback message is None")
-            return False
-
-        current_text = callback.message.text or ""
-        current_markup = callback.message.reply_markup
-
-        # Сравниваем тексты (игнорируем пробелы в начале и конце)
-        texts_match = current_text.strip() == text.strip()
-
-        # Сравниваем клавиатуры с помощью сериализации
-        current_keyboard_str = serialize_keyboard(current_markup)
-        new_keyboard_str = serialize_keyboard(reply_markup)
-        keyboards_match = current_keyboard_str == new_keyboard_str
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("✏️ Редактирование сообщения %s для пользователя ID %s: %.100s",
+                     message.message_id, callback.from_user.id, text)
 
-        logger.debug(
-            f"🔄 Сравнение текстов: текущий='{current_text.strip()[:20]}...' vs новый='{text.strip()[:20]}...' → {texts_match}")
-        logger.debug(
-            f"🔄 Сравнение клавиатур: текущая='{current_keyboard_str[:50]}...' vs новая='{new_keyboard_str[:50]}...' → {keyboards_match}")
+    try:
+        new_content = _content_key(text, reply_markup)
 
         # Если содержимое не изменилось, не редактируем сообщение
-        if texts_match and keyboards_match:
-            logger.info("🔄 Сообщение не изменилось, редактирование пропущено")
+        if new_content == _current_content(message):
+            logger.debug("🔄 Сообщение не изменилось, редактирование пропущено")
             if on_same_content:
                 await on_same_content(callback)
             return False
 
-        logger.info(f"✅ Редактируем сообщение для пользователя ID {callback.from_user.id}")
-
-        # Пытаемся отредактировать сообщение с поддержкой parse_mode
-        await callback.message.edit_text(
+        await message.edit_text(
             text,
             reply_markup=reply_markup,
             parse_mode=parse_mode
         )
-        logger.info("✅ Сообщение успешно отредактировано")
+        remember_message_content(message.chat.id, message.message_id, text, reply_markup)
+        logger.debug("✅ Сообщение успешно отредактировано")
         return True
 
     except TelegramBadRequest as e:
         error_str = str(e).lower()
-        logger.error(f"❌ TelegramBadRequest при редактировании: {error_str}")
-        logger.error(traceback.format_exc())
 
         if "message is not modified" in error_str:
-            logger.info("🔄 Попытка редактирования без изменений (обработано)")
+            logger.debug("🔄 Попытка редактирования без изменений (обработано)")
+            remember_message_content(message.chat.id, message.message_id, text, reply_markup)
             if on_same_content:
                 await on_same_content(callback)
             return False
         elif "message to edit not found" in error_str or "message can't be edited" in error_str:
             logger.warning("🔄 Сообщение недоступно для редактирования, отправляем новое")
-            await callback.message.answer(
+            sent = await message.answer(
                 text,
                 reply_markup=reply_markup,
                 parse_mode=parse_mode
             )
+            remember_message_content(sent.chat.id, sent.message_id, text, reply_markup)
             return False
         else:
-            logger.error(f"❌ Неизвестная ошибка редактирования: {e}")
+            logger.error("❌ Неизвестная ошибка редактирования: %s", e, exc_info=True)
             raise
     except Exception as e:
-        logger.critical(f"🔥 КРИТИЧЕСКАЯ ОШИБКА при редактировании: {e}")
-        logger.critical(traceback.format_exc())
+        logger.critical("🔥 КРИТИЧЕСКАЯ ОШИБКА при редактировании: %s", e, exc_info=True)
         raise
 
 
 async def safe_answer_callback(callback: CallbackQuery, text: str, show_alert: bool = False):
-    """Безопасная отправка callback ответа с детальным логированием"""
-    logger.debug(f"💬 Отправка callback ответа: {text}, show_alert={show_alert}")
+    """Безопасная отправка callback ответа"""
+    logger.debug("💬 Отправка callback ответа: %s, show_alert=%s", text, show_alert)
 
     try:
         await callback.answer(text, show_alert=show_alert)
-        logger.debug("✅ Callback ответ успешно отправлен")
     except TelegramBadRequest as e:
         error_str = str(e).lower()
-        logger.warning(f"⚠️ TelegramBadRequest при отправке callback: {error_str}")
-
         if "query is too old" in error_str or "query expired" in error_str:
-            logger.debug(f"🔄 Callback query устарел: {text}")
+            logger.debug("🔄 Callback query устарел: %s", text)
         else:
-            logger.warning(f"⚠️ Не удалось отправить callback ответ: {e}")
+            logger.warning("⚠️ Не удалось отправить callback ответ: %s", e)
     except Exception as e:
-        logger.error(f"❌ Ошибка при отправке callback: {e}")
-        logger.error(traceback.format_exc())
\ No newline at end of file
+        logger.error("❌ Ошибка при отправке callback: %s", e, exc_info=True)